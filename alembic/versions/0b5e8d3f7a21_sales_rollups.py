@@ -0,0 +1,78 @@
+"""sales rollups
+
+Creates the daily rollup tables and backfills them from the orders still in the
+database (orders already moved to the S3 archive are not counted).
+
+Revision ID: 0b5e8d3f7a21
+Revises: f4a7c2e91b36
+Create Date: 2026-10-19 19:26:03.551872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b5e8d3f7a21'
+down_revision: Union[str, None] = 'f4a7c2e91b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('product_sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    op.create_index('ix_product_sales_daily_product_day', 'product_sales_daily', ['product_id', 'day'], unique=False)
+    op.create_table('order_status_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', postgresql.ENUM(name='orderstatus', create_type=False), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'status')
+    )
+
+    op.execute("""
+        INSERT INTO sales_daily (day, orders, units, revenue)
+        SELECT (o.created_at AT TIME ZONE 'UTC')::date, count(*), coalesce(sum(i.units), 0), sum(o.total)
+        FROM orders AS o
+        LEFT JOIN (
+            SELECT order_id, order_created_at, sum(quantity) AS units FROM order_items GROUP BY 1, 2
+        ) AS i ON i.order_id = o.id AND i.order_created_at = o.created_at
+        WHERE o.status <> 'cancelled'
+        GROUP BY 1
+    """)
+    op.execute("""
+        INSERT INTO product_sales_daily (day, product_id, units, revenue)
+        SELECT (o.created_at AT TIME ZONE 'UTC')::date, i.product_id, sum(i.quantity), sum(i.quantity * i.price_at_purchase)
+        FROM order_items AS i
+        JOIN orders AS o ON o.id = i.order_id AND o.created_at = i.order_created_at
+        WHERE o.status <> 'cancelled' AND i.product_id IS NOT NULL
+        GROUP BY 1, 2
+    """)
+    op.execute("""
+        INSERT INTO order_status_daily (day, status, orders)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, status, count(*)
+        FROM orders
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('order_status_daily')
+    op.drop_index('ix_product_sales_daily_product_day', table_name='product_sales_daily')
+    op.drop_table('product_sales_daily')
+    op.drop_table('sales_daily')
@@ -0,0 +1,42 @@
+"""partial indexes for catalog filters and sorts
+
+Revision ID: 5d2a7c9e14b8
+Revises: c81f4d2e9a63
+Create Date: 2026-10-19 13:05:44.618203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a7c9e14b8'
+down_revision: Union[str, None] = 'c81f4d2e9a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_products_active_price', ['price', 'id'], 'is_active'),
+    ('ix_products_active_created', ['created_at', 'id'], 'is_active'),
+    ('ix_products_active_name', ['name', 'id'], 'is_active'),
+    ('ix_products_in_stock_price', ['price', 'id'], 'is_active AND stock > 0'),
+    ('ix_products_active_owner_created', ['owner_id', 'created_at', 'id'], 'is_active'),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY so a large products table stays writable while the indexes build
+    with op.get_context().autocommit_block():
+        for name, columns, where in INDEXES:
+            op.create_index(
+                name, 'products', columns, unique=False,
+                postgresql_where=sa.text(where), postgresql_concurrently=True, if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='products', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,59 @@
+"""sales rollup buckets
+
+Adds a bucket to the primary key of the daily rollup tables, so the orders of a
+day (and of one product) spread their upserts over several rows instead of all
+waiting on one row lock. Existing rows become bucket 0.
+
+Revision ID: 5f1d9b3c7e20
+Revises: a3f9c7d2e815
+Create Date: 2026-10-20 09:12:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1d9b3c7e20'
+down_revision: Union[str, None] = 'a3f9c7d2e815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TABLES = {
+    'sales_daily': ['day'],
+    'product_sales_daily': ['day', 'product_id'],
+    'order_status_daily': ['day', 'status'],
+}
+
+
+def upgrade() -> None:
+    for table, keys in _TABLES.items():
+        op.add_column(table, sa.Column('bucket', sa.SmallInteger(), server_default='0', nullable=False))
+        op.alter_column(table, 'bucket', server_default=None)
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.create_primary_key(f'{table}_pkey', table, keys + ['bucket'])
+
+
+def downgrade() -> None:
+    # fold the buckets back into one row per key
+    op.execute("""
+        CREATE TEMP TABLE sales_daily_sums AS
+        SELECT day, sum(orders) AS orders, sum(units) AS units, sum(revenue) AS revenue FROM sales_daily GROUP BY day
+    """)
+    op.execute("""
+        CREATE TEMP TABLE product_sales_daily_sums AS
+        SELECT day, product_id, sum(units) AS units, sum(revenue) AS revenue FROM product_sales_daily GROUP BY day, product_id
+    """)
+    op.execute("""
+        CREATE TEMP TABLE order_status_daily_sums AS
+        SELECT day, status, sum(orders) AS orders FROM order_status_daily GROUP BY day, status
+    """)
+    for table, keys in _TABLES.items():
+        op.execute(f"DELETE FROM {table}")
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.drop_column(table, 'bucket')
+        op.create_primary_key(f'{table}_pkey', table, keys)
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_sums")
+        op.execute(f"DROP TABLE {table}_sums")
@@ -0,0 +1,36 @@
+"""product sync batches
+
+Revision ID: 7c1e5a9b3d42
+Revises: 9e3b61f0c5d7
+Create Date: 2026-10-19 15:40:12.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e5a9b3d42'
+down_revision: Union[str, None] = '9e3b61f0c5d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'product_sync_batches',
+        sa.Column('batch_id', sa.String(length=128), nullable=False),
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('batch_id'),
+    )
+    op.create_index(op.f('ix_product_sync_batches_created_at'), 'product_sync_batches', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_sync_batches_created_at'), table_name='product_sync_batches')
+    op.drop_table('product_sync_batches')
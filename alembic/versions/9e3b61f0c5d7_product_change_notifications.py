@@ -0,0 +1,56 @@
+"""notify product changes for in-memory catalog snapshots
+
+Revision ID: 9e3b61f0c5d7
+Revises: 5d2a7c9e14b8
+Create Date: 2026-10-19 14:21:09.772150
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3b61f0c5d7'
+down_revision: Union[str, None] = '5d2a7c9e14b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGGERS = [
+    ('products_notify_insert', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('products_notify_update', 'UPDATE', 'NEW TABLE AS new_rows'),
+    ('products_notify_delete', 'DELETE', 'OLD TABLE AS old_rows'),
+]
+
+
+def upgrade() -> None:
+    # payload: comma-separated ids, 500 per notification (8000-byte payload limit)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION notify_product_changes() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('product_changes', ids)
+            FROM (SELECT string_agg(id::text, ',') AS ids
+                  FROM (SELECT id, (row_number() OVER ()) / 500 AS chunk FROM old_rows) AS numbered
+                  GROUP BY chunk) AS batches;
+        ELSE
+            PERFORM pg_notify('product_changes', ids)
+            FROM (SELECT string_agg(id::text, ',') AS ids
+                  FROM (SELECT id, (row_number() OVER ()) / 500 AS chunk FROM new_rows) AS numbered
+                  GROUP BY chunk) AS batches;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    for name, event, ref in TRIGGERS:
+        op.execute(
+            f"CREATE TRIGGER {name} AFTER {event} ON products "
+            f"REFERENCING {ref} FOR EACH STATEMENT EXECUTE FUNCTION notify_product_changes()"
+        )
+
+
+def downgrade() -> None:
+    for name, _, _ in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON products")
+    op.execute("DROP FUNCTION IF EXISTS notify_product_changes()")
@@ -0,0 +1,29 @@
+"""product updated_at
+
+Revision ID: a3c9e1f27b40
+Revises: 37fe04c7e59e
+Create Date: 2026-10-19 09:12:05.331870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e1f27b40'
+down_revision: Union[str, None] = '37fe04c7e59e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    # existing rows start out as last modified when they were created
+    op.execute("UPDATE products SET updated_at = created_at")
+    op.alter_column('products', 'updated_at', nullable=False, server_default=sa.text('now()'))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'updated_at')
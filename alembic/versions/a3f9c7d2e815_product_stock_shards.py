@@ -0,0 +1,43 @@
+"""product stock shards
+
+Revision ID: a3f9c7d2e815
+Revises: 0b5e8d3f7a21
+Create Date: 2026-10-19 21:05:37.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f9c7d2e815'
+down_revision: Union[str, None] = '0b5e8d3f7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # constant default: no table rewrite
+    op.add_column('products', sa.Column('stock_shards', sa.SmallInteger(), server_default='0', nullable=False))
+    op.create_table(
+        'product_stock_shards',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('shard', sa.SmallInteger(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.CheckConstraint('stock >= 0', name='ck_product_stock_shards_stock'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'shard'),
+    )
+
+
+def downgrade() -> None:
+    # fold sharded stock back into products first
+    op.execute("""
+        UPDATE products AS p SET stock = t.total
+        FROM (SELECT product_id, sum(stock) AS total FROM product_stock_shards GROUP BY product_id) AS t
+        WHERE p.id = t.product_id
+    """)
+    op.drop_table('product_stock_shards')
+    op.drop_column('products', 'stock_shards')
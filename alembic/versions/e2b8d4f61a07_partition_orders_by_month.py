@@ -0,0 +1,156 @@
+"""partition orders and order_items by month
+
+Rebuilds both tables as RANGE partitioned on the order's created_at, one partition
+per month from the oldest order to three months ahead, plus DEFAULT partitions,
+and copies the rows across. Writes to orders must be stopped while it runs.
+
+Revision ID: e2b8d4f61a07
+Revises: 7c1e5a9b3d42
+Create Date: 2026-10-19 16:58:31.402417
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8d4f61a07'
+down_revision: Union[str, None] = '7c1e5a9b3d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3  # later months are created by app.db.partitions.ensure_order_partitions
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partitions(table: str, first: date, last: date) -> None:
+    # same names and UTC bounds as app/db/partitions.py
+    month = first
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month} 00:00:00+00') TO ('{_add_months(month, 1)} 00:00:00+00')"
+        )
+        month = _add_months(month, 1)
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+
+def _set_aside(table: str) -> None:
+    # the old table keeps its rows until they are copied; its sequence survives the drop
+    op.rename_table(table, f'{table}_old')
+    op.execute(f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+
+
+def _take_over(table: str) -> None:
+    op.drop_table(f'{table}_old')
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+
+def upgrade() -> None:
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_index('ix_order_items_product_id', table_name='order_items')
+    op.drop_index('ix_orders_user_id', table_name='orders')
+    _set_aside('order_items')
+    _set_aside('orders')
+
+    op.create_table('orders',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('orders_id_seq')"), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', postgresql.ENUM(name='orderstatus', create_type=False), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)',
+    )
+    # (user_id, created_at) also serves lookups by user_id alone
+    op.create_index('ix_orders_user_created', 'orders', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_orders_created_at', 'orders', ['created_at'], unique=False)
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('order_items_id_seq')"), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('order_created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price_at_purchase', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id', 'order_created_at'], ['orders.id', 'orders.created_at'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id', 'order_created_at'),
+    postgresql_partition_by='RANGE (order_created_at)',
+    )
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_items_product_id'), 'order_items', ['product_id'], unique=False)
+
+    now = datetime.now(timezone.utc)
+    oldest = op.get_bind().execute(sa.text("SELECT min(created_at) FROM orders_old")).scalar() or now
+    oldest = oldest.astimezone(timezone.utc)
+    first, last = date(oldest.year, oldest.month, 1), _add_months(date(now.year, now.month, 1), MONTHS_AHEAD)
+    _create_partitions('orders', first, last)
+    _create_partitions('order_items', first, last)
+
+    op.execute(
+        "INSERT INTO orders (id, user_id, status, total, created_at) "
+        "SELECT id, user_id, status, total, created_at FROM orders_old"
+    )
+    op.execute(
+        "INSERT INTO order_items (id, order_id, order_created_at, product_id, quantity, price_at_purchase) "
+        "SELECT i.id, i.order_id, o.created_at, i.product_id, i.quantity, i.price_at_purchase "
+        "FROM order_items_old AS i JOIN orders_old AS o ON o.id = i.order_id"
+    )
+    _take_over('order_items')
+    _take_over('orders')
+    op.execute("ANALYZE orders")
+    op.execute("ANALYZE order_items")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_items_product_id', table_name='order_items')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_index('ix_orders_created_at', table_name='orders')
+    op.drop_index('ix_orders_user_created', table_name='orders')
+    _set_aside('order_items')
+    _set_aside('orders')
+
+    op.create_table('orders',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('orders_id_seq')"), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', postgresql.ENUM(name='orderstatus', create_type=False), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_orders_user_id'), 'orders', ['user_id'], unique=False)
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('order_items_id_seq')"), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price_at_purchase', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_items_product_id'), 'order_items', ['product_id'], unique=False)
+
+    op.execute(
+        "INSERT INTO orders (id, user_id, status, total, created_at) "
+        "SELECT id, user_id, status, total, created_at FROM orders_old"
+    )
+    op.execute(
+        "INSERT INTO order_items (id, order_id, product_id, quantity, price_at_purchase) "
+        "SELECT id, order_id, product_id, quantity, price_at_purchase FROM order_items_old"
+    )
+    # dropping the partitioned tables drops their partitions too
+    _take_over('order_items')
+    _take_over('orders')
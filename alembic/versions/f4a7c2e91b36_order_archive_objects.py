@@ -0,0 +1,38 @@
+"""order archive objects
+
+Revision ID: f4a7c2e91b36
+Revises: e2b8d4f61a07
+Create Date: 2026-10-19 18:07:44.915230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a7c2e91b36'
+down_revision: Union[str, None] = 'e2b8d4f61a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_archive_objects',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('key', sa.String(length=1024), nullable=False),
+    sa.Column('month', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('min_order_id', sa.Integer(), nullable=False),
+    sa.Column('max_order_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    op.create_index('ix_order_archive_objects_id_range', 'order_archive_objects', ['min_order_id', 'max_order_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_archive_objects_id_range', table_name='order_archive_objects')
+    op.drop_table('order_archive_objects')
@@ -0,0 +1,27 @@
+# app/api/v1/routes_admin.py
+from fastapi import APIRouter, Depends
+
+from app.core.auth import get_current_superuser
+from app.core.cache import caches
+from app.core.metrics import metrics
+from app.db import pg, mongo
+
+router = APIRouter()
+
+# Connection pool statistics for this worker (admin)
+@router.get("/pools")
+async def pool_stats(admin = Depends(get_current_superuser)):
+    stats = {"postgres": pg.pool_stats(), "mongo": mongo.pool_stats()}
+    if pg.replica_engine is not None:
+        stats["postgres_replica"] = {**pg.pool_stats(pg.replica_engine), **pg.replica_monitor.stats()}
+    return stats
+
+# In-process metrics of this worker (admin)
+@router.get("/metrics")
+async def metrics_snapshot(admin = Depends(get_current_superuser)):
+    return metrics.snapshot()
+
+# Cache hit ratios and sizes of this worker (admin)
+@router.get("/caches")
+async def cache_stats(admin = Depends(get_current_superuser)):
+    return {name: cache.stats() for name, cache in caches.items()}
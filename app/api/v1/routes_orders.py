@@ -1,15 +1,55 @@
 # app/api/v1/routes_orders.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, List, Literal, Optional
+import csv
+import io
+import json
 
-from app.db.pg import get_db
+from app.db.pg import get_db, get_read_db
 from app.core.auth import get_current_active_user, get_current_superuser
-from app.repos.order_repo import create_order, get_order, list_all_orders, list_orders_for_user, cancel_order
-from app.schemas.order import OrderCreate, OrderOut
+from app.core.fieldsets import parse_list, project
+from app.repos import sales_repo
+from app.repos.order_repo import create_order, get_order, list_all_orders, list_orders_for_user, cancel_order, load_item_products, stream_order_rows
+from app.db.models import OrderStatus
+from app.schemas.order import OrderCreate, OrderItemOut, OrderOut, DailySalesOut, ProductSalesOut, StatusCountsOut
+from app.schemas.product import ProductOut
 
 router = APIRouter()
 
+ORDER_EXPANSIONS = ("items.product",)
+
+def _parse_shape(fields: Optional[str], expand: Optional[str]):
+    try:
+        return parse_list(fields, OrderOut.model_fields, "fields"), parse_list(expand, ORDER_EXPANSIONS, "expand")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def _render_order(order, fields, products) -> dict:
+    """
+    OrderOut restricted to `fields`; with `products`, each item embeds its product.
+    """
+    data = project(order, [f for f in fields if f != "items"])
+    if "items" in fields:
+        data["items"] = []
+        for item in order.items:
+            out = OrderItemOut.model_validate(item).model_dump()
+            if products is not None:
+                product = products.get(item.product_id)
+                out["product"] = ProductOut.model_validate(product).model_dump() if product else None
+            data["items"].append(out)
+    return data
+
+async def _shaped(db, orders, fields, expand):
+    fields = fields or tuple(OrderOut.model_fields)
+    if expand and "items" not in fields:
+        fields += ("items",)
+    products = await load_item_products(db, orders) if expand else None
+    return jsonable_encoder([_render_order(order, fields, products) for order in orders])
+
 # Create order - authenticated users
 @router.post("/", response_model=OrderOut, status_code=status.HTTP_201_CREATED)
 async def create_order_endpoint(data: OrderCreate, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_active_user)):
@@ -24,18 +64,32 @@ async def create_order_endpoint(data: OrderCreate, db: AsyncSession = Depends(ge
 
 # List user's orders
 @router.get("/", response_model=List[OrderOut])
-async def list_orders(limit: int = Query(50, le=200), offset: int = 0, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_active_user)):
-    orders = await list_orders_for_user(db, user_id=current_user.id, limit=limit, offset=offset)
-    return orders
+async def list_orders(
+    limit: int = Query(50, le=200),
+    offset: int = 0,
+    fields: Optional[str] = Query(None, description="Comma-separated OrderOut fields to return"),
+    expand: Optional[str] = Query(None, description="items.product embeds each item's product"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(get_current_active_user),
+):
+    selected, expansions = _parse_shape(fields, expand)
+    with_items = selected is None or "items" in selected or bool(expansions)
+    orders = await list_orders_for_user(db, user_id=current_user.id, limit=limit, offset=offset, with_items=with_items, fields=selected)
+    if selected is None and expansions is None:
+        return orders
+    return JSONResponse(await _shaped(db, orders, selected, expansions))
 
 # Get single order (owner or admin)
 @router.get("/{order_id}", response_model=OrderOut)
-async def get_order_endpoint(order_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_active_user)):
+async def get_order_endpoint(order_id: int, expand: Optional[str] = Query(None, description="items.product embeds each item's product"), db: AsyncSession = Depends(get_db), current_user = Depends(get_current_active_user)):
+    _, expansions = _parse_shape(None, expand)
     order = await get_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if order.user_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not authorized")
+    if expansions:
+        return JSONResponse((await _shaped(db, [order], None, expansions))[0])
     return order
 
 # Cancel order - owner or admin
@@ -56,3 +110,102 @@ async def cancel_order_endpoint(order_id: int, db: AsyncSession = Depends(get_db
 @router.get("/admin/all", response_model=List[OrderOut])
 async def admin_list_all(limit: int = Query(100, le=500), offset: int = 0, db: AsyncSession = Depends(get_db), admin = Depends(get_current_superuser)):
     return await list_all_orders(db, limit=limit, offset=offset)
+
+# --- Streaming export ---
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_CSV_COLUMNS = ["order_id", "user_id", "status", "total", "created_at", "item_id", "product_id", "quantity", "price_at_purchase"]
+
+def _export_value(value):
+    if isinstance(value, OrderStatus):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def _ndjson(rows: AsyncIterator) -> AsyncIterator[str]:
+    """
+    One JSON object per order with its items nested; rows arrive grouped by order.
+    """
+    order = None
+    async for row in rows:
+        if order is None or order["id"] != row.order_id:
+            if order is not None:
+                yield json.dumps(order) + "\n"
+            order = {
+                "id": row.order_id, "user_id": row.user_id, "status": _export_value(row.status),
+                "total": row.total, "created_at": _export_value(row.created_at), "items": [],
+            }
+        if row.item_id is not None:
+            order["items"].append({
+                "id": row.item_id, "product_id": row.product_id,
+                "quantity": row.quantity, "price_at_purchase": row.price_at_purchase,
+            })
+    if order is not None:
+        yield json.dumps(order) + "\n"
+
+async def _csv(rows: AsyncIterator) -> AsyncIterator[str]:
+    """
+    One line per order item, order columns repeated.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    async for row in rows:
+        writer.writerow([_export_value(getattr(row, column)) for column in EXPORT_CSV_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+async def _chunked(lines: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    # coalesce lines into larger writes; one send per row would dominate the cost
+    parts, size = [], 0
+    async for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(parts).encode()
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode()
+
+@router.get("/admin/export")
+async def admin_export(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    order_status: Optional[OrderStatus] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_read_db),
+    admin = Depends(get_current_superuser),
+):
+    # the session dependency stays open until the response has been sent, so the
+    # generator below can keep reading from its server-side cursor
+    rows = stream_order_rows(db, created_after=created_after, created_before=created_before, status=order_status)
+    encode = _ndjson if format == "ndjson" else _csv
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        _chunked(encode(rows)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'},
+    )
+
+# --- Sales analytics (admin), from the rollup tables; days are UTC, both ends inclusive ---
+def _stats_range(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+@router.get("/admin/stats/daily", response_model=List[DailySalesOut])
+async def admin_daily_sales(start: Optional[date] = None, end: Optional[date] = None, db: AsyncSession = Depends(get_read_db), admin = Depends(get_current_superuser)):
+    # days without sales are omitted
+    return await sales_repo.daily_sales(db, *_stats_range(start, end))
+
+@router.get("/admin/stats/products", response_model=List[ProductSalesOut])
+async def admin_top_products(start: Optional[date] = None, end: Optional[date] = None, limit: int = Query(20, ge=1, le=500), db: AsyncSession = Depends(get_read_db), admin = Depends(get_current_superuser)):
+    return await sales_repo.top_products(db, *_stats_range(start, end), limit=limit)
+
+@router.get("/admin/stats/status", response_model=StatusCountsOut)
+async def admin_status_counts(start: Optional[date] = None, end: Optional[date] = None, db: AsyncSession = Depends(get_read_db), admin = Depends(get_current_superuser)):
+    return {"counts": await sales_repo.status_counts(db, *_stats_range(start, end))}
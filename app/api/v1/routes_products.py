@@ -1,13 +1,22 @@
 # app/api/v1/routes_products.py
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from app.db.pg import get_db
+from app.db.pg import get_db, get_read_db, db_released
 from app.core.auth import get_current_active_user, get_current_superuser
-from app.repos import product_repo
-from app.schemas.product import ProductCreate, ProductUpdate, ProductOut
+from app.repos import product_repo, user_repo
+from app.schemas.product import ProductCreate, ProductUpdate, ProductOut, ProductSearchPage, ProductSuggestion, ProductBatch, ProductBatchRequest, ProductImportRow, ProductImportResult, ProductSyncRequest, ProductSyncResult, RelatedProduct, RelatedProducts, ProductStockShardsUpdate, ProductStockShardsOut, MAX_PRODUCT_ID
 from app.core.s3 import upload_file, generate_presigned_url
+from app.core.http_cache import conditional, listing_validators, product_validators
+from app.core.response_cache import PRODUCT_LIST_TAG, product_tag
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.fieldsets import parse_list, project
+from app.core.bulk_import import ImportFormatError, read_records, validated_batches
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -17,19 +26,149 @@ async def create_product(data: ProductCreate, db: AsyncSession = Depends(get_db)
     product = await product_repo.create_product(db, owner_id=current_admin.id, name=data.name, price=data.price, stock=data.stock, description=data.description)
     return product
 
+IMPORT_MEDIA_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/json": "ndjson"}
+
+# Bulk import (admin): streamed CSV (with header) or NDJSON of ProductImportRow;
+# rows with an id update that product, the rest are created for owner_id
+@router.post("/import", response_model=ProductImportResult)
+async def import_products(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults from Content-Type"),
+    owner_id: Optional[int] = Query(None, description="Seller the products belong to; defaults to the caller"),
+    db: AsyncSession = Depends(get_db),
+    current_admin = Depends(get_current_superuser),
+):
+    format = format or IMPORT_MEDIA_TYPES.get(request.headers.get("content-type", "").split(";")[0].strip())
+    if format is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+    owner_id = owner_id or current_admin.id
+    if await user_repo.get_user(db, owner_id) is None:
+        raise HTTPException(status_code=404, detail="Owner not found")
+    records = read_records(request.stream(), format, columns=ProductImportRow.model_fields)
+    batches = validated_batches(records, ProductImportRow, settings.IMPORT_BATCH_ROWS, settings.IMPORT_MAX_ROWS)
+    try:
+        inserted, updated, rejected = await product_repo.import_products(db, owner_id, batches)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    errors = [{"row": row, "error": error} for row, error in rejected[:settings.IMPORT_MAX_ERRORS]]
+    return {"inserted": inserted, "updated": updated, "rejected": len(rejected), "errors": errors}
+
+# Stock/price sync (admin): absolute or delta changes for many products in one
+# transaction; safe to retry with the same batch_id
+@router.post("/sync", response_model=ProductSyncResult)
+async def sync_stock_and_prices(data: ProductSyncRequest, db: AsyncSession = Depends(get_db), current_admin = Depends(get_current_superuser)):
+    try:
+        return await product_repo.sync_stock_and_prices(db, data.batch_id, data.changes)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+# Sharded stock (admin) for products bought by many at once: checkouts take from
+# one of N stock rows instead of queueing on the product row
+@router.put("/{product_id}/stock-shards", response_model=ProductStockShardsOut)
+async def set_stock_shards(product_id: int, data: ProductStockShardsUpdate, db: AsyncSession = Depends(get_db), current_admin = Depends(get_current_superuser)):
+    product = await product_repo.set_stock_shards(db, product_id, data.shards)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
 # List products - public
 @router.get("/", response_model=List[ProductOut])
-async def list_products(limit: int = Query(50, le=200), offset: int = 0, db: AsyncSession = Depends(get_db)):
-    return await product_repo.list_products(db, limit=limit, offset=offset)
+async def list_products(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, le=200),
+    offset: int = 0,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    owner_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    sort: Literal["id", "price", "-price", "newest", "name"] = "id",
+    fields: Optional[str] = Query(None, description="Comma-separated ProductOut fields to return"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        selected = parse_list(fields, ProductOut.model_fields, "fields")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    products = await product_repo.list_products(
+        db, limit=limit, offset=offset, min_price=min_price, max_price=max_price, in_stock=in_stock,
+        owner_id=owner_id, created_after=created_after, created_before=created_before, sort=sort, fields=selected,
+    )
+    response.headers["Surrogate-Key"] = PRODUCT_LIST_TAG
+    variant = ";" + ",".join(selected) if selected else ""
+    not_modified = conditional(request, response, *listing_validators(products, variant))
+    if not_modified is not None:
+        return not_modified
+    if selected:
+        # partial objects don't fit response_model; keep the headers set above
+        return JSONResponse([project(p, selected) for p in products], headers=dict(response.headers))
+    return products
+
+# Search products - public; ranked full-text + typo-tolerant name match
+@router.get("/search", response_model=ProductSearchPage)
+async def search_products(response: Response, q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    after = None
+    if cursor is not None:
+        try:
+            rank, last_id = decode_cursor(cursor, 2)
+            after = (float(rank), int(last_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await product_repo.search_products(db, q, limit=limit, after=after)
+    response.headers["Surrogate-Key"] = PRODUCT_LIST_TAG
+    next_cursor = None
+    if len(rows) == limit:
+        last, rank = rows[-1]
+        next_cursor = encode_cursor(rank, last.id)
+    return ProductSearchPage(items=[product for product, _ in rows], next_cursor=next_cursor)
+
+# Autocomplete product names - public; answered from the in-memory prefix index
+@router.get("/autocomplete", response_model=List[ProductSuggestion])
+async def autocomplete_products(prefix: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=50)):
+    return [ProductSuggestion(id=pid, name=name) for pid, name in product_repo.autocomplete_index.complete(prefix, limit)]
+
+# Batch lookup - public; e.g. cart and order pages. POST for lists too long for a URL
+@router.get("/batch", response_model=ProductBatch)
+async def get_products_batch(ids: str = Query(..., description="Comma-separated product ids", max_length=2000), db: AsyncSession = Depends(get_read_db)):
+    try:
+        product_ids = [int(pid) for pid in ids.split(",") if pid.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not product_ids or len(product_ids) > 200:
+        raise HTTPException(status_code=400, detail="Between 1 and 200 ids per GET; use POST for more")
+    if not all(1 <= pid <= MAX_PRODUCT_ID for pid in product_ids):
+        raise HTTPException(status_code=422, detail=f"ids must be between 1 and {MAX_PRODUCT_ID}")
+    products, missing = await product_repo.get_products(db, product_ids)
+    return ProductBatch(items=products, missing=missing)
+
+@router.post("/batch", response_model=ProductBatch)
+async def post_products_batch(data: ProductBatchRequest, db: AsyncSession = Depends(get_read_db)):
+    products, missing = await product_repo.get_products(db, data.ids)
+    return ProductBatch(items=products, missing=missing)
 
 # Get product
 @router.get("/{product_id}", response_model=ProductOut)
-async def get_product(product_id: int, db: AsyncSession = Depends(get_db)):
+async def get_product(product_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
     product = await product_repo.get_product(db, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    response.headers["Surrogate-Key"] = product_tag(product.id)
+    not_modified = conditional(request, response, *product_validators(product))
+    if not_modified is not None:
+        return not_modified
     return product
 
+# "Frequently bought together": answered from the worker's memory-mapped
+# neighbour file, no database access
+@router.get("/{product_id}/related", response_model=RelatedProducts)
+async def related_products(product_id: int, limit: int = Query(10, ge=1, le=50)):
+    if not product_repo.related_products.ready:
+        raise HTTPException(status_code=503, detail="Related products are not available")
+    related = product_repo.related_products.lookup(product_id, limit)
+    return RelatedProducts(product_id=product_id, related=[RelatedProduct(id=pid, score=score) for pid, score in related])
+
 # Update product - only owner or admin
 @router.put("/{product_id}", response_model=ProductOut)
 async def update_product(product_id: int, data: ProductUpdate, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_active_user)):
@@ -62,8 +201,10 @@ async def upload_image(product_id: int, file: UploadFile = File(...), db: AsyncS
     if product.owner_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    content = await file.read()
-    file_key = upload_file(content, file.filename, file.content_type, user_id=current_user.id)
+    # don't keep a pooled connection busy while the upload is read and sent to S3
+    async with db_released(db):
+        content = await file.read()
+        file_key = await run_in_threadpool(upload_file, content, file.filename, file.content_type, user_id=current_user.id)
     updated = await product_repo.update_product(db, product, image_key=file_key)
     return updated
 
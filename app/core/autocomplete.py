@@ -0,0 +1,101 @@
+# app/core/autocomplete.py
+"""
+Per-worker prefix index over active product names for typeahead. Every word start
+of a name is a key ("wireless mouse" is found by "wir" and "mou"); keys live in a
+sorted array searched with bisect, and answers for short prefixes are memoized
+because their matching ranges are the widest.
+"""
+import heapq
+import re
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+
+from app.core.metrics import metrics
+
+_SPACES = re.compile(r"\s+")
+# sorts after any character that can follow a prefix in a key
+_HIGH = "\U0010ffff"
+
+
+def normalize(text: str) -> str:
+    return _SPACES.sub(" ", text.casefold()).strip()
+
+
+def _keys_for(name: str) -> list[str]:
+    words = normalize(name).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class AutocompleteIndex:
+    def __init__(self, memo_prefix_len: int = 2, memo_limit: int = 20):
+        self.memo_prefix_len = memo_prefix_len
+        self.memo_limit = memo_limit
+        self._keys: list[tuple[str, int]] = []
+        self._products: dict[int, tuple[str, float]] = {}  # id -> (name, popularity)
+        self._memo: dict[str, list[int]] = {}
+
+    def build(self, rows: Iterable[tuple[int, str, float]]) -> None:
+        """
+        Replace the whole index from (id, name, popularity) rows.
+        """
+        products = {pid: (name, float(popularity)) for pid, name, popularity in rows}
+        keys = sorted((key, pid) for pid, (name, _) in products.items() for key in _keys_for(name))
+        # swap in one step so concurrent lookups see either the old or the new index
+        self._keys, self._products, self._memo = keys, products, {}
+
+    def upsert(self, product_id: int, name: str, popularity: Optional[float] = None) -> None:
+        old = self._products.get(product_id)
+        if popularity is None:
+            popularity = old[1] if old else 0.0
+        if old is not None and old[0] == name:
+            self._products[product_id] = (name, popularity)
+        else:
+            self._drop_keys(product_id)
+            self._products[product_id] = (name, popularity)
+            for key in _keys_for(name):
+                insort(self._keys, (key, product_id))
+        self._memo.clear()
+
+    def remove(self, product_id: int) -> None:
+        if product_id in self._products:
+            self._drop_keys(product_id)
+            del self._products[product_id]
+            self._memo.clear()
+
+    def _drop_keys(self, product_id: int) -> None:
+        old = self._products.get(product_id)
+        if old is None:
+            return
+        for key in _keys_for(old[0]):
+            i = bisect_left(self._keys, (key, product_id))
+            if i < len(self._keys) and self._keys[i] == (key, product_id):
+                del self._keys[i]
+
+    def complete(self, prefix: str, limit: int = 10) -> list[tuple[int, str]]:
+        """
+        Up to `limit` (id, name) pairs whose name has a word starting with `prefix`,
+        most popular first.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        memoize = len(prefix) <= self.memo_prefix_len and limit <= self.memo_limit
+        ids = self._memo.get(prefix) if memoize else None
+        if ids is None:
+            ids = self._top(prefix, self.memo_limit if memoize else limit)
+            if memoize:
+                self._memo[prefix] = ids
+        metrics.incr("autocomplete_lookups")
+        products = self._products
+        return [(pid, products[pid][0]) for pid in ids[:limit] if pid in products]
+
+    def _top(self, prefix: str, limit: int) -> list[int]:
+        keys = self._keys
+        lo = bisect_left(keys, (prefix,))
+        hi = bisect_left(keys, (prefix + _HIGH,), lo)
+        matches = {pid for _, pid in keys[lo:hi]}
+        products = self._products
+        return heapq.nlargest(limit, matches, key=lambda pid: (products[pid][1], -pid))
+
+    def __len__(self) -> int:
+        return len(self._products)
@@ -0,0 +1,135 @@
+# app/core/bulk_import.py
+"""
+Streaming CSV / NDJSON readers for bulk imports: request or file bytes in,
+validated batches out, never holding more than one batch in memory.
+"""
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Iterable, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+FORMATS = ("csv", "ndjson")
+
+
+class ImportFormatError(ValueError):
+    """
+    The input as a whole is unusable (bad encoding, bad CSV header, too many rows);
+    problems with single rows are reported per row instead.
+    """
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # newline kept, so CSV fields with embedded newlines can be reassembled
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in chunks:
+            lines = (pending + decoder.decode(chunk)).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(f"input is not valid UTF-8: {e.reason}") from None
+    if pending:
+        yield pending
+
+
+async def _csv_records(lines: AsyncIterator[str], columns: Optional[set[str]]) -> AsyncIterator[tuple[int, dict | str]]:
+    header, row = None, 0
+    buffered, quotes = [], 0
+    async for line in lines:
+        buffered.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            # inside a quoted field; the record continues on the next line
+            continue
+        text = "".join(buffered)
+        buffered, quotes = [], 0
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            if header is None:
+                raise ImportFormatError(f"unreadable CSV header: {e}") from None
+            row += 1
+            yield row, str(e)
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            unknown = [name for name in header if columns is not None and name not in columns]
+            if unknown or len(set(header)) != len(header):
+                raise ImportFormatError(f"CSV header must be distinct columns from: {', '.join(sorted(columns or header))}")
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, f"expected {len(header)} values, got {len(values)}"
+            continue
+        # empty cells fall back to the model's defaults
+        yield row, {name: value for name, value in zip(header, values) if value != ""}
+    if buffered:
+        row += 1
+        yield row, "unterminated quoted field"
+
+
+async def _ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | str]]:
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, f"invalid JSON: {e}"
+            continue
+        yield row, record if isinstance(record, dict) else "expected a JSON object"
+
+
+def read_records(chunks: AsyncIterator[bytes], format: str, columns: Optional[Iterable[str]] = None) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    (row, record) pairs, numbered from 1 over non-blank data rows; `record` is an
+    error message for rows that couldn't be parsed. CSV needs a header row, limited
+    to `columns` when given.
+    """
+    if format == "csv":
+        return _csv_records(_lines(chunks), set(columns) if columns is not None else None)
+    if format == "ndjson":
+        return _ndjson_records(_lines(chunks))
+    raise ImportFormatError(f"format must be one of: {', '.join(FORMATS)}")
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in error.errors())
+
+
+async def validated_batches(
+    records: AsyncIterator[tuple[int, dict | str]],
+    model: Type[BaseModel],
+    batch_size: int,
+    max_rows: Optional[int] = None,
+) -> AsyncIterator[tuple[list[tuple[int, BaseModel]], list[tuple[int, str]]]]:
+    """
+    Groups records into batches of up to `batch_size` rows, each yielded as
+    (valid, rejected): (row, model instance) and (row, error message) pairs.
+    Raises ImportFormatError once more than `max_rows` rows have been read.
+    """
+    valid, rejected = [], []
+    async for row, record in records:
+        if max_rows is not None and row > max_rows:
+            raise ImportFormatError(f"more than {max_rows} rows; split the input")
+        if isinstance(record, str):
+            rejected.append((row, record))
+        else:
+            try:
+                valid.append((row, model.model_validate(record)))
+            except ValidationError as e:
+                rejected.append((row, _describe(e)))
+        if len(valid) + len(rejected) >= batch_size:
+            yield valid, rejected
+            valid, rejected = [], []
+    if valid or rejected:
+        yield valid, rejected
@@ -0,0 +1,221 @@
+# app/core/cache.py
+"""
+Pluggable read-through caches. Values are plain JSON-compatible dicts so the same
+cache can live in process (LRU) or in a shared Redis-compatible store.
+"""
+from __future__ import annotations
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryLRUBackend:
+    """
+    Per-worker LRU with per-entry TTL.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def get_many(self, keys: list[str]) -> list[Optional[Any]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def set_many(self, items: dict[str, Any], ttl: int) -> None:
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def clear(self) -> None:
+        self._data.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Shared backend over any client with the redis.asyncio get/mget/set/pipeline/delete/scan_iter API
+    (Redis, Valkey, KeyDB, or an in-memory stand-in in tests).
+    """
+
+    def __init__(self, client, prefix: str):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def get_many(self, keys: list[str]) -> list[Optional[Any]]:
+        if not keys:
+            return []
+        # one round trip for the whole batch
+        raws = await self.client.mget([self.prefix + key for key in keys])
+        return [json.loads(raw) if raw is not None else None for raw in raws]
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    async def set_many(self, items: dict[str, Any], ttl: int) -> None:
+        if not items:
+            return
+        # pipelined: one round trip; MSET can't set a TTL
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self.prefix + key, json.dumps(value), ex=ttl)
+            await pipe.execute()
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def clear(self) -> None:
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class ReadThroughCache:
+    """
+    Wraps a backend with hit/miss accounting. Backend failures are logged and
+    treated as misses so that a cache outage never fails a request.
+    """
+
+    def __init__(self, name: str, backend, ttl: int):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as exc:
+            logger.warning("Cache %s get failed: %s", self.name, exc)
+            value = None
+        if value is None:
+            self.misses += 1
+            metrics.incr("cache_misses", self.name)
+        else:
+            self.hits += 1
+            metrics.incr("cache_hits", self.name)
+        return value
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        """
+        Cached values for `keys`; misses are simply absent from the result.
+        """
+        try:
+            values = await self.backend.get_many(keys)
+        except Exception as exc:
+            logger.warning("Cache %s get_many failed: %s", self.name, exc)
+            values = [None] * len(keys)
+        found = {key: value for key, value in zip(keys, values) if value is not None}
+        hits, misses = len(found), len(keys) - len(found)
+        self.hits += hits
+        self.misses += misses
+        if hits:
+            metrics.incr("cache_hits", self.name, hits)
+        if misses:
+            metrics.incr("cache_misses", self.name, misses)
+        return found
+
+    async def set(self, key: str, value: Any) -> None:
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as exc:
+            logger.warning("Cache %s set failed: %s", self.name, exc)
+
+    async def set_many(self, items: dict[str, Any]) -> None:
+        try:
+            await self.backend.set_many(items, self.ttl)
+        except Exception as exc:
+            logger.warning("Cache %s set_many failed: %s", self.name, exc)
+
+    async def invalidate(self, *keys: str) -> None:
+        try:
+            await self.backend.delete(*keys)
+        except Exception as exc:
+            logger.warning("Cache %s invalidation failed: %s", self.name, exc)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": self.backend.size(),
+            "ttl": self.ttl,
+        }
+
+
+_shared_client = None
+caches: dict[str, ReadThroughCache] = {}
+
+
+def _shared_backend(prefix: str) -> RedisBackend:
+    global _shared_client
+    if _shared_client is None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install .[cache])") from exc
+        _shared_client = redis.from_url(settings.CACHE_URL)
+    return RedisBackend(_shared_client, prefix)
+
+
+def create_cache(name: str, ttl: int, max_entries: int) -> ReadThroughCache:
+    """
+    Build (and register for the admin stats) a named cache on the configured backend.
+    """
+    if settings.CACHE_BACKEND == "redis":
+        backend = _shared_backend(prefix=f"{settings.PROJECT_NAME}:{name}:")
+    else:
+        backend = MemoryLRUBackend(max_entries=max_entries)
+    cache = ReadThroughCache(name, backend, ttl)
+    caches[name] = cache
+    return cache
+
+
+async def close_caches() -> None:
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
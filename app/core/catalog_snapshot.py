@@ -0,0 +1,392 @@
+# app/core/catalog_snapshot.py
+"""
+Columnar in-memory snapshot of active products (NumPy; pip install .[snapshot]).
+Listing filters, sorts and pages are answered with vectorized operations over the
+columns instead of a query. Rows are updated in place and deletions leave
+tombstones that are compacted away once they make up a quarter of the arrays.
+
+The snapshot can be saved to a file that a new worker memory-maps on boot instead
+of loading the catalog from Postgres: the columns are used in place (copy-on-write)
+and strings are only decoded for the rows a query returns.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from app.core import mapped_file
+from app.core.metrics import metrics
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional extra
+    np = None
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+_MAGIC = b"CATSNAP1"
+# bump when the saved columns change; files of another version are ignored
+_FORMAT = 1
+_STRINGS = ("names", "descriptions", "image_keys")
+
+
+def _micros(value: datetime) -> int:
+    if value.tzinfo is None:
+        # naive values come from datetime.utcnow() defaults
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _US
+
+
+def _datetime(micros) -> datetime:
+    return _EPOCH + int(micros) * _US
+
+
+@dataclass
+class SnapshotProduct:
+    """
+    Read-only stand-in for a Product row; has the attributes ProductOut and the
+    HTTP validators read.
+    """
+    id: int
+    owner_id: int
+    name: str
+    description: Optional[str]
+    price: float
+    stock: int
+    image_key: Optional[str]
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+
+class _MappedStrings:
+    """
+    List of Optional[str] over a mapped file, decoded one item at a time on access.
+    Assignments and appends are kept aside; the mapping is never written.
+    """
+
+    def __init__(self, blob, offsets, nulls):
+        self._blob, self._offsets, self._nulls = blob, offsets, nulls
+        self._base = len(nulls)
+        self._changed: dict[int, Optional[str]] = {}
+        self._added: list[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return self._base + len(self._added)
+
+    def __getitem__(self, i) -> Optional[str]:
+        i = int(i)
+        if i >= self._base:
+            return self._added[i - self._base]
+        if i in self._changed:
+            return self._changed[i]
+        if self._nulls[i]:
+            return None
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode()
+
+    def __setitem__(self, i, value: Optional[str]) -> None:
+        i = int(i)
+        if i >= self._base:
+            self._added[i - self._base] = value
+        else:
+            self._changed[i] = value
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def append(self, value: Optional[str]) -> None:
+        self._added.append(value)
+
+    def copy(self) -> "_MappedStrings":
+        other = _MappedStrings(self._blob, self._offsets, self._nulls)
+        other._changed, other._added = dict(self._changed), list(self._added)
+        return other
+
+
+def _encode_strings(values) -> tuple:
+    encoded = [b"" if v is None else v.encode() for v in values]
+    lengths = np.fromiter(map(len, encoded), "int64", len(encoded))
+    nulls = np.fromiter((v is None for v in values), "bool", len(encoded))
+    return np.frombuffer(b"".join(encoded), dtype="uint8"), np.r_[0, np.cumsum(lengths)].astype("int64"), nulls
+
+
+def _name_ranks(names) -> "np.ndarray":
+    # code point order; Postgres' collation may order some names differently
+    order = np.argsort(np.array(list(names), dtype=str), kind="stable")
+    rank = np.empty(len(order), dtype="int32")
+    rank[order] = np.arange(len(order), dtype="int32")
+    return rank
+
+
+class CatalogSnapshot:
+    def __init__(self):
+        self.ready = False
+        self._size = 0
+        self._rows: dict[int, int] = {}  # product id -> row
+        self._cols: dict = {}
+        # interned names; codes index into _names, ranks give name order. For a
+        # mapped snapshot _name_codes is built on the first new name.
+        self._names: list[str] = []
+        self._name_codes: Optional[dict[str, int]] = {}
+        self._name_rank = None
+        # per row; lists, or _MappedStrings when mapped from a file
+        self._descriptions: list[Optional[str]] = []
+        self._image_keys: list[Optional[str]] = []
+        self._tombstones = 0
+
+    def clear(self) -> None:
+        """
+        Drop all rows; queries go back to the database until the next build.
+        """
+        self.__init__()
+
+    def _require_numpy(self) -> None:
+        if np is None:
+            raise RuntimeError("CATALOG_SNAPSHOT_ENABLED requires numpy (pip install .[snapshot])")
+
+    def build(self, products: Iterable) -> None:
+        """
+        Replace the snapshot with `products` (objects with Product's attributes).
+        """
+        self._require_numpy()
+        products = [p for p in products if p.is_active]
+        n = len(products)
+        names: list[str] = []
+        name_codes: dict[str, int] = {}
+        codes = np.empty(n, dtype="int32")
+        for i, p in enumerate(products):
+            code = name_codes.get(p.name)
+            if code is None:
+                code = name_codes[p.name] = len(names)
+                names.append(p.name)
+            codes[i] = code
+        cols = {
+            "id": np.fromiter((p.id for p in products), "int64", n),
+            "owner_id": np.fromiter((p.owner_id for p in products), "int64", n),
+            "price": np.fromiter((p.price for p in products), "float64", n),
+            "stock": np.fromiter((p.stock for p in products), "int64", n),
+            "created_at": np.fromiter((_micros(p.created_at) for p in products), "int64", n),
+            "updated_at": np.fromiter((_micros(p.updated_at or p.created_at) for p in products), "int64", n),
+            "name_code": codes,
+            "alive": np.ones(n, dtype="bool"),
+        }
+        rows = {int(pid): i for i, pid in enumerate(cols["id"])}
+        descriptions = [p.description for p in products]
+        image_keys = [p.image_key for p in products]
+        # swap in one step; queries never see a half-built snapshot
+        (self._cols, self._rows, self._names, self._name_codes, self._descriptions, self._image_keys,
+         self._size, self._tombstones, self._name_rank) = (cols, rows, names, name_codes, descriptions, image_keys, n, 0, None)
+        self.ready = True
+        metrics.gauge("catalog_snapshot_rows", n)
+
+    def apply(self, changed: Iterable, removed_ids: Iterable[int] = ()) -> None:
+        """
+        Upsert `changed` products (inactive ones are removed) and drop `removed_ids`.
+        """
+        for pid in removed_ids:
+            self._remove(pid)
+        for p in changed:
+            if not p.is_active:
+                self._remove(p.id)
+                continue
+            row = self._rows.get(p.id)
+            if row is None:
+                row = self._append()
+                self._rows[p.id] = row
+                self._descriptions.append(None)
+                self._image_keys.append(None)
+                name_code = self._intern(p.name)
+            else:
+                name_code = self._cols["name_code"][row]
+                if self._names[name_code] != p.name:
+                    name_code = self._intern(p.name)
+            cols = self._cols
+            cols["id"][row] = p.id
+            cols["owner_id"][row] = p.owner_id
+            cols["price"][row] = p.price
+            cols["stock"][row] = p.stock
+            cols["created_at"][row] = _micros(p.created_at)
+            cols["updated_at"][row] = _micros(p.updated_at or p.created_at)
+            cols["alive"][row] = True
+            cols["name_code"][row] = name_code
+            self._descriptions[row] = p.description
+            self._image_keys[row] = p.image_key
+        if self._tombstones * 4 > max(self._size, 1024):
+            self._compact()
+        metrics.gauge("catalog_snapshot_rows", len(self._rows))
+
+    def _intern(self, name: str) -> int:
+        if self._name_codes is None:
+            self._name_codes = {n: code for code, n in enumerate(self._names)}
+        code = self._name_codes.get(name)
+        if code is None:
+            code = self._name_codes[name] = len(self._names)
+            self._names.append(name)
+            self._name_rank = None  # recomputed on the next name-sorted query
+        return code
+
+    def _append(self) -> int:
+        capacity = len(self._cols["id"])
+        if self._size == capacity:
+            grow = max(1024, capacity // 2)
+            for key, col in self._cols.items():
+                self._cols[key] = np.concatenate([col, np.zeros(grow, dtype=col.dtype)])
+        self._size += 1
+        return self._size - 1
+
+    def _remove(self, pid: int) -> None:
+        row = self._rows.pop(pid, None)
+        if row is not None:
+            self._cols["alive"][row] = False
+            self._descriptions[row] = self._image_keys[row] = None
+            self._tombstones += 1
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._cols["alive"][: self._size])
+        self._cols = {key: col[keep] for key, col in self._cols.items()}
+        self._descriptions = [self._descriptions[i] for i in keep]
+        self._image_keys = [self._image_keys[i] for i in keep]
+        self._rows = {int(pid): i for i, pid in enumerate(self._cols["id"])}
+        self._size, self._tombstones = len(keep), 0
+
+    def _ranks(self):
+        if self._name_rank is None:
+            self._name_rank = _name_ranks(self._names)
+        return self._name_rank
+
+    def query(self, limit: int = 50, offset: int = 0, *, min_price: Optional[float] = None, max_price: Optional[float] = None, in_stock: bool = False, owner_id: Optional[int] = None, created_after: Optional[datetime] = None, created_before: Optional[datetime] = None, sort: str = "id") -> list[SnapshotProduct]:
+        """
+        Same filters and sorts as product_repo.listing_query, over active products.
+        """
+        n = self._size
+        c = {key: col[:n] for key, col in self._cols.items()}
+        mask = c["alive"].copy()
+        if min_price is not None:
+            mask &= c["price"] >= min_price
+        if max_price is not None:
+            mask &= c["price"] <= max_price
+        if in_stock:
+            mask &= c["stock"] > 0
+        if owner_id is not None:
+            mask &= c["owner_id"] == owner_id
+        if created_after is not None:
+            mask &= c["created_at"] >= _micros(created_after)
+        if created_before is not None:
+            mask &= c["created_at"] < _micros(created_before)
+        rows = np.flatnonzero(mask)
+
+        ids = c["id"][rows]
+        if sort == "price":
+            primary, tiebreak = c["price"][rows], ids
+        elif sort == "-price":
+            primary, tiebreak = -c["price"][rows], -ids
+        elif sort == "newest":
+            primary, tiebreak = -c["created_at"][rows], -ids
+        elif sort == "name":
+            primary, tiebreak = self._ranks()[c["name_code"][rows]], ids
+        else:
+            primary, tiebreak = ids, ids
+        page = rows[_top_k(primary, tiebreak, offset + limit)][offset:]
+        metrics.incr("catalog_snapshot_queries")
+        return [self._product(int(row)) for row in page]
+
+    def _product(self, row: int) -> SnapshotProduct:
+        c = self._cols
+        return SnapshotProduct(
+            id=int(c["id"][row]),
+            owner_id=int(c["owner_id"][row]),
+            name=self._names[c["name_code"][row]],
+            description=self._descriptions[row],
+            price=float(c["price"][row]),
+            stock=int(c["stock"][row]),
+            image_key=self._image_keys[row],
+            is_active=True,
+            created_at=_datetime(c["created_at"][row]),
+            updated_at=_datetime(c["updated_at"][row]),
+        )
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def diff_ids(self, ids) -> tuple[list[int], list[int]]:
+        """
+        Compared with `ids` (all active product ids): the ids only the snapshot
+        has, and the ids it is missing.
+        """
+        n = self._size
+        have = self._cols["id"][:n][self._cols["alive"][:n]]
+        ids = np.fromiter(ids, "int64")
+        # both sides are unique ids; saying so skips an extra sort of each
+        return np.setdiff1d(have, ids, assume_unique=True).tolist(), np.setdiff1d(ids, have, assume_unique=True).tolist()
+
+    def export(self) -> dict:
+        """
+        A consistent copy to pass to save(), possibly from another thread: the
+        columns are copied and the string lists copied shallowly.
+        """
+        n = self._size
+
+        def strings(values):
+            return values.copy() if isinstance(values, _MappedStrings) else list(values)
+
+        return {
+            "cols": {key: col[:n].copy() for key, col in self._cols.items()},
+            "names": strings(self._names), "descriptions": strings(self._descriptions),
+            "image_keys": strings(self._image_keys), "name_rank": self._name_rank,
+            "tombstones": self._tombstones,
+        }
+
+    def load_file(self, path: str) -> datetime:
+        """
+        Replace the snapshot with the one saved at path, mapped rather than read,
+        and return its watermark: changes made after it may be missing. Raises
+        ValueError for a file of another format.
+        """
+        self._require_numpy()
+        arrays, meta = mapped_file.load(path, _MAGIC, mode="c")
+        if meta.get("format") != _FORMAT:
+            raise ValueError(f"{path} has snapshot format {meta.get('format')}, expected {_FORMAT}")
+        cols = {key[4:]: arr for key, arr in arrays.items() if key.startswith("col_")}
+        strings = {
+            name: _MappedStrings(arrays[f"{name}_blob"], arrays[f"{name}_offsets"], arrays[f"{name}_nulls"])
+            for name in _STRINGS
+        }
+        n = len(cols["id"])
+        alive = np.flatnonzero(cols["alive"])
+        rows = dict(zip(cols["id"][alive].tolist(), alive.tolist()))
+        (self._cols, self._rows, self._names, self._name_codes, self._descriptions, self._image_keys,
+         self._size, self._tombstones, self._name_rank) = (
+            cols, rows, strings["names"], None, strings["descriptions"], strings["image_keys"],
+            n, meta["tombstones"], arrays["name_rank"],
+        )
+        self.ready = True
+        metrics.gauge("catalog_snapshot_rows", len(rows))
+        return datetime.fromisoformat(meta["watermark"])
+
+
+def save(path: str, exported: dict, watermark: datetime) -> None:
+    """
+    Write an export() to path for load_file(); `watermark` is a time before which
+    every committed change is in the export.
+    """
+    arrays = {f"col_{key}": col for key, col in exported["cols"].items()}
+    for name in _STRINGS:
+        arrays[f"{name}_blob"], arrays[f"{name}_offsets"], arrays[f"{name}_nulls"] = _encode_strings(list(exported[name]))
+    rank = exported["name_rank"]
+    arrays["name_rank"] = rank if rank is not None else _name_ranks(exported["names"])
+    meta = {"format": _FORMAT, "watermark": watermark.isoformat(), "tombstones": exported["tombstones"]}
+    mapped_file.save(path, _MAGIC, arrays, meta)
+
+
+def _top_k(primary, tiebreak, k: int):
+    """
+    Positions of the k smallest (primary, tiebreak) pairs, in order. Partitions
+    first so only the candidates (ties at the boundary included) get sorted.
+    """
+    if k <= 0:
+        return np.empty(0, dtype="int64")
+    if k < len(primary) // 4:
+        kth = np.partition(primary, k - 1)[k - 1]
+        candidates = np.flatnonzero(primary <= kth)
+        order = np.lexsort((tiebreak[candidates], primary[candidates]))
+        return candidates[order][:k]
+    return np.lexsort((tiebreak, primary))[:k]
@@ -0,0 +1,180 @@
+# app/core/compression.py
+"""
+Response compression (zstd, br, gzip) negotiated from Accept-Encoding. Brotli and
+zstd are used when their packages are installed (pip install .[compression]).
+"""
+import time
+import zlib
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional extra
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional extra
+    zstandard = None
+
+
+def _gzip_encoder():
+    # wbits=31: zlib stream with a gzip header and trailer
+    encoder = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return encoder.compress, encoder.flush
+
+
+def _brotli_encoder():
+    encoder = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return encoder.process, encoder.finish
+
+
+def _zstd_encoder():
+    encoder = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+    return encoder.compress, encoder.flush
+
+
+_ENCODERS: dict[str, Callable] = {"gzip": _gzip_encoder}
+if brotli is not None:
+    _ENCODERS["br"] = _brotli_encoder
+if zstandard is not None:
+    _ENCODERS["zstd"] = _zstd_encoder
+
+
+def available_encodings() -> list[str]:
+    return [e for e in settings.COMPRESSION_ENCODINGS if e in _ENCODERS]
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the first server-preferred encoding the client accepts (q > 0), or None.
+    """
+    if not settings.COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for encoding in available_encodings():
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return any(content_type.startswith(allowed) for allowed in settings.COMPRESSION_CONTENT_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Compresses allowlisted responses of at least COMPRESSION_MIN_SIZE bytes. Bodies are
+    buffered up to the threshold, so small streamed responses still go out as is.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding))
+
+
+class _CompressingSend:
+    def __init__(self, send: Send, encoding: str):
+        self.send = send
+        self.encoding = encoding
+        self.start: Optional[Message] = None
+        self.buffer: list[bytes] = []
+        self.buffered = 0
+        self.passthrough = False
+        self.compress = self.finish = None
+        self.cpu = 0.0
+        self.bytes_in = self.bytes_out = 0
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message.get("headers", []))
+            if message["status"] < 200 or message["status"] in (204, 304) or not _compressible(headers):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.compress is None:
+            self.buffer.append(body)
+            self.buffered += len(body)
+            if self.buffered < settings.COMPRESSION_MIN_SIZE:
+                if not more:
+                    await self._send_plain()
+                return
+            body, self.buffer = b"".join(self.buffer), []
+            self.compress, self.finish = _ENCODERS[self.encoding]()
+            out = self._encode(body, more)
+            # a body that arrived whole keeps an exact Content-Length
+            await self._send_start(None if more else len(out))
+        else:
+            out = self._encode(body, more)
+        if out or not more:
+            await self.send({"type": "http.response.body", "body": out, "more_body": more})
+        if not more:
+            metrics.observe("compression_cpu", self.cpu, self.encoding)
+            metrics.incr("compression_bytes_in", self.encoding, self.bytes_in)
+            metrics.incr("compression_bytes_out", self.encoding, self.bytes_out)
+
+    async def _send_plain(self) -> None:
+        headers = MutableHeaders(raw=list(self.start.get("headers", [])))
+        headers.add_vary_header("Accept-Encoding")
+        await self.send({**self.start, "headers": headers.raw})
+        await self.send({"type": "http.response.body", "body": b"".join(self.buffer)})
+
+    def _encode(self, body: bytes, more: bool) -> bytes:
+        started = time.thread_time()
+        out = self.compress(body)
+        if not more:
+            out += self.finish()
+        self.cpu += time.thread_time() - started
+        self.bytes_in += len(body)
+        self.bytes_out += len(out)
+        return out
+
+    async def _send_start(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=list(self.start.get("headers", [])))
+        del headers["content-length"]
+        if content_length is not None:
+            headers["content-length"] = str(content_length)
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # the encoded bytes differ from the identity representation
+            headers["etag"] = f"W/{etag}"
+        await self.send({**self.start, "headers": headers.raw})
@@ -1,5 +1,5 @@
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 from pydantic import model_validator
 from pydantic_settings import BaseSettings
@@ -24,10 +24,33 @@ class Settings(BaseSettings):
     # These are constructed by the validator below
     DATABASE_URL: Optional[str] = None
     DATABASE_URL_SYNC: Optional[str] = None
+
+    # Connection pool tuning (per worker process)
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: float = 30.0       # seconds to wait for a free connection
+    POSTGRES_POOL_RECYCLE: int = 1800         # seconds; -1 disables recycling
+    POSTGRES_POOL_PRE_PING: bool = True       # ping on checkout instead of relying on recycle only
+
+    # Optional streaming replica for read-only endpoints (same credentials/database as the primary)
+    POSTGRES_REPLICA_HOST: Optional[str] = None
+    POSTGRES_REPLICA_PORT: int = 5432
+    REPLICA_MAX_LAG_SECONDS: float = 5.0      # fall back to the primary beyond this lag
+    REPLICA_LAG_CHECK_INTERVAL: float = 1.0   # seconds between replica lag probes per worker
+    REPLICA_PROBE_TIMEOUT: float = 1.0        # a slower probe marks the replica unusable until the next one
+    READ_YOUR_WRITES_TTL: int = 60            # seconds a client's last-write LSN stays sticky
     
     # --- MongoDB Settings ---
     MONGO_URI: str = "mongodb://mongo:27017"
     MONGO_DB: str = "ecomdb"
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_COMPRESSORS: List[str] = []          # e.g. ["zstd", "snappy", "zlib"]
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_CONNECT_TIMEOUT_MS: int = 10000
+    MONGO_SOCKET_TIMEOUT_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
 
     # --- Test Database Settings ---
     # Read from env vars (set in docker-compose.yml), default to 'localhost' for local runs
@@ -37,6 +60,8 @@ class Settings(BaseSettings):
     # These are constructed by the validator below
     TEST_DATABASE_URL: Optional[str] = None
     TEST_MONGO_URI: Optional[str] = None
+    # Second Postgres instance for replica routing tests; those tests are skipped when unset
+    TEST_REPLICA_DATABASE_URL: Optional[str] = None
 
     # --- Authentication Settings ---
     JWT_SECRET: str = "supersecret"
@@ -58,6 +83,127 @@ class Settings(BaseSettings):
     SMTP_USER: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
     
+    # --- Caching ---
+    CACHE_BACKEND: str = "memory"              # "memory" (per-worker LRU) or "redis" (shared)
+    CACHE_URL: str = "redis://redis:6379/0"    # used when CACHE_BACKEND=redis
+    PRODUCT_CACHE_TTL: int = 60                # seconds
+    PRODUCT_CACHE_SIZE: int = 10000            # max entries per worker (memory backend)
+    SINGLEFLIGHT_TIMEOUT: float = 2.0          # max seconds a coalesced read waits on its leader
+    CATALOG_CACHE_MAX_AGE: int = 0             # Cache-Control max-age for catalog responses (seconds)
+    # Server-side response cache: 'METHOD /path' glob -> TTL in seconds; '*' stays
+    # within one path segment, so /products/[0-9]* leaves out /products/{id}/image-url.
+    # Only listed routes are cached, and only for requests without credentials.
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_ROUTES: Dict[str, float] = {
+        "GET /": 60.0,
+        "GET /api/v1/products/": 5.0,
+        "GET /api/v1/products/[0-9]*": 10.0,
+        "GET /api/v1/products/search": 30.0,
+    }
+    RESPONSE_CACHE_STALE_SECONDS: float = 30.0  # serve stale this long past TTL while refreshing
+    RESPONSE_CACHE_SIZE: int = 2000
+    RESPONSE_CACHE_MAX_BODY: int = 1_048_576
+
+    # --- Autocomplete ---
+    AUTOCOMPLETE_REFRESH_SECONDS: float = 300.0  # full rebuild; picks up other workers' writes
+    AUTOCOMPLETE_POPULARITY_DAYS: int = 90       # ranked by units sold over this many days (sales rollup)
+    AUTOCOMPLETE_MEMO_PREFIX_LEN: int = 2        # memoize answers for prefixes up to this long
+
+    # --- Catalog snapshot ---
+    # Serve GET /products/ from a per-worker NumPy snapshot (needs .[snapshot]); each
+    # worker holds all active products in memory and one extra LISTEN connection.
+    CATALOG_SNAPSHOT_ENABLED: bool = False
+    # Local file the snapshot is saved to every CATALOG_SNAPSHOT_SAVE_SECONDS and on
+    # shutdown; a new worker maps it and loads only what changed since. Empty: off.
+    CATALOG_SNAPSHOT_PATH: str = ""
+    CATALOG_SNAPSHOT_SAVE_SECONDS: float = 300.0
+    CATALOG_SNAPSHOT_DELTA_MARGIN_SECONDS: float = 60.0  # reloaded from before the file's watermark
+
+    # --- Related products ---
+    # scripts/build_related_products.py writes this file (needs .[snapshot]); workers
+    # memory-map it and serve GET /products/{id}/related from it. Empty disables both.
+    RELATED_PRODUCTS_PATH: str = ""
+    RELATED_PRODUCTS_TOP_K: int = 20              # neighbours kept per product
+    RELATED_PRODUCTS_MIN_COUNT: int = 2           # orders a pair must share to be listed
+    RELATED_PRODUCTS_MAX_BASKET: int = 50         # orders with more distinct products are skipped
+    RELATED_PRODUCTS_SETTLE_SECONDS: float = 300  # the job leaves out orders younger than this
+    RELATED_PRODUCTS_RELOAD_SECONDS: float = 60   # how often workers look for a new file
+
+    # --- Sharded stock ---
+    # PUT /products/{id}/stock-shards splits a hot product's stock over N rows; every
+    # worker refreshes products.stock (listings, search) from their sums this often
+    STOCK_SHARDS_REFRESH_SECONDS: float = 5.0
+
+    # --- Sales rollups ---
+    # each day's counters are spread over this many rows (by order id) so checkouts
+    # don't all queue on one row lock; readers sum them. Safe to change at any time
+    SALES_ROLLUP_BUCKETS: int = 16
+
+    # --- Bulk product import ---
+    IMPORT_BATCH_ROWS: int = 5000        # rows validated and COPYed per round trip
+    IMPORT_MAX_ROWS: int = 200_000       # per request/file; larger catalogs are split by the caller
+    IMPORT_MAX_ERRORS: int = 1000        # rejected rows listed in the response (all are counted)
+
+    # --- Stock/price sync ---
+    SYNC_CHUNK_ROWS: int = 10_000        # changes per UPDATE statement (all in one transaction)
+    SYNC_BATCH_RETENTION_DAYS: int = 7   # how long a batch_id is remembered for replays
+
+    # --- Order partitions ---
+    # orders/order_items are partitioned by month; every worker checks periodically
+    # that partitions exist this many months ahead (creating them is serialized)
+    ORDER_PARTITIONS_AHEAD_MONTHS: int = 3
+    ORDER_PARTITION_CHECK_SECONDS: float = 6 * 3600
+
+    # --- Order archive ---
+    # scripts/archive_orders.py moves old delivered/cancelled orders to S3 (needs .[archive]);
+    # get_order falls back to the archive for ids no longer in Postgres
+    ORDER_ARCHIVE_AFTER_MONTHS: int = 12
+    ORDER_ARCHIVE_BATCH_SIZE: int = 10_000   # orders per transaction (and at most per object)
+    ORDER_ARCHIVE_PREFIX: str = "archive/orders"
+    ORDER_ARCHIVE_ZSTD_LEVEL: int = 10
+    ORDER_ARCHIVE_CACHE_OBJECTS: int = 4     # decoded objects kept per worker for archive lookups
+
+    # --- Response compression ---
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024           # bytes; smaller bodies aren't worth the CPU
+    COMPRESSION_ENCODINGS: List[str] = ["zstd", "br", "gzip"]  # server preference; br/zstd need .[compression]
+    COMPRESSION_CONTENT_TYPES: List[str] = ["application/json", "application/x-ndjson", "text/"]
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # --- Request deadlines ---
+    # Budget per request in seconds; 0 disables the deadline middleware.
+    REQUEST_TIMEOUT_SECONDS: float = 15.0
+    # Per-route overrides, keyed by 'METHOD /path' glob pattern (longest match wins)
+    ROUTE_TIMEOUTS: Dict[str, float] = {
+        "GET /api/v1/health/*": 2.0,
+        "POST /api/v1/s3/upload": 60.0,
+        "POST /api/v1/products/*/image": 60.0,
+        "POST /api/v1/products/import": 300.0,
+        "POST /api/v1/products/sync": 60.0,
+        # streamed; also the statement_timeout of its one long cursor query
+        "GET /api/v1/orders/admin/export": 1800.0,
+    }
+    S3_CONNECT_TIMEOUT: float = 5.0
+    S3_READ_TIMEOUT: float = 30.0
+    S3_MAX_ATTEMPTS: int = 3
+
+    # --- Adaptive concurrency limiting ---
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_LIMIT_INITIAL: int = 50
+    CONCURRENCY_LIMIT_MIN: int = 5
+    CONCURRENCY_LIMIT_MAX: int = 500
+    CONCURRENCY_QUEUE_TIMEOUT: float = 0.5     # max seconds a request waits for a slot
+    # Priority class per 'METHOD /path' glob: critical > normal (default) > low
+    ROUTE_PRIORITIES: Dict[str, str] = {
+        "GET /api/v1/health/*": "critical",
+        "GET /api/v1/admin/*": "critical",
+        "POST /api/v1/orders/": "critical",
+        "GET /api/v1/orders/admin/*": "low",
+        "GET /api/v1/users/": "low",
+    }
+
     # --- HTTPS Settings ---
     HTTPS_ONLY: bool = False
     
@@ -0,0 +1,69 @@
+# app/core/deadline.py
+"""
+Per-request deadlines. DeadlineMiddleware stores the absolute deadline of the
+current request in a contextvar; the database and S3 layers read the remaining
+budget from here and turn it into driver-level timeouts.
+"""
+import time
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from typing import Optional
+
+from app.core.config import settings
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when work is about to start but the request has no budget left.
+    """
+
+
+# absolute time.monotonic() value, or None outside of a request with a deadline
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def budget_for(method: str, path: str) -> float:
+    """
+    Timeout in seconds for a request. ROUTE_TIMEOUTS keys are 'METHOD /path' glob
+    patterns; the longest matching pattern wins, otherwise REQUEST_TIMEOUT_SECONDS.
+    """
+    key = f"{method} {path}"
+    best = None
+    for pattern, seconds in settings.ROUTE_TIMEOUTS.items():
+        if fnmatchcase(key, pattern) and (best is None or len(pattern) > len(best[0])):
+            best = (pattern, seconds)
+    return best[1] if best else settings.REQUEST_TIMEOUT_SECONDS
+
+
+def start(seconds: float):
+    """
+    Start a deadline `seconds` from now; returns the token for `stop`.
+    """
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def stop(token) -> None:
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left for the current request (may be negative), or None without a deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def remaining_ms() -> Optional[int]:
+    """
+    Remaining budget in whole milliseconds for driver timeouts, or None without a
+    deadline. Raises DeadlineExceeded when nothing is left, so no new work starts.
+    """
+    left = remaining()
+    if left is None:
+        return None
+    if left <= 0:
+        raise DeadlineExceeded()
+    return max(int(left * 1000), 1)
@@ -0,0 +1,24 @@
+# app/core/fieldsets.py
+"""
+?fields= sparse fieldsets and ?expand= parsing for list endpoints.
+"""
+from typing import Iterable, Optional
+
+
+def parse_list(raw: Optional[str], allowed: Iterable[str], param: str) -> Optional[tuple[str, ...]]:
+    """
+    Comma-separated names, de-duplicated in order. None when the parameter is absent;
+    raises ValueError for empty or unknown names.
+    """
+    if raw is None:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    allowed = set(allowed)
+    unknown = [name for name in names if name not in allowed]
+    if not names or unknown:
+        raise ValueError(f"{param} must be a comma-separated subset of: {', '.join(sorted(allowed))}")
+    return names
+
+
+def project(obj, fields: Iterable[str]) -> dict:
+    return {field: getattr(obj, field) for field in fields}
@@ -0,0 +1,100 @@
+# app/core/http_cache.py
+"""
+HTTP validators for catalog responses. ETags are derived from (id, updated_at)
+only (plus the stock for sharded stock), so a client revalidation can be
+answered without serializing the body.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+
+def _as_utc(value: datetime) -> datetime:
+    # naive values come from datetime.utcnow() defaults
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _version(product) -> datetime:
+    return _as_utc(product.updated_at or product.created_at)
+
+
+def product_validators(product, variant: str = "") -> tuple[str, Optional[datetime]]:
+    """
+    Weak ETag and Last-Modified for a single product. Weak, because the same
+    version may be sent with different encodings (compression). Checkouts change
+    the stock of a product with sharded stock without touching updated_at, so its
+    ETag includes the stock and it gets no Last-Modified.
+    """
+    stamp = int(_version(product).timestamp() * 1_000_000)
+    if getattr(product, "stock_shards", 0):
+        return f'W/"p{product.id}-{stamp:x}-s{product.stock}{variant}"', None
+    return f'W/"p{product.id}-{stamp:x}{variant}"', _version(product)
+
+
+def listing_validators(products: Iterable, variant: str = "") -> tuple[str, Optional[datetime]]:
+    """
+    Weak ETag and Last-Modified for a page of products. The ETag covers the ids on
+    the page as well, so removals change it; Last-Modified (max updated_at) does not
+    see hard deletes, which is why If-None-Match takes precedence when both are sent.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    last_modified = None
+    for product in products:
+        version = _version(product)
+        digest.update(f"{product.id}:{version.timestamp()};".encode())
+        if last_modified is None or version > last_modified:
+            last_modified = version
+    digest.update(variant.encode())
+    return f'W/"l-{digest.hexdigest()}"', last_modified
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # weak comparison (RFC 9110 13.1.2): ignore the W/ prefix on both sides
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.CATALOG_CACHE_MAX_AGE}, must-revalidate",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def conditional(request: Request, response: Response, etag: str, last_modified: Optional[datetime]) -> Optional[Response]:
+    """
+    Returns a 304 response if the client's copy is current; otherwise sets the
+    validators on `response` and returns None so the route renders the body.
+    """
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,164 @@
+# app/core/limiter.py
+"""
+Adaptive concurrency limiting. The limit follows a gradient algorithm: while the
+short-term latency stays close to the long-term baseline the limit grows, and when
+latency climbs (requests start queueing on the DB pool) it shrinks. Requests over
+the limit wait briefly in a priority queue and are rejected once the wait is exceeded.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+from fnmatch import fnmatchcase
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# priority class -> (rank, share of the limit it may use, share of the queue timeout it may wait)
+# Lower rank is served first; lower classes are cut off earlier so that the
+# remaining headroom stays available to higher ones.
+PRIORITY_CLASSES = {
+    "critical": (0, 1.0, 1.0),
+    "normal": (1, 0.9, 1.0),
+    "low": (2, 0.5, 0.5),
+}
+DEFAULT_CLASS = "normal"
+
+
+def classify(method: str, path: str) -> str:
+    """
+    Priority class of a request from ROUTE_PRIORITIES ('METHOD /path' globs, longest match wins).
+    """
+    key = f"{method} {path}"
+    best = None
+    for pattern, cls in settings.ROUTE_PRIORITIES.items():
+        if fnmatchcase(key, pattern) and (best is None or len(pattern) > len(best[0])):
+            best = (pattern, cls)
+    return best[1] if best and best[1] in PRIORITY_CLASSES else DEFAULT_CLASS
+
+
+class AdaptiveLimiter:
+    """
+    Per-worker limiter. Everything runs on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        queue_timeout: float,
+        rtt_tolerance: float = 1.5,
+        smoothing: float = 0.2,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_timeout = queue_timeout
+        self.rtt_tolerance = rtt_tolerance
+        self.smoothing = smoothing
+        self.inflight = 0
+        self.short_rtt: Optional[float] = None
+        self.long_rtt: Optional[float] = None
+        self._waiters: list = []  # heap of (rank, seq, future)
+        self._seq = itertools.count()
+
+    def _capacity(self, cls: str) -> int:
+        return max(1, int(self.limit * PRIORITY_CLASSES[cls][1]))
+
+    def _drop_done_waiters(self) -> None:
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+
+    def _wake_waiters(self) -> None:
+        self._drop_done_waiters()
+        while self._waiters:
+            rank, _, fut = self._waiters[0]
+            if self.inflight >= self._capacity(fut.priority_class):
+                break
+            heapq.heappop(self._waiters)
+            self.inflight += 1
+            fut.set_result(True)
+            self._drop_done_waiters()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    async def acquire(self, cls: str) -> bool:
+        """
+        Take a slot for a request of class `cls`. Returns False if none became free
+        within the class's share of the queue timeout.
+        """
+        rank = PRIORITY_CLASSES[cls][0]
+        self._drop_done_waiters()
+        ahead = self._waiters and self._waiters[0][0] <= rank
+        if not ahead and self.inflight < self._capacity(cls):
+            self.inflight += 1
+            return True
+
+        wait = self.queue_timeout * PRIORITY_CLASSES[cls][2]
+        if wait <= 0:
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        fut.priority_class = cls
+        heapq.heappush(self._waiters, (rank, next(self._seq), fut))
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), wait)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                return True  # the slot was handed over just as the wait expired
+            fut.cancel()
+            return False
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(None)
+            else:
+                fut.cancel()
+            raise
+
+    def release(self, rtt: Optional[float], dropped: bool = False) -> None:
+        """
+        Return a slot. `rtt` is the request's service time; `dropped` marks requests
+        that failed from overload (timeouts, 503/504), which back the limit off.
+        """
+        self.inflight -= 1
+        if dropped:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        elif rtt is not None:
+            self._update(rtt)
+        self._wake_waiters()
+
+    def _update(self, rtt: float) -> None:
+        if self.short_rtt is None:
+            self.short_rtt = self.long_rtt = rtt
+            return
+        self.short_rtt += (rtt - self.short_rtt) * 0.1
+        self.long_rtt += (rtt - self.long_rtt) * 0.01
+        # let the baseline recover after a sustained latency drop
+        if self.long_rtt > self.short_rtt * 2:
+            self.long_rtt *= 0.95
+
+        gradient = max(0.5, min(1.0, self.rtt_tolerance * self.long_rtt / self.short_rtt))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        if new_limit > self.limit and self.inflight < self.limit / 2:
+            return  # not using the current limit, so there is no evidence it should grow
+        limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+
+    def export_metrics(self) -> None:
+        metrics.gauge("limiter_limit", round(self.limit, 2))
+        metrics.gauge("limiter_inflight", self.inflight)
+        metrics.gauge("limiter_queued", self.queued)
+        if self.short_rtt is not None:
+            metrics.gauge("limiter_rtt_short_ms", self.short_rtt * 1000)
+            metrics.gauge("limiter_rtt_long_ms", self.long_rtt * 1000)
+
+
+limiter = AdaptiveLimiter(
+    initial_limit=settings.CONCURRENCY_LIMIT_INITIAL,
+    min_limit=settings.CONCURRENCY_LIMIT_MIN,
+    max_limit=settings.CONCURRENCY_LIMIT_MAX,
+    queue_timeout=settings.CONCURRENCY_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,68 @@
+# app/core/mapped_file.py
+"""
+Flat files of named 1-d NumPy arrays that workers memory-map instead of reading:
+magic, header length, JSON header (metadata and array layout), then each array at
+a 64-byte boundary. Used by the related-products index and the catalog snapshot.
+"""
+import json
+import os
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional extra
+    np = None
+
+_ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def save(path: str, magic: bytes, arrays: dict, meta: dict) -> None:
+    """
+    Write `arrays` and `meta` (JSON) to path. Written next to it and renamed over
+    it, so workers that mapped the old file keep reading it intact.
+    """
+    layout, offset = {}, 0
+    arrays = {name: np.ascontiguousarray(arr) for name, arr in arrays.items()}
+    for name, arr in arrays.items():
+        layout[name] = {"dtype": arr.dtype.str, "length": len(arr), "offset": offset}
+        offset = _aligned(offset + arr.nbytes)
+    header = json.dumps({"meta": meta, "arrays": layout}).encode()
+    base = _aligned(len(magic) + 8 + len(header))
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(magic + len(header).to_bytes(8, "little") + header)
+        for name, arr in arrays.items():
+            f.seek(base + layout[name]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(base + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load(path: str, magic: bytes, mode: str = "r") -> tuple[dict, dict]:
+    """
+    Memory-map a file written by save(); returns (arrays, meta). The arrays are
+    views of the mapping, paged in as they are touched: read-only with mode "r",
+    copy-on-write (changes stay private to this process) with mode "c". Raises
+    ValueError for a file that isn't one, or was cut short.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a {magic.decode(errors='replace')} file")
+        size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(size))
+    buf = np.memmap(path, dtype="uint8", mode=mode)
+    base = _aligned(len(magic) + 8 + size)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        start = base + spec["offset"]
+        end = start + spec["length"] * dtype.itemsize
+        if end > len(buf):
+            raise ValueError(f"{path} is truncated")
+        arrays[name] = buf[start:end].view(dtype)
+    return arrays, header["meta"]
@@ -0,0 +1,76 @@
+# app/core/metrics.py
+"""
+Minimal in-process metrics registry. Every worker keeps its own numbers;
+they are read through the admin routes rather than pushed anywhere.
+"""
+import threading
+from collections import defaultdict
+
+
+class Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "avg_ms": (self.total / self.count * 1000) if self.count else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Metrics:
+    """
+    Counters, gauges and timings grouped by metric name and an optional label
+    (usually a route or a cache name).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+            self._gauges: dict[str, dict[str, float]] = defaultdict(dict)
+            self._timings: dict[str, dict[str, Timing]] = defaultdict(lambda: defaultdict(Timing))
+
+    def incr(self, name: str, label: str = "total", value: int = 1) -> None:
+        with self._lock:
+            self._counters[name][label] += value
+
+    def gauge(self, name: str, value: float, label: str = "total") -> None:
+        with self._lock:
+            self._gauges[name][label] = value
+
+    def observe(self, name: str, seconds: float, label: str = "total") -> None:
+        with self._lock:
+            self._timings[name][label].add(seconds)
+
+    def counter(self, name: str, label: str = "total") -> int:
+        with self._lock:
+            return self._counters[name].get(label, 0) if name in self._counters else 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": {name: dict(values) for name, values in self._counters.items()},
+                "gauges": {name: dict(values) for name, values in self._gauges.items()},
+                "timings": {
+                    name: {label: t.as_dict() for label, t in values.items()}
+                    for name, values in self._timings.items()
+                },
+            }
+
+
+metrics = Metrics()
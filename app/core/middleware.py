@@ -0,0 +1,211 @@
+# app/core/middleware.py
+import asyncio
+import math
+import time
+
+from pymongo.errors import ExecutionTimeout
+from sqlalchemy.exc import DBAPIError
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.limiter import classify, limiter
+from app.core.metrics import metrics
+from app.db.pg import DbUsage, RequestLSN, db_usage, request_lsn
+
+LSN_COOKIE = "pg_lsn"
+
+
+def route_label(scope: Scope) -> str:
+    """
+    'METHOD /path/{template}' for the matched route, so metrics don't explode per id.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    return f"{scope.get('method', '')} {path}"
+
+
+class ReadYourWritesMiddleware:
+    """
+    Makes reads after a write consistent for the writing client when a replica is in use.
+    The client's last-write LSN travels in a cookie; get_read_db only uses the replica
+    once it has replayed that position.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = RequestLSN(min_lsn=HTTPConnection(scope).cookies.get(LSN_COOKIE))
+        token = request_lsn.set(state)
+
+        async def send_with_lsn(message: Message) -> None:
+            if message["type"] == "http.response.start" and state.write_lsn:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{LSN_COOKIE}={state.write_lsn}; Max-Age={settings.READ_YOUR_WRITES_TTL}; "
+                    "Path=/; HttpOnly; SameSite=lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_lsn)
+        finally:
+            request_lsn.reset(token)
+
+
+class DbUsageMiddleware:
+    """
+    Records, per route, how long the request held pooled Postgres connections
+    versus how long it actually spent executing statements.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        usage = DbUsage()
+        token = db_usage.set(usage)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            db_usage.reset(token)
+            if usage.queries or usage.hold:
+                label = route_label(scope)
+                metrics.observe("db_connection_hold", usage.hold, label)
+                metrics.observe("db_query", usage.query, label)
+                metrics.incr("db_queries", label, usage.queries)
+
+
+# query_canceled (statement_timeout) and lock_not_available (lock_timeout)
+_PG_TIMEOUT_SQLSTATES = {"57014", "55P03"}
+
+
+def _is_timeout_error(exc: Exception) -> bool:
+    if isinstance(exc, ExecutionTimeout):
+        return True
+    if isinstance(exc, DBAPIError):
+        return getattr(exc.orig, "sqlstate", None) in _PG_TIMEOUT_SQLSTATES
+    return False
+
+
+class DeadlineMiddleware:
+    """
+    Gives every request a time budget (see app.core.deadline.budget_for). The budget is
+    enforced here and handed down to Postgres, Mongo and S3 through the deadline contextvar.
+    Requests that run out before the response starts get a 504; requests that never got
+    to start their work (no budget left) are shed with a 503. Once the response has
+    started (e.g. a streaming body), the deadline no longer applies.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = deadline.budget_for(scope["method"], scope["path"])
+        if budget <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+        token = deadline.start(budget)
+        try:
+            async with asyncio.timeout(budget) as timeout:
+                async def send_tracking_start(message: Message) -> None:
+                    nonlocal started
+                    if message["type"] == "http.response.start":
+                        started = True
+                        timeout.reschedule(None)
+                    await send(message)
+
+                try:
+                    await self.app(scope, receive, send_tracking_start)
+                    return
+                except deadline.DeadlineExceeded:
+                    if started:
+                        raise
+                    status_code = 503
+                except Exception as exc:
+                    if started or not _is_timeout_error(exc):
+                        raise
+                    status_code = 504
+        except TimeoutError:
+            if started or not timeout.expired():
+                raise
+            status_code = 504
+        finally:
+            deadline.stop(token)
+
+        metrics.incr("deadline_exceeded", route_label(scope))
+        detail = "Request deadline exceeded" if status_code == 504 else "Request shed: deadline exceeded"
+        response = JSONResponse({"detail": detail}, status_code=status_code, headers={"Retry-After": "1"})
+        await response(scope, receive, send)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Admits requests through the adaptive limiter (app.core.limiter). Requests that
+    cannot get a slot within their class's queue wait are rejected with 503 and a
+    Retry-After instead of piling up behind the database pool.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cls = classify(scope["method"], scope["path"])
+        queued_at = time.monotonic()
+        admitted = await limiter.acquire(cls)
+        waited = time.monotonic() - queued_at
+        metrics.observe("limiter_queue_wait", waited, cls)
+        if not admitted:
+            metrics.incr("limiter_rejected", cls)
+            limiter.export_metrics()
+            retry_after = str(max(1, math.ceil(limiter.queue_timeout)))
+            response = JSONResponse(
+                {"detail": "Server overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": retry_after},
+            )
+            await response(scope, receive, send)
+            return
+
+        metrics.incr("limiter_admitted", cls)
+        status_code = 500
+        responded_at = None
+
+        async def send_capturing_status(message: Message) -> None:
+            nonlocal status_code, responded_at
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                responded_at = time.monotonic()
+            await send(message)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send_capturing_status)
+        finally:
+            # the slot is held until the body is sent, but the latency sample stops at
+            # the response start: a long streamed export isn't a slow server
+            rtt = (responded_at or time.monotonic()) - started
+            limiter.release(rtt, dropped=status_code in (503, 504))
+            limiter.export_metrics()
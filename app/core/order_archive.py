@@ -0,0 +1,101 @@
+# app/core/order_archive.py
+"""
+Cold-order archive objects in S3: zstd-compressed NDJSON, one order per line with
+its items nested, under ORDER_ARCHIVE_PREFIX/YYYY/MM/ by the month the orders were
+placed. order_repo decides what goes in and keeps the manifest of objects.
+"""
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+from app.core import s3
+from app.core.config import settings
+from app.db.models import Order, OrderItem, OrderStatus
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional extra
+    zstandard = None
+
+CONTENT_TYPE = "application/x-ndjson"
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise RuntimeError("the order archive requires zstandard (pip install .[archive])")
+
+
+def object_key(month: date, first_id: int, last_id: int) -> str:
+    return f"{settings.ORDER_ARCHIVE_PREFIX}/{month:%Y/%m}/{first_id}-{last_id}.ndjson.zst"
+
+
+def to_record(order: Order) -> dict:
+    return {
+        "id": order.id, "user_id": order.user_id, "status": order.status.value,
+        "total": order.total, "created_at": order.created_at.isoformat(),
+        "items": [
+            {"id": it.id, "product_id": it.product_id, "quantity": it.quantity, "price_at_purchase": it.price_at_purchase}
+            for it in order.items
+        ],
+    }
+
+
+def from_record(record: dict) -> Order:
+    """
+    A transient Order (never added to a session) with its items, for read-only use.
+    """
+    created_at = datetime.fromisoformat(record["created_at"])
+    items = [OrderItem(order_id=record["id"], order_created_at=created_at, **item) for item in record["items"]]
+    return Order(
+        id=record["id"], user_id=record["user_id"], status=OrderStatus(record["status"]),
+        total=record["total"], created_at=created_at, items=items,
+    )
+
+
+def encode(records: Iterable[dict]) -> bytes:
+    _require_zstandard()
+    body = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode()
+    return zstandard.ZstdCompressor(level=settings.ORDER_ARCHIVE_ZSTD_LEVEL).compress(body)
+
+
+def decode(blob: bytes) -> Iterator[dict]:
+    _require_zstandard()
+    # stream_reader: frames written by compress() don't always record their size
+    with zstandard.ZstdDecompressor().stream_reader(blob) as reader:
+        body = reader.read()
+    for line in body.splitlines():
+        if line:
+            yield json.loads(line)
+
+
+# Blocking boto3 calls; run them in a worker thread from async code.
+def put(key: str, blob: bytes, order_count: int) -> None:
+    s3.s3_client.put_object(
+        Bucket=s3.BUCKET_NAME, Key=key, Body=blob, ContentType=CONTENT_TYPE,
+        Metadata={"order-count": str(order_count)},
+    )
+
+
+def get(key: str) -> bytes:
+    return s3.s3_client.get_object(Bucket=s3.BUCKET_NAME, Key=key)["Body"].read()
+
+
+@lru_cache(maxsize=settings.ORDER_ARCHIVE_CACHE_OBJECTS)
+def _object_lines(bucket: str, key: str) -> dict[int, bytes]:
+    # archive objects never change once written, so decoded ones are kept as
+    # order id -> NDJSON line; only the order asked for is parsed into a dict
+    with zstandard.ZstdDecompressor().stream_reader(get(key)) as reader:
+        body = reader.read()
+    return {json.loads(line)["id"]: line for line in body.splitlines() if line}
+
+
+def find(key: str, order_id: int) -> Optional[dict]:
+    """
+    Blocking (download and decompress); run it in a worker thread. The record of
+    `order_id` in object `key`, or None. The ORDER_ARCHIVE_CACHE_OBJECTS objects
+    read last stay decoded in memory, so repeated lookups don't hit S3.
+    """
+    _require_zstandard()
+    line = _object_lines(s3.BUCKET_NAME, key).get(order_id)
+    return json.loads(line) if line is not None else None
@@ -0,0 +1,179 @@
+# app/core/related_products.py
+"""
+"Frequently bought together" (NumPy; pip install .[snapshot]). A batch job
+(scripts/build_related_products.py) counts how often two products share an order,
+keeps the top-K neighbours of every product, and writes everything to one flat
+file that each worker memory-maps; lookups are a binary search and a slice.
+
+The file also keeps the raw pair counts and a watermark, so the next run only
+counts orders placed since then and merges them in.
+"""
+import os
+
+from app.core import mapped_file
+from app.core.metrics import metrics
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional extra
+    np = None
+
+_MAGIC = b"RELPROD1"
+# product ids are Postgres integers, so a pair packs into one int64 as (a << 32) | b
+_LOW = 0xFFFFFFFF
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("related products require numpy (pip install .[snapshot])")
+
+
+def _pack(a, b):
+    return (a.astype("int64") << 32) | b.astype("int64")
+
+
+def _unpack(keys):
+    return keys >> 32, keys & _LOW
+
+
+def cooccurrence(order_ids, product_ids, max_basket: int) -> dict:
+    """
+    Count, over the (order_id, product_id) rows of some orders, how many orders
+    contain each product ("item_*") and each unordered pair of products
+    ("pair_*", keyed (a << 32) | b with a < b). Orders with more than max_basket
+    distinct products are skipped: they cost O(n²) pairs and say little.
+    """
+    _require_numpy()
+    rows = np.unique(_pack(np.asarray(order_ids), np.asarray(product_ids)))  # sorted by order, then product
+    orders, products = _unpack(rows)
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]]) if len(rows) else np.empty(0, "int64")
+    sizes = np.diff(np.r_[starts, len(rows)])
+    keep = sizes <= max_basket
+    products = products[np.repeat(keep, sizes)]
+    sizes = sizes[keep]
+    starts = np.cumsum(sizes) - sizes
+    item_ids, item_counts = np.unique(products, return_counts=True)
+
+    # pair every product with the ones after it in its order: element i has
+    # (size - 1 - position) partners, at i + 1, i + 2, ...
+    position = np.arange(len(products)) - np.repeat(starts, sizes)
+    partners = np.repeat(sizes, sizes) - 1 - position
+    first = np.repeat(np.arange(len(products)), partners)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(partners) - partners, partners)
+    pair_keys, pair_counts = np.unique(_pack(products[first], products[second]), return_counts=True)
+    return {
+        "item_ids": item_ids, "item_counts": item_counts.astype("int64"),
+        "pair_keys": pair_keys, "pair_counts": pair_counts.astype("int64"),
+        "orders": int(len(sizes)),
+    }
+
+
+def _merge_counts(keys_a, counts_a, keys_b, counts_b):
+    keys, inverse = np.unique(np.concatenate([keys_a, keys_b]), return_inverse=True)
+    counts = np.zeros(len(keys), dtype="int64")
+    np.add.at(counts, inverse, np.concatenate([counts_a, counts_b]))
+    return keys, counts
+
+
+def merge(old: dict, new: dict) -> dict:
+    """
+    Add the counts of `new` (from cooccurrence) to `old`.
+    """
+    _require_numpy()
+    item_ids, item_counts = _merge_counts(old["item_ids"], old["item_counts"], new["item_ids"], new["item_counts"])
+    pair_keys, pair_counts = _merge_counts(old["pair_keys"], old["pair_counts"], new["pair_keys"], new["pair_counts"])
+    return {
+        "item_ids": item_ids, "item_counts": item_counts, "pair_keys": pair_keys, "pair_counts": pair_counts,
+        "orders": old["orders"] + new["orders"],
+    }
+
+
+def top_k(counts: dict, k: int, min_count: int = 1, active_ids=None) -> dict:
+    """
+    The k best neighbours of every product as CSR arrays: the neighbours of ids[i]
+    are neighbors[indptr[i]:indptr[i + 1]], best first. Pairs are scored by cosine
+    similarity, together / sqrt(orders with a * orders with b), so best sellers
+    don't become everyone's neighbour; ties go to the larger count, then the lower
+    id. With active_ids, pairs involving any other product are left out.
+    """
+    _require_numpy()
+    keep = counts["pair_counts"] >= min_count
+    a, b = _unpack(counts["pair_keys"][keep])
+    together = counts["pair_counts"][keep]
+    if active_ids is not None:
+        active_ids = np.asarray(active_ids, dtype="int64")
+        alive = np.isin(a, active_ids) & np.isin(b, active_ids)
+        a, b, together = a[alive], b[alive], together[alive]
+    item_ids, item_counts = counts["item_ids"], counts["item_counts"]
+    score = together / np.sqrt(item_counts[np.searchsorted(item_ids, a)] * item_counts[np.searchsorted(item_ids, b)])
+
+    # both directions, grouped by source product, best first within each group
+    src, dst = np.concatenate([a, b]), np.concatenate([b, a])
+    score, together = np.concatenate([score, score]), np.concatenate([together, together])
+    order = np.lexsort((dst, -together, -score, src))
+    src, dst, score = src[order], dst[order], score[order]
+    ids, starts, sizes = np.unique(src, return_index=True, return_counts=True)
+    best = np.arange(len(src)) - np.repeat(starts, sizes) < k
+    sizes = np.minimum(sizes, k)
+    return {
+        "ids": ids.astype("int64"),
+        "indptr": np.r_[0, np.cumsum(sizes)].astype("int64"),
+        "neighbors": dst[best].astype("int64"),
+        "scores": score[best].astype("float32"),
+    }
+
+
+def save(path: str, arrays: dict, meta: dict) -> None:
+    _require_numpy()
+    mapped_file.save(path, _MAGIC, arrays, meta)
+
+
+def load(path: str) -> tuple[dict, dict]:
+    """
+    Memory-map a file written by save(); returns (arrays, meta).
+    """
+    _require_numpy()
+    return mapped_file.load(path, _MAGIC)
+
+
+class RelatedProducts:
+    """
+    A worker's read-only view of the latest file written by the job.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.meta: dict = {}
+        self._arrays: dict = {}
+        self._stamp = None
+
+    def load(self, path: str) -> bool:
+        """
+        Map `path` if it changed since the last call; returns whether it did.
+        """
+        st = os.stat(path)
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return False
+        arrays, meta = load(path)
+        # swap in one step; the previous mapping is released once nothing uses it
+        self._arrays, self.meta, self._stamp = arrays, meta, stamp
+        self.ready = True
+        metrics.gauge("related_products_items", len(arrays["ids"]))
+        return True
+
+    def lookup(self, product_id: int, limit: int) -> list[tuple[int, float]]:
+        """
+        Up to `limit` (product id, score) pairs, best first; [] for unknown ids.
+        """
+        ids = self._arrays["ids"]
+        i = int(np.searchsorted(ids, product_id))
+        if i == len(ids) or ids[i] != product_id:
+            return []
+        indptr = self._arrays["indptr"]
+        lo = int(indptr[i])
+        hi = min(int(indptr[i + 1]), lo + limit)
+        return list(zip(self._arrays["neighbors"][lo:hi].tolist(), self._arrays["scores"][lo:hi].tolist()))
+
+    def __len__(self) -> int:
+        return len(self._arrays["ids"]) if self.ready else 0
@@ -0,0 +1,278 @@
+# app/core/response_cache.py
+"""
+Server-side cache of encoded responses for public routes, with stale-while-revalidate.
+Routes opt in through RESPONSE_CACHE_ROUTES (explicit TTL per 'METHOD /path' glob,
+whose wildcards match within one path segment)
+and tag their responses with a Surrogate-Key header, which writes purge by.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from fnmatch import fnmatchcase
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.compression import negotiate
+from app.core.config import settings
+from app.core.http_cache import is_not_modified
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TAG_HEADER = b"surrogate-key"
+PRODUCT_LIST_TAG = "product-list"
+# a client that just wrote (see ReadYourWritesMiddleware) must not get a cached copy
+_BYPASS_COOKIE = "pg_lsn="
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: list
+    body: bytes
+    tags: frozenset
+    stored_at: float
+    fresh_until: float
+    stale_until: float
+    refreshing: bool = field(default=False, compare=False)
+
+
+class ResponseStore:
+    """
+    Per-worker LRU of responses with a tag index for purging.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.stale_until < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        self._remove(key)
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def purge(self, tags: Iterable[str]) -> int:
+        purged = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, set()):
+                if key in self._entries:
+                    self._remove(key)
+                    purged += 1
+        return purged
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+store = ResponseStore(max_entries=settings.RESPONSE_CACHE_SIZE)
+# strong references to in-flight background refreshes
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+def product_tag(product_id: int) -> str:
+    return f"product-{product_id}"
+
+
+def purge_tags(*tags: str) -> None:
+    """
+    Drop cached responses carrying any of `tags` (this worker only; others expire by TTL).
+    """
+    if store.purge(tags):
+        metrics.incr("response_cache_purges")
+
+
+def ttl_for(method: str, path: str) -> Optional[tuple[str, float]]:
+    key = f"{method} {path}"
+    best = None
+    for pattern, ttl in settings.RESPONSE_CACHE_ROUTES.items():
+        # as many segments as the pattern: its wildcards don't reach into sub-routes
+        if key.count("/") == pattern.count("/") and fnmatchcase(key, pattern) and (best is None or len(pattern) > len(best[0])):
+            best = (pattern, ttl)
+    return best
+
+
+def cache_key(scope: Scope) -> str:
+    params = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    # stable sort by name only: the order of repeated values can be meaningful
+    query = urlencode(sorted(params, key=lambda kv: kv[0]))
+    # entries are stored as sent, i.e. already compressed for the negotiated encoding
+    encoding = negotiate(Headers(scope=scope).get("accept-encoding", "")) or "identity"
+    return f"{scope['method']} {scope['path']}?{query} {encoding}"
+
+
+def _empty_receive() -> Receive:
+    sent = False
+    never = asyncio.Event()
+
+    async def receive() -> Message:
+        # a GET has no body; afterwards block like a client that never disconnects
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await never.wait()
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+class ResponseCacheMiddleware:
+    """
+    Serves GET responses of opted-in public routes from the store. Fresh entries are
+    served as is; entries past their TTL but within RESPONSE_CACHE_STALE_SECONDS are
+    served stale while a single background task re-renders them.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        route = ttl_for(scope["method"], scope["path"])
+        headers = Headers(scope=scope)
+        if route is None or "authorization" in headers or _BYPASS_COOKIE in headers.get("cookie", ""):
+            await self.app(scope, receive, send)
+            return
+
+        pattern, ttl = route
+        key = cache_key(scope)
+        entry = store.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            if entry.fresh_until >= now:
+                metrics.incr("response_cache_hits", pattern)
+                await self._send_cached(scope, receive, send, entry, "HIT")
+                return
+            metrics.incr("response_cache_stale", pattern)
+            if not entry.refreshing:
+                entry.refreshing = True
+                # render in a clean context: no request deadline, no per-request state
+                task = asyncio.create_task(self._refresh(dict(scope), key, ttl, entry), context=contextvars.Context())
+                _refresh_tasks.add(task)
+                task.add_done_callback(_refresh_tasks.discard)
+            await self._send_cached(scope, receive, send, entry, "STALE")
+            return
+
+        metrics.incr("response_cache_misses", pattern)
+        await self._render(scope, receive, send, key, ttl)
+
+    async def _render(self, scope: Scope, receive: Receive, send: Send, key: str, ttl: float) -> None:
+        """
+        Run the app, passing the response through to `send` and storing it if cacheable.
+        """
+        start: Optional[Message] = None
+        chunks: list[bytes] = []
+        size = 0
+        cacheable = True
+
+        async def capture(message: Message) -> None:
+            nonlocal start, size, cacheable
+            if message["type"] == "http.response.start":
+                start = message
+                raw = list(message.get("headers", []))
+                cacheable = message["status"] == 200 and not any(k == b"set-cookie" for k, _ in raw)
+                # tags are internal; never send them to the client
+                message = {**message, "headers": [(k, v) for k, v in raw if k != TAG_HEADER]}
+                message["headers"].append((b"x-cache", b"MISS"))
+            elif message["type"] == "http.response.body" and cacheable:
+                size += len(message.get("body", b""))
+                if size > settings.RESPONSE_CACHE_MAX_BODY:
+                    cacheable = False
+                    chunks.clear()
+                else:
+                    chunks.append(message.get("body", b""))
+                if not message.get("more_body", False) and cacheable and start is not None:
+                    self._store(key, ttl, start, b"".join(chunks))
+            if send is not None:
+                await send(message)
+
+        await self.app(scope, receive, capture)
+
+    def _store(self, key: str, ttl: float, start: Message, body: bytes) -> None:
+        raw = [(k, v) for k, v in start.get("headers", []) if k != b"content-length"]
+        tags = frozenset(
+            tag
+            for k, v in raw if k == TAG_HEADER
+            for tag in v.decode("latin-1").split()
+        )
+        now = time.monotonic()
+        store.put(key, CachedResponse(
+            status=start["status"],
+            headers=[(k, v) for k, v in raw if k != TAG_HEADER],
+            body=body,
+            tags=tags,
+            stored_at=now,
+            fresh_until=now + ttl,
+            stale_until=now + ttl + settings.RESPONSE_CACHE_STALE_SECONDS,
+        ))
+
+    async def _refresh(self, scope: Scope, key: str, ttl: float, entry: CachedResponse) -> None:
+        try:
+            await self._render(scope, _empty_receive(), None, key, ttl)
+            metrics.incr("response_cache_refreshes")
+        except Exception:
+            logger.exception("Background refresh of %s failed", key)
+        finally:
+            entry.refreshing = False
+
+    async def _send_cached(self, scope: Scope, receive: Receive, send: Send, entry: CachedResponse, state: str) -> None:
+        headers = Headers(raw=entry.headers)
+        age = str(int(time.monotonic() - entry.stored_at)).encode()
+        extra = [(b"x-cache", state.encode()), (b"age", age)]
+        etag = headers.get("etag")
+        if etag is not None:
+            last_modified = headers.get("last-modified")
+            try:
+                last_modified = parsedate_to_datetime(last_modified) if last_modified else None
+            except (TypeError, ValueError):
+                last_modified = None
+            if is_not_modified(Request(scope), etag, last_modified):
+                validators = [(k, v) for k, v in entry.headers if k in (b"etag", b"last-modified", b"cache-control")]
+                await send({"type": "http.response.start", "status": 304, "headers": validators + extra})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        await send({
+            "type": "http.response.start",
+            "status": entry.status,
+            "headers": entry.headers + [(b"content-length", str(len(entry.body)).encode())] + extra,
+        })
+        await send({"type": "http.response.body", "body": entry.body})
@@ -1,5 +1,7 @@
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from app.core import deadline
 from app.core.config import settings
 from typing import Optional
 import uuid
@@ -9,9 +11,22 @@ s3_client = boto3.client(
     "s3",
     aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
     aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    region_name=settings.AWS_REGION
+    region_name=settings.AWS_REGION,
+    config=Config(
+        connect_timeout=settings.S3_CONNECT_TIMEOUT,
+        read_timeout=settings.S3_READ_TIMEOUT,
+        retries={"max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "standard"},
+    ),
 )
 
+# Don't start (or retry) an S3 request once the HTTP request's deadline has passed.
+# remaining_ms() raises DeadlineExceeded in that case; boto3 calls run in the threadpool,
+# which carries the request's context over.
+def _check_deadline(**kwargs):
+    deadline.remaining_ms()
+
+s3_client.meta.events.register("before-send.s3", _check_deadline)
+
 BUCKET_NAME = settings.AWS_S3_BUCKET
 
 # Upload a file
@@ -0,0 +1,67 @@
+# app/core/singleflight.py
+"""
+Request coalescing for hot identical reads. Within a worker, concurrent callers
+asking for the same key share the leader's in-flight call instead of each running
+the same query.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.metrics import metrics
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+def _consume_exception(fut: asyncio.Future) -> None:
+    # avoid "exception was never retrieved" when nobody was waiting
+    if not fut.cancelled():
+        fut.exception()
+
+
+class SingleFlight:
+    """
+    The first caller for a key (the leader) runs `fn`; callers arriving while it is in
+    flight wait for its result. Followers wait at most `timeout` seconds and then run
+    their own `fn`, as they also do if the leader is cancelled, so a slow or abandoned
+    leader never stalls them. Each caller passes its own `fn` (bound to its own session),
+    so nothing but the result is shared.
+    """
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self._inflight: dict[Any, asyncio.Future] = {}
+
+    async def do(self, key: Any, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        fut = self._inflight.get(key)
+        if fut is None:
+            return await self._lead(key, fn)
+
+        metrics.incr("singleflight_shared", self.name)
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), timeout if timeout is not None else self.timeout)
+        except (asyncio.TimeoutError, _LeaderCancelled):
+            metrics.incr("singleflight_fallback", self.name)
+            return await fn()
+
+    async def _lead(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(_consume_exception)
+        self._inflight[key] = fut
+        metrics.incr("singleflight_leader", self.name)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as exc:
+            fut.set_exception(exc)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
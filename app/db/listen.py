@@ -0,0 +1,79 @@
+# app/db/listen.py
+"""
+Postgres LISTEN on a dedicated asyncpg connection (outside the pool, always on the
+primary: notifications are not replicated). Payloads are comma-separated ids;
+bursts are coalesced before the handler runs.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+import asyncpg
+
+from app.core.metrics import metrics
+from app.db.pg import POSTGRES_URL
+
+logger = logging.getLogger(__name__)
+
+
+class IdChannelListener:
+    """
+    on_connect runs after every (re)connect, once LISTEN is active, so a full reload
+    there can't miss changes made while the listener was down.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        on_ids: Callable[[set[int]], Awaitable[None]],
+        on_connect: Callable[[], Awaitable[None]],
+        debounce: float = 0.05,
+        keepalive: float = 10.0,
+    ):
+        self.channel = channel
+        self.on_ids = on_ids
+        self.on_connect = on_connect
+        self.debounce = debounce
+        self.keepalive = keepalive
+        # true between a completed on_connect and the next connection failure
+        self.connected = False
+
+    async def run(self) -> None:
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(POSTGRES_URL.set(drivername="postgresql").render_as_string(hide_password=False))
+                queue: asyncio.Queue[str] = asyncio.Queue()
+                await conn.add_listener(self.channel, lambda _c, _pid, _ch, payload: queue.put_nowait(payload))
+                await self.on_connect()
+                self.connected = True
+                backoff = 1.0
+                await self._consume(conn, queue)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("LISTEN %s failed; reconnecting in %.0fs", self.channel, backoff)
+                metrics.incr("listen_reconnects", self.channel)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                self.connected = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    async def _consume(self, conn, queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=self.keepalive)
+            except asyncio.TimeoutError:
+                # a dead connection delivers nothing; make it raise instead
+                await conn.execute("SELECT 1")
+                continue
+            await asyncio.sleep(self.debounce)
+            payloads = [payload]
+            while not queue.empty():
+                payloads.append(queue.get_nowait())
+            ids = {int(pid) for p in payloads for pid in p.split(",") if pid}
+            metrics.incr("listen_notifications", self.channel, len(payloads))
+            await self.on_ids(ids)
@@ -1,16 +1,26 @@
 # app/db/models.py
 from __future__ import annotations
-from datetime import datetime
+from datetime import date, datetime
 from sqlalchemy import (
     Integer,
+    SmallInteger,
     String,
     Boolean,
     Float,
     Text,
+    Date,
     DateTime,
     ForeignKey,
+    ForeignKeyConstraint,
+    CheckConstraint,
     Enum,
+    Computed,
+    Index,
+    text,
+    DDL,
+    event,
 )
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 import enum
 
@@ -71,16 +81,110 @@ class Product(Base):
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
     price: Mapped[float] = mapped_column(Float, nullable=False)
     stock: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # > 0: the stock is split over this many ProductStockShard rows, and `stock`
+    # is their sum as of the last refresh
+    stock_shards: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0, server_default="0")
     image_key: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    # bumped by the repo layer on every change; drives ETag/Last-Modified
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    # full-text document for /products/search; maintained by Postgres, never loaded by default
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
     owner: Mapped["User"] = relationship("User", back_populates="products")
 
+    __table_args__ = (
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        # typo-tolerant name matching (pg_trgm word similarity)
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        # catalog listing filters/sorts (product_repo.LISTING_SORTS); partial, since
+        # the storefront only ever lists active products
+        Index("ix_products_active_price", "price", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_created", "created_at", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_name", "name", "id", postgresql_where=text("is_active")),
+        Index("ix_products_in_stock_price", "price", "id", postgresql_where=text("is_active AND stock > 0")),
+        Index("ix_products_active_owner_created", "owner_id", "created_at", "id", postgresql_where=text("is_active")),
+    )
+
     def __repr__(self):
         return f"<Product id={self.id} name={self.name} owner_id={self.owner_id}>"
 
 
+# Statement-level triggers announce changed product ids on PRODUCT_CHANGES_CHANNEL
+# (comma-separated, 500 per notification to stay under the 8000-byte payload limit).
+# Consumed by the catalog snapshot; the migration creates the same objects.
+PRODUCT_CHANGES_CHANNEL = "product_changes"
+
+_NOTIFY_PRODUCT_CHANGES = DDL(f"""
+CREATE OR REPLACE FUNCTION notify_product_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('{PRODUCT_CHANGES_CHANNEL}', ids)
+        FROM (SELECT string_agg(id::text, ',') AS ids
+              FROM (SELECT id, (row_number() OVER ()) / 500 AS chunk FROM old_rows) AS numbered
+              GROUP BY chunk) AS batches;
+    ELSE
+        PERFORM pg_notify('{PRODUCT_CHANGES_CHANNEL}', ids)
+        FROM (SELECT string_agg(id::text, ',') AS ids
+              FROM (SELECT id, (row_number() OVER ()) / 500 AS chunk FROM new_rows) AS numbered
+              GROUP BY chunk) AS batches;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+for _op, _ref in (("INSERT", "NEW TABLE AS new_rows"), ("UPDATE", "NEW TABLE AS new_rows"), ("DELETE", "OLD TABLE AS old_rows")):
+    event.listen(Product.__table__, "after_create", DDL(
+        f"CREATE TRIGGER products_notify_{_op.lower()} AFTER {_op} ON products "
+        f"REFERENCING {_ref} FOR EACH STATEMENT EXECUTE FUNCTION notify_product_changes()"
+    ).execute_if(dialect="postgresql"))
+event.listen(Product.__table__, "before_create", _NOTIFY_PRODUCT_CHANGES.execute_if(dialect="postgresql"))
+
+
+class ProductStockShard(Base):
+    """
+    A slice of a hot product's stock. Each checkout takes from one shard, so
+    concurrent buyers of the product don't all queue on its row lock.
+    """
+    __tablename__ = "product_stock_shards"
+
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    stock: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    __table_args__ = (CheckConstraint("stock >= 0", name="ck_product_stock_shards_stock"),)
+
+    def __repr__(self):
+        return f"<ProductStockShard product_id={self.product_id} shard={self.shard} stock={self.stock}>"
+
+
+class ProductSyncBatch(Base):
+    """
+    A stock/price sync batch that has been applied; replays of the same batch_id
+    get the stored result instead of applying the deltas twice.
+    """
+    __tablename__ = "product_sync_batches"
+
+    batch_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    # sha256 of the changes, to tell a retry from a different batch reusing the id
+    digest: Mapped[str] = mapped_column(String(64), nullable=False)
+    result: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<ProductSyncBatch batch_id={self.batch_id}>"
+
+
 class File(Base):
     __tablename__ = "files"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -101,24 +205,37 @@ class OrderStatus(enum.Enum):
 
 
 class Order(Base):
+    # range-partitioned by created_at month (app/db/partitions.py), so the primary
+    # key has to include it; ids are still unique, from the sequence
     __tablename__ = "orders"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus), default=OrderStatus.pending, nullable=False)
     total: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, default=datetime.utcnow)
 
     user: Mapped["User"] = relationship("User", back_populates="orders")
     items: Mapped[list["OrderItem"]] = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # newest-first listings walk the partitions in order and stop at LIMIT; also
+        # serves lookups by user_id alone, so there's no separate index on it
+        Index("ix_orders_user_created", "user_id", "created_at"),
+        Index("ix_orders_created_at", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
     def __repr__(self):
         return f"<Order id={self.id} user_id={self.user_id} total={self.total}>"
 
 
 class OrderItem(Base):
+    # partitioned like its order; order_created_at is the order's created_at, so
+    # loading an order's items only touches that month's partition
     __tablename__ = "order_items"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    order_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    order_created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
     product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True, index=True)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     price_at_purchase: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
@@ -126,4 +243,70 @@ class OrderItem(Base):
     order: Mapped["Order"] = relationship("Order", back_populates="items")
     # product relationship not strictly necessary, but helpful
     product: Mapped["Product"] = relationship("Product")
-    
+
+    __table_args__ = (
+        ForeignKeyConstraint(["order_id", "order_created_at"], ["orders.id", "orders.created_at"], ondelete="CASCADE"),
+        {"postgresql_partition_by": "RANGE (order_created_at)"},
+    )
+
+
+class OrderArchiveObject(Base):
+    """
+    Manifest of archived orders: one row per S3 object (app/core/order_archive.py),
+    all from one month. Ids in an object aren't contiguous, so [min_order_id,
+    max_order_id] only says which objects may hold an order.
+    """
+    __tablename__ = "order_archive_objects"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    key: Mapped[str] = mapped_column(String(1024), unique=True, nullable=False)
+    month: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    min_order_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    max_order_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    order_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_order_archive_objects_id_range", "min_order_id", "max_order_id"),)
+
+    def __repr__(self):
+        return f"<OrderArchiveObject key={self.key} orders={self.order_count}>"
+
+
+# Sales rollups, maintained incrementally by order_repo (via sales_repo) in the
+# transaction that places or cancels an order. Days are UTC days of the order's
+# created_at; cancelled orders count only in order_status_daily. Each counter is
+# spread over bucket rows (order id % SALES_ROLLUP_BUCKETS), summed when read.
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    bucket: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    units: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+
+
+class ProductSalesDaily(Base):
+    # no foreign key: sales history outlives deleted products
+    __tablename__ = "product_sales_daily"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bucket: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    units: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (Index("ix_product_sales_daily_product_day", "product_id", "day"),)
+
+
+class OrderStatusDaily(Base):
+    __tablename__ = "order_status_daily"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus), primary_key=True)
+    bucket: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# create_all (tests, scripts/seed_db.py) only gets the catch-all partitions; the
+# migration and ensure_order_partitions add the monthly ones
+for _table in (Order.__table__, OrderItem.__table__):
+    event.listen(_table, "after_create", DDL(
+        f"CREATE TABLE {_table.name}_default PARTITION OF {_table.name} DEFAULT"
+    ).execute_if(dialect="postgresql"))
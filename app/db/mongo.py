@@ -1,21 +1,139 @@
 # app/db/mongo.py
 from __future__ import annotations
 import logging
+import threading
+import time
 from typing import AsyncGenerator
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
 from datetime import datetime, timedelta, timezone
+from app.core import deadline
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 _mongo_client: AsyncIOMotorClient | None = None
 
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Collects connection pool statistics from pymongo's CMAP events.
+    Events fire on driver threads, so counters are guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open_connections = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def _record_wait(self, event):
+        # the whole checkout: waiting for a free connection plus, when the pool opened
+        # a new one for it, the connect and handshake (unlike the Postgres pool stats)
+        waited = event.duration
+        if waited is None:  # pymongo < 4.7 has no duration on the event; time it the same way
+            started = getattr(self._local, "started", None)
+            waited = time.perf_counter() - started if started is not None else 0.0
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self._record_wait(event)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.checkout_timeouts += 1
+            self._record_wait(event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "min_pool_size": settings.MONGO_MIN_POOL_SIZE,
+                "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_timeouts": self.checkout_timeouts,
+                "wait_avg_ms": (self.wait_total / self.checkouts * 1000) if self.checkouts else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+pool_listener = PoolStatsListener()
+
+
+def _client_options() -> dict:
+    options = {
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "event_listeners": [pool_listener],
+    }
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = ",".join(settings.MONGO_COMPRESSORS)
+    return options
+
 def get_mongo_client() -> AsyncIOMotorClient:
     global _mongo_client
     if _mongo_client is None:
-        _mongo_client = AsyncIOMotorClient(settings.MONGO_URI, serverSelectionTimeoutMS=5000)
+        _mongo_client = AsyncIOMotorClient(settings.MONGO_URI, **_client_options())
     return _mongo_client
 
+def pool_stats() -> dict:
+    """
+    Snapshot of the MongoDB connection pool of this worker.
+    """
+    return pool_listener.stats()
+
 def get_mongo_db() -> AsyncIOMotorDatabase:
     client = get_mongo_client()
     return client[settings.MONGO_DB]
@@ -33,7 +151,7 @@ async def blacklist_token(jti: str, expires_in: int = 3600):
 
 async def is_token_blacklisted(jti: str) -> bool:
     db = get_mongo_db()
-    return await db.token_blacklist.find_one({"jti": jti}) is not None
+    return await db.token_blacklist.find_one({"jti": jti}, max_time_ms=deadline.remaining_ms()) is not None
 
 
 async def store_otp(email: str, otp: str, expires_in: int = 300):
@@ -46,7 +164,7 @@ async def store_otp(email: str, otp: str, expires_in: int = 300):
 
 async def verify_otp(email: str, otp: str) -> bool:
     db = get_mongo_db()
-    doc = await db.otps.find_one({"email": email})
+    doc = await db.otps.find_one({"email": email}, max_time_ms=deadline.remaining_ms())
     if not doc:
         return False
 
@@ -69,4 +187,5 @@ def close_mongo_client() -> None:
     if _mongo_client:
         _mongo_client.close()
         _mongo_client = None
+        pool_listener.reset()
         logger.info("Closed MongoDB client")
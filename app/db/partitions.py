@@ -0,0 +1,125 @@
+# app/db/partitions.py
+"""
+Monthly range partitions of orders (by created_at) and order_items (by
+order_created_at, a copy of its order's created_at). ensure_order_partitions
+creates the coming months ahead of time; rows outside every monthly partition
+land in the tables' DEFAULT partitions, which should stay empty (creating a month
+moves any of its rows out of them).
+"""
+import logging
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+# referenced tables first: order_items has a foreign key to orders
+PARTITIONED_TABLES = ("orders", "order_items")
+
+# pg_advisory_xact_lock key; every worker runs the job, one at a time
+_LOCK_KEY = 0x6F726470  # "ordp"
+
+
+def month_start(value: date | datetime) -> date:
+    if isinstance(value, datetime):
+        value = value.astimezone(timezone.utc) if value.tzinfo else value
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _bounds(month: date) -> tuple[str, str]:
+    # in UTC, whatever the session's TimeZone
+    return f"{month} 00:00:00+00", f"{add_months(month, 1)} 00:00:00+00"
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    lo, hi = _bounds(month)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{lo}') TO ('{hi}')"
+    )
+
+
+async def existing_partitions(conn: AsyncConnection, table: str) -> set[str]:
+    res = await conn.execute(
+        text("SELECT c.relname FROM pg_inherits AS i JOIN pg_class AS c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:table AS regclass)"),
+        {"table": table},
+    )
+    return set(res.scalars())
+
+
+# Rows of a month that has no partition yet, set aside so the partition can be
+# created: the month's orders in the DEFAULT partition, and items either in the
+# DEFAULT partition or belonging to those orders (deleting the orders first would
+# cascade to them).
+_SET_ASIDE_ITEMS = """
+WITH moved AS (
+    DELETE FROM order_items
+    WHERE order_created_at >= :lo AND order_created_at < :hi
+      AND (tableoid = CAST('order_items_default' AS regclass)
+           OR (order_id, order_created_at) IN (SELECT id, created_at FROM orders_default WHERE created_at >= :lo AND created_at < :hi))
+    RETURNING *
+)
+INSERT INTO stray_order_items SELECT * FROM moved
+"""
+_SET_ASIDE_ORDERS = """
+WITH moved AS (DELETE FROM orders_default WHERE created_at >= :lo AND created_at < :hi RETURNING *)
+INSERT INTO stray_orders SELECT * FROM moved
+"""
+
+
+async def _create_month(conn: AsyncConnection, month: date, tables: list[str]) -> None:
+    """
+    Create `month`'s partitions of `tables`. Postgres refuses while the DEFAULT
+    partition holds rows of that month, so those are set aside first and put back
+    through the parent tables once the partitions exist.
+    """
+    params = dict(zip(("lo", "hi"), _bounds(month)))
+    for table in PARTITIONED_TABLES:
+        await conn.execute(text(f"CREATE TEMP TABLE stray_{table} (LIKE {table}) ON COMMIT DROP"))
+    moved_items = (await conn.execute(text(_SET_ASIDE_ITEMS), params)).rowcount
+    moved_orders = (await conn.execute(text(_SET_ASIDE_ORDERS), params)).rowcount
+    for table in tables:
+        await conn.execute(text(create_partition_sql(table, month)))
+    for table in PARTITIONED_TABLES:
+        await conn.execute(text(f"INSERT INTO {table} SELECT * FROM stray_{table}"))
+        await conn.execute(text(f"DROP TABLE stray_{table}"))
+    if moved_orders or moved_items:
+        logger.warning("Moved %d orders and %d items of %s out of the default partitions", moved_orders, moved_items, f"{month:%Y-%m}")
+
+
+async def ensure_order_partitions(conn: AsyncConnection, months_ahead: int, start: Optional[date] = None) -> list[str]:
+    """
+    Create the monthly partitions of both tables from `start` (default: the current
+    month) through `months_ahead` months later, inside the caller's transaction.
+    Each month gets its own savepoint, so one that fails doesn't stop the others.
+    Returns the names of the partitions created.
+    """
+    first = month_start(start or datetime.now(timezone.utc))
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+    existing = {table: await existing_partitions(conn, table) for table in PARTITIONED_TABLES}
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        missing = [table for table in PARTITIONED_TABLES if partition_name(table, month) not in existing[table]]
+        if not missing:
+            continue
+        try:
+            async with conn.begin_nested():
+                await _create_month(conn, month, missing)
+        except DBAPIError:
+            logger.exception("Failed to create the %s partitions", f"{month:%Y-%m}")
+            continue
+        created.extend(partition_name(table, month) for table in missing)
+    return created
@@ -2,13 +2,22 @@
 from __future__ import annotations
 import asyncio
 import logging
-from typing import AsyncGenerator
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.engine import URL
+from sqlalchemy.orm import Session
 from tenacity import retry, wait_exponential, stop_after_delay, retry_if_exception_type
-from sqlalchemy import text
+from sqlalchemy import event, text
+from sqlalchemy.sql.elements import TextClause
 
+from app.core import deadline
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -23,24 +32,290 @@ POSTGRES_URL = URL.create(
     database=settings.POSTGRES_DB,
 )
 
-# Recommended production-ish engine options
-# pool_size not supported by asyncpg driver in the same way; tuning via poolclass and max_overflow is advanced.
-engine = create_async_engine(
-    POSTGRES_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-    pool_timeout=30,            # seconds
-    connect_args={"server_settings": {"application_name": settings.PROJECT_NAME}},
-)
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that also records how long callers waited for a connection.
+    Only the wait for a free slot counts: opening a new connection and the
+    pre-ping are left out. Counters are per pool instance (i.e. per worker process).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        record = super()._create_connection()
+        record.info["connect_seconds"] = time.perf_counter() - started
+        return record
+
+    def _do_get(self):
+        record = super()._do_get()
+        # when this caller got its slot; _do_get can recurse, the innermost call counts
+        record.info.setdefault("got_at", time.perf_counter() - record.info.pop("connect_seconds", 0.0))
+        return record
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            fairy = super().connect()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            self._record_wait(time.perf_counter() - start)
+            raise
+        self._record_wait(fairy._connection_record.info.pop("got_at", start) - start)
+        return fairy
+
+    def _record_wait(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+
+def _create_engine(url):
+    # Pool sizing comes from settings so it can be tuned per deployment
+    # (workers * (pool_size + max_overflow) must stay below Postgres max_connections).
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+        pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+        connect_args={"server_settings": {"application_name": settings.PROJECT_NAME}},
+    )
+
+engine = _create_engine(POSTGRES_URL)
+
+# Optional streaming replica used for read-only endpoints
+replica_engine = None
+if settings.POSTGRES_REPLICA_HOST:
+    replica_engine = _create_engine(
+        POSTGRES_URL.set(host=settings.POSTGRES_REPLICA_HOST, port=settings.POSTGRES_REPLICA_PORT)
+    )
+
+
+# --- Connection hold time vs. query time ---
+# DbUsageMiddleware (app/core/middleware.py) installs a DbUsage per request and reports
+# the totals per route. A large gap between hold and query time means the request kept
+# a pooled connection busy while doing something else.
+@dataclass
+class DbUsage:
+    hold: float = 0.0     # seconds connections were checked out for this request
+    query: float = 0.0    # seconds spent executing statements
+    queries: int = 0
+
+db_usage: ContextVar[Optional[DbUsage]] = ContextVar("db_usage", default=None)
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["usage"] = db_usage.get()
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+def _on_checkin(dbapi_connection, connection_record):
+    usage = connection_record.info.pop("usage", None)
+    started = connection_record.info.pop("checked_out_at", None)
+    if usage is not None and started is not None:
+        usage.hold += time.perf_counter() - started
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started_at"].pop()
+    usage = db_usage.get()
+    if usage is not None:
+        usage.query += time.perf_counter() - started
+        usage.queries += 1
+
+for _engine in filter(None, (engine, replica_engine)):
+    event.listen(_engine.sync_engine, "checkout", _on_checkout)
+    event.listen(_engine.sync_engine, "checkin", _on_checkin)
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Read-your-writes tracking ---
+# The middleware in app/core/middleware.py installs a RequestLSN per request. Commits on
+# the primary store the WAL position in it, and the middleware hands it back to the client
+# as a cookie so that the client's next reads only go to a replica that has replayed it.
+@dataclass
+class RequestLSN:
+    min_lsn: Optional[str] = None    # sent by the client (last write it saw)
+    write_lsn: Optional[str] = None  # produced by a commit during this request
+
+request_lsn: ContextVar[Optional[RequestLSN]] = ContextVar("request_lsn", default=None)
+
+
+def parse_lsn(lsn: str) -> int:
+    """
+    Convert a textual pg_lsn ('16/B374D848') into a comparable integer.
+    """
+    hi, lo = lsn.split("/")
+    return (int(hi, 16) << 32) + int(lo, 16)
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_deadline(session, transaction, connection):
+    """
+    Bound every statement and lock wait of the transaction by the request's remaining budget.
+    """
+    budget_ms = deadline.remaining_ms()
+    if budget_ms is None or connection.dialect.name != "postgresql":
+        return
+    connection.execute(
+        text("SELECT set_config('statement_timeout', :ms, true), set_config('lock_timeout', :ms, true)"),
+        {"ms": f"{budget_ms}ms"},
+    )
+
+
+class _PrimarySyncSession(Session):
+    pass
+
+@event.listens_for(_PrimarySyncSession, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info["wrote"] = True
+
+# raw SQL (text()) isn't flagged as DML by the ORM, so look at its leading keyword
+_TEXT_DML = re.compile(r"\s*(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+@event.listens_for(_PrimarySyncSession, "do_orm_execute")
+def _mark_dml(orm_execute_state):
+    statement = orm_execute_state.statement
+    if (
+        orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+        or (isinstance(statement, TextClause) and _TEXT_DML.match(statement.text))
+    ):
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(_PrimarySyncSession, "after_rollback")
+def _clear_writes(session):
+    session.info.pop("wrote", None)
+
+
+class PrimarySession(AsyncSession):
+    """
+    AsyncSession bound to the primary. When a replica is configured, each commit
+    that wrote something records the primary's WAL position for read-your-writes routing.
+    """
+    sync_session_class = _PrimarySyncSession
+
+    async def commit(self) -> None:
+        await super().commit()
+        wrote = self.sync_session.info.pop("wrote", False)
+        state = request_lsn.get()
+        if replica_engine is None or state is None or not wrote:
+            return
+        res = await self.execute(text("SELECT pg_current_wal_lsn()::text"))
+        state.write_lsn = res.scalar()
+
 
 # async_sessionmaker (SQLAlchemy 2.0)
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     expire_on_commit=False,
-    class_=AsyncSession,
+    class_=PrimarySession,
 )
 
+ReadSessionLocal = async_sessionmaker(
+    bind=replica_engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
+) if replica_engine is not None else None
+
+
+class ReplicaMonitor:
+    """
+    Caches the replica's replay position and lag so that routing a read costs
+    at most one probe per REPLICA_LAG_CHECK_INTERVAL seconds per worker. A probe
+    that takes longer than `timeout` counts as failed, so a hung replica holds up
+    the reads waiting on it for at most that long.
+    """
+
+    def __init__(self, replica, max_lag: float, check_interval: float, timeout: float = 1.0):
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.lag: Optional[float] = None
+        self.replay_lsn: Optional[int] = None
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def probe(self) -> None:
+        """
+        Query the replica for its replay lag (seconds) and replayed WAL position.
+        A replica that is not in recovery (e.g. a plain second instance in tests)
+        reports zero lag and its own current WAL position.
+        """
+        try:
+            # connect (pool wait included) and query together
+            async with asyncio.timeout(self.timeout), self.replica.connect() as conn:
+                row = (await conn.execute(text(
+                    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0"
+                    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END,"
+                    " (CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()"
+                    " ELSE pg_current_wal_lsn() END)::text"
+                ))).one()
+            self.lag = float(row[0])
+            self.replay_lsn = parse_lsn(row[1]) if row[1] else None
+        except Exception as exc:
+            logger.warning("Replica probe failed, routing reads to primary: %r", exc)
+            self.lag = None
+            self.replay_lsn = None
+        self.checked_at = time.monotonic()
+
+    async def refresh(self, force: bool = False) -> None:
+        async with self._lock:
+            if force or time.monotonic() - self.checked_at >= self.check_interval:
+                await self.probe()
+
+    def _caught_up(self, min_lsn: Optional[int]) -> bool:
+        if self.lag is None or self.lag > self.max_lag:
+            return False
+        if min_lsn is None:
+            return True
+        return self.replay_lsn is not None and self.replay_lsn >= min_lsn
+
+    async def usable(self, min_lsn: Optional[str] = None) -> bool:
+        """
+        True if reads may go to the replica: it answered the last probe, its lag is
+        within REPLICA_MAX_LAG_SECONDS and (if given) it has replayed `min_lsn`.
+        """
+        wanted = None
+        if min_lsn:
+            try:
+                wanted = parse_lsn(min_lsn)
+            except ValueError:
+                wanted = None
+        await self.refresh()
+        if self._caught_up(wanted):
+            return True
+        if wanted is not None and self.lag is not None and self.lag <= self.max_lag:
+            # the cached position may just be stale; look once more before falling back
+            await self.refresh(force=True)
+            return self._caught_up(wanted)
+        return False
+
+    def stats(self) -> dict:
+        return {"lag_seconds": self.lag, "max_lag_seconds": self.max_lag}
+
+
+replica_monitor = ReplicaMonitor(
+    replica_engine,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_LAG_CHECK_INTERVAL,
+    timeout=settings.REPLICA_PROBE_TIMEOUT,
+) if replica_engine is not None else None
+
 # Retry on connection failure during startup (exponential backoff)
 @retry(
     reraise=True,
@@ -70,6 +345,64 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.rollback()
             raise
 
+@asynccontextmanager
+async def db_released(session: AsyncSession):
+    """
+    Run non-DB work (file reads, S3 calls, ...) without holding a pooled connection.
+    A read-only transaction is ended on entry (committed without expiring loaded
+    objects); the next query checks a connection out again. A session that has
+    written anything, flushed or not, keeps its connection: committing would make
+    half of the request's work permanent.
+    """
+    if session.in_transaction():
+        if session.new or session.dirty or session.deleted or session.info.get("wrote"):
+            logger.warning("db_released: session has uncommitted writes, keeping its connection")
+        else:
+            await session.commit()
+    yield
+
+# Dependency for read-only endpoints
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Yields a session on the replica when one is configured, healthy, within the lag
+    threshold and caught up with the caller's last write; otherwise on the primary.
+    """
+    session_factory = AsyncSessionLocal
+    if replica_monitor is not None:
+        state = request_lsn.get()
+        if await replica_monitor.usable(state.min_lsn if state else None):
+            session_factory = ReadSessionLocal
+    async with session_factory() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
+def pool_stats(eng=None) -> dict:
+    """
+    Snapshot of a Postgres connection pool of this worker (primary by default).
+    """
+    pool = (eng or engine).pool
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # overflow() counts down from -pool_size until the pool is full
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.POSTGRES_MAX_OVERFLOW,
+    }
+    if isinstance(pool, InstrumentedAsyncPool):
+        stats.update(
+            checkouts=pool.checkouts,
+            timeouts=pool.timeouts,
+            wait_avg_ms=(pool.wait_total / pool.checkouts * 1000) if pool.checkouts else 0.0,
+            wait_max_ms=pool.wait_max * 1000,
+        )
+    return stats
+
 # Helper to close engine on shutdown
 async def close_engine():
     await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
@@ -1,15 +1,127 @@
-from contextlib import asynccontextmanager
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timezone
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-from app.api.v1 import routes_health, routes_users, routes_products,routes_auth, routes_s3, routes_orders
+from sqlalchemy.exc import SQLAlchemyError
+from app.api.v1 import routes_health, routes_users, routes_products,routes_auth, routes_s3, routes_orders, routes_admin
+from app.core import catalog_snapshot
+from app.core.cache import close_caches
 from app.core.config import settings
-from app.db.pg import wait_for_postgres, close_engine
+from app.core.middleware import ReadYourWritesMiddleware, DbUsageMiddleware, DeadlineMiddleware, ConcurrencyLimitMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.response_cache import ResponseCacheMiddleware
+from app.db.pg import wait_for_postgres, close_engine, engine, AsyncSessionLocal, ReadSessionLocal
+from app.db.partitions import ensure_order_partitions
+from app.repos import product_repo
+from app.db.listen import IdChannelListener
+from app.db.models import PRODUCT_CHANGES_CHANNEL
 from app.db.mongo import get_mongo_client, close_mongo_client, init_indexes
 import logging
 
 logger = logging.getLogger(__name__)
 
+async def load_autocomplete() -> None:
+    try:
+        # the replica when there is one (a slightly stale index is fine), else the primary
+        async with (ReadSessionLocal or AsyncSessionLocal)() as session:
+            count = await product_repo.load_autocomplete(session)
+        logger.info("Autocomplete index built with %d products.", count)
+    except (SQLAlchemyError, OSError):
+        # typeahead degrades to stale/empty results; the next refresh retries
+        logger.exception("Failed to build the autocomplete index")
+
+async def refresh_autocomplete_forever() -> None:
+    # the first build too: requests are served meanwhile, typeahead starts out empty
+    while True:
+        await load_autocomplete()
+        await asyncio.sleep(settings.AUTOCOMPLETE_REFRESH_SECONDS)
+
+async def load_catalog_snapshot() -> None:
+    # primary, not replica: changes committed before LISTEN started must be in the load
+    async with AsyncSessionLocal() as session:
+        if settings.CATALOG_SNAPSHOT_PATH and not product_repo.catalog_snapshot.ready:
+            # first connect: start from the saved file if there is one
+            started = time.perf_counter()
+            count = await product_repo.warm_catalog_snapshot(session, settings.CATALOG_SNAPSHOT_PATH)
+            if count is not None:
+                logger.info("Catalog snapshot mapped from %s with %d products in %.0fms.", settings.CATALOG_SNAPSHOT_PATH, count, (time.perf_counter() - started) * 1000)
+                return
+        count = await product_repo.load_catalog_snapshot(session)
+    logger.info("Catalog snapshot loaded with %d products.", count)
+
+async def save_catalog_snapshot(force: bool = False) -> None:
+    # only while LISTEN is up, so the snapshot is known to be current
+    if not (catalog_listener.connected and product_repo.catalog_snapshot.ready):
+        return
+    path = settings.CATALOG_SNAPSHOT_PATH
+    with suppress(FileNotFoundError):
+        if not force and time.time() - os.path.getmtime(path) < settings.CATALOG_SNAPSHOT_SAVE_SECONDS:
+            return  # another worker on this host saved it recently
+    try:
+        watermark = datetime.now(timezone.utc)
+        exported = product_repo.catalog_snapshot.export()
+        await asyncio.to_thread(catalog_snapshot.save, path, exported, watermark)
+    except Exception:
+        logger.exception("Failed to save the catalog snapshot to %s", path)
+
+async def save_catalog_snapshot_forever() -> None:
+    while True:
+        # jittered, so the workers of a host don't all save at once
+        await asyncio.sleep(settings.CATALOG_SNAPSHOT_SAVE_SECONDS * random.uniform(0.5, 1.0))
+        await save_catalog_snapshot()
+
+async def apply_catalog_changes(product_ids: set[int]) -> None:
+    # also the primary: a replica may not have the notified change yet
+    async with AsyncSessionLocal() as session:
+        await product_repo.apply_catalog_changes(session, product_ids)
+
+async def refresh_sharded_stock_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.STOCK_SHARDS_REFRESH_SECONDS)
+        try:
+            async with AsyncSessionLocal() as session:
+                await product_repo.refresh_sharded_stock(session)
+        except Exception:
+            # listings show the previous sums until the next round
+            logger.exception("Failed to refresh sharded stock")
+
+def load_related_products() -> None:
+    try:
+        if product_repo.related_products.load(settings.RELATED_PRODUCTS_PATH):
+            logger.info("Related products mapped for %d products.", len(product_repo.related_products))
+    except FileNotFoundError:
+        # not built yet; the route answers 503 until the job has run
+        pass
+    except Exception:
+        logger.exception("Failed to load related products")
+
+async def reload_related_products_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.RELATED_PRODUCTS_RELOAD_SECONDS)
+        load_related_products()
+
+async def maintain_order_partitions() -> None:
+    try:
+        async with engine.begin() as conn:
+            created = await ensure_order_partitions(conn, settings.ORDER_PARTITIONS_AHEAD_MONTHS)
+        if created:
+            logger.info("Created order partitions: %s", ", ".join(created))
+    except Exception:
+        # months without a partition fall into the default partitions; retried next round
+        logger.exception("Failed to create order partitions")
+
+async def maintain_order_partitions_forever() -> None:
+    while True:
+        await maintain_order_partitions()
+        await asyncio.sleep(settings.ORDER_PARTITION_CHECK_SECONDS)
+
+catalog_listener = IdChannelListener(PRODUCT_CHANGES_CHANNEL, on_ids=apply_catalog_changes, on_connect=load_catalog_snapshot)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Code to run on startup
@@ -22,17 +134,49 @@ async def lifespan(app: FastAPI):
     except Exception as exc:
         logger.exception("Failed to connect to databases on startup: %s", exc)
         raise
+    background = [
+        asyncio.create_task(refresh_autocomplete_forever()),
+        asyncio.create_task(maintain_order_partitions_forever()),
+        asyncio.create_task(refresh_sharded_stock_forever()),
+    ]
+    if settings.CATALOG_SNAPSHOT_ENABLED:
+        # loads the snapshot once LISTEN is up, then applies changes as they arrive
+        background.append(asyncio.create_task(catalog_listener.run()))
+        if settings.CATALOG_SNAPSHOT_PATH:
+            background.append(asyncio.create_task(save_catalog_snapshot_forever()))
+    if settings.RELATED_PRODUCTS_PATH:
+        load_related_products()
+        background.append(asyncio.create_task(reload_related_products_forever()))
 
     yield # The application runs here
 
+    if settings.CATALOG_SNAPSHOT_ENABLED and settings.CATALOG_SNAPSHOT_PATH:
+        # the freshest file for the worker that replaces this one
+        await save_catalog_snapshot(force=True)
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
     # Code to run on shutdown
     await close_engine()
     close_mongo_client()
+    await close_caches()
     logger.info("Database connections closed.")
 
 app = FastAPI(title=settings.PROJECT_NAME, version="1.0", lifespan=lifespan)
 
-
+# Per-request deadlines (added before CORS so its 503/504 responses still get CORS headers)
+app.add_middleware(DeadlineMiddleware)
+# Adaptive concurrency limit; wraps the deadline so queueing time doesn't eat into the budget
+if settings.CONCURRENCY_LIMIT_ENABLED:
+    app.add_middleware(ConcurrencyLimitMiddleware)
+# Compression; inside the response cache so cached entries are stored already encoded
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+# Server-side response cache; outside the limiter so hits don't take a slot
+if settings.RESPONSE_CACHE_ENABLED:
+    app.add_middleware(ResponseCacheMiddleware)
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -44,6 +188,11 @@ app.add_middleware(
 # HTTPS redirect
 if settings.HTTPS_ONLY:
     app.add_middleware(HTTPSRedirectMiddleware)
+# Per-route connection hold time vs. query time
+app.add_middleware(DbUsageMiddleware)
+# Read-your-writes stickiness for replica reads
+if settings.POSTGRES_REPLICA_HOST:
+    app.add_middleware(ReadYourWritesMiddleware)
 # Routers
 app.include_router(routes_health.router, prefix="/api/v1/health", tags=["health"])
 app.include_router(routes_auth.router, prefix="/api/v1/auth", tags=["auth"])
@@ -51,6 +200,7 @@ app.include_router(routes_users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(routes_products.router, prefix="/api/v1/products", tags=["products"])
 app.include_router(routes_orders.router, prefix="/api/v1/orders", tags=["orders"])
 app.include_router(routes_s3.router, prefix="/api/v1/s3", tags=["s3"])
+app.include_router(routes_admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 
 @app.get("/")
@@ -1,9 +1,17 @@
 # app/repos/order_repo.py
-from typing import List, Optional
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+import asyncio
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import and_, any_, bindparam, delete, select, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import load_only, selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import Order, OrderItem, Product
+from app.core import order_archive
+from app.db.models import Order, OrderArchiveObject, OrderItem, OrderStatus, Product
+from app.db.partitions import add_months, month_start
+from app.repos import sales_repo
+from app.repos.product_repo import get_products, invalidate_products, return_sharded_stock, take_sharded_stock
 from sqlalchemy.exc import NoResultFound
 
 async def create_order(session: AsyncSession , user_id: int, items: List[dict]):
@@ -24,66 +32,238 @@ async def create_order(session: AsyncSession , user_id: int, items: List[dict]):
     for it in items:
         product_id = it["product_id"]
         quantity = it["quantity"]
+        # populate_existing: a product this session already holds (e.g. merged from the
+        # cache by get_product) may be stale, and its stock is written back as is
         product: Product = ( await session.execute(
-        select(Product).where(Product.id == product_id).with_for_update())).scalar_one_or_none()
+        select(Product).where(Product.id == product_id, Product.stock_shards == 0).with_for_update()
+        .execution_options(populate_existing=True))).scalar_one_or_none()
+        sharded = product is None
+        if sharded:
+            # missing, or its stock is sharded: then the product row isn't locked at all
+            product = (await session.execute(
+                select(Product).where(Product.id == product_id).execution_options(populate_existing=True)
+            )).scalar_one_or_none()
         if not product or not product.is_active:
             raise ValueError(f"Product {product_id} not available")
-        if product.stock < quantity:
-            raise ValueError(f"Insufficient stock for product {product_id}")
+        if sharded:
+            await take_sharded_stock(session, product_id, quantity, product.stock_shards)
+        else:
+            if product.stock < quantity:
+                raise ValueError(f"Insufficient stock for product {product_id}")
+            product.stock = product.stock - quantity
+            product.updated_at = datetime.now(timezone.utc)
         price_at_purchase = float(product.price)
-        product.stock = product.stock - quantity
-        order_item = OrderItem(order_id=order.id, product_id=product_id, quantity=quantity, price_at_purchase=price_at_purchase)
+        order_item = OrderItem(order_id=order.id, order_created_at=order.created_at, product_id=product_id, quantity=quantity, price_at_purchase=price_at_purchase)
         session.add(order_item)
         total += price_at_purchase * quantity
         created_items.append(order_item)
 
     order.total = total
     session.add(order)
+    await sales_repo.record_placed(session, order, created_items)
     await session.commit()
-    q = select(Order).options(selectinload(Order.items)).where(Order.id == order.id)
-    res = await session.execute(q)
+    await invalidate_products(it["product_id"] for it in items)
+    res = await session.execute(_reload(order))
     return res.scalars().first()
 
+def _reload(order: Order):
+    # the partition key lets Postgres read only the order's own month
+    return (
+        select(Order)
+        .options(selectinload(Order.items))
+        .where(Order.id == order.id, Order.created_at == order.created_at)
+    )
+
 async def get_order(session: AsyncSession, order_id: int) -> Optional[Order]:
+    # by id alone the lookup probes every monthly partition's primary key index;
+    # its items are then loaded from the matching month only
     q = (
         select(Order)
         .options(selectinload(Order.items))
         .where(Order.id == order_id)
     )
     res = await session.execute(q)
-    return res.scalars().first()
+    return res.scalars().first() or await get_archived_order(session, order_id)
+
+async def get_archived_order(session: AsyncSession, order_id: int) -> Optional[Order]:
+    """
+    An order moved to the archive by archive_orders, as a transient (read-only)
+    Order; None if no archive object holds it.
+    """
+    res = await session.execute(
+        select(OrderArchiveObject.key)
+        .where(OrderArchiveObject.min_order_id <= order_id, OrderArchiveObject.max_order_id >= order_id)
+        .order_by(OrderArchiveObject.min_order_id.desc())
+    )
+    for key in res.scalars().all():
+        # download and decompression stay off the event loop
+        record = await asyncio.to_thread(order_archive.find, key, order_id)
+        if record is not None:
+            return order_archive.from_record(record)
+    return None
 
-async def list_orders_for_user(session: AsyncSession, user_id: int, limit: int = 50, offset: int = 0):
+def user_orders_query(user_id: int, limit: int = 50, offset: int = 0, with_items: bool = True, fields: Optional[tuple[str, ...]] = None):
     q = (
         select(Order)
-        .options(selectinload(Order.items))
         .where(Order.user_id == user_id)
+        # ordered by the partition key: Postgres scans the newest partitions first
+        # and stops once the page is full, however much order history there is
+        .order_by(Order.created_at.desc(), Order.id.desc())
         .limit(limit)
         .offset(offset)
     )
-    res = await session.execute(q)
+    if fields is not None:
+        # sparse fieldset: SELECT only these columns, plus the (id, created_at) primary key
+        q = q.options(load_only(*(getattr(Order, f) for f in {*fields, "id", "created_at"} if f != "items")))
+    if with_items:
+        q = q.options(selectinload(Order.items))
+    return q
+
+async def list_orders_for_user(session: AsyncSession, user_id: int, limit: int = 50, offset: int = 0, with_items: bool = True, fields: Optional[tuple[str, ...]] = None):
+    """
+    Newest first. with_items=False skips the items query for callers that don't
+    render them; with `fields`, the other order columns are left unloaded.
+    """
+    res = await session.execute(user_orders_query(user_id, limit, offset, with_items, fields))
     return res.scalars().all()
 
 async def cancel_order(session: AsyncSession, order: Order):
     # basic cancellation policy: only pending/paid can be cancelled
     if order.status in (order.status.pending, order.status.paid):
-        order.status = order.status.cancelled
+        previous, order.status = order.status, order.status.cancelled
         # restore stock
         for item in order.items:
-            product = await session.get(Product, item.product_id)
-            if product:
+            product = await session.get(Product, item.product_id, populate_existing=True)
+            if product and product.stock_shards:
+                await return_sharded_stock(session, product.id, item.quantity, product.stock_shards)
+            elif product:
                 product.stock += item.quantity
+                product.updated_at = datetime.now(timezone.utc)
         session.add(order)
+        await sales_repo.record_status_change(session, order, previous)
         await session.commit()
-        q = select(Order).options(selectinload(Order.items)).where(Order.id == order.id)
-        res = await session.execute(q)
-        
+        await invalidate_products(item.product_id for item in order.items)
+        res = await session.execute(_reload(order))
     else:
         raise ValueError("Cannot cancel this order")
     return res.scalars().first()
 
 async def list_all_orders(session: AsyncSession, limit: int = 100, offset: int = 0):
-    q = select(Order).options(selectinload(Order.items)).limit(limit).offset(offset)
+    q = (
+        select(Order)
+        .options(selectinload(Order.items))
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
     res = await session.execute(q)
     return res.scalars().all()
 
+
+async def load_item_products(session: AsyncSession, orders: List[Order]) -> dict[int, Product]:
+    """
+    Products referenced by the orders' items, by id, in one batched lookup that
+    reuses the product cache.
+    """
+    products, _ = await get_products(session, (it.product_id for o in orders for it in o.items if it.product_id is not None))
+    return {p.id: p for p in products}
+
+async def stream_order_rows(session: AsyncSession, created_after: Optional[datetime] = None, created_before: Optional[datetime] = None, status: Optional[OrderStatus] = None, batch_size: int = 1000) -> AsyncIterator:
+    """
+    One row per order item (orders without items yield one row with null item
+    columns), ordered by order then item id. Rows come from a server-side cursor
+    fetched batch_size at a time, so memory stays flat however many orders match.
+    """
+    orders, items = [], [OrderItem.order_id == Order.id, OrderItem.order_created_at == Order.created_at]
+    # the same bounds on both partition keys (the items' in the join condition, so
+    # orders without items still match), and both sides are pruned to the range
+    if created_after is not None:
+        orders.append(Order.created_at >= created_after)
+        items.append(OrderItem.order_created_at >= created_after)
+    if created_before is not None:
+        orders.append(Order.created_at < created_before)
+        items.append(OrderItem.order_created_at < created_before)
+    q = (
+        select(
+            Order.id.label("order_id"), Order.user_id, Order.status, Order.total, Order.created_at,
+            OrderItem.id.label("item_id"), OrderItem.product_id, OrderItem.quantity, OrderItem.price_at_purchase,
+        )
+        .outerjoin(OrderItem, and_(*items))
+        .where(*orders)
+        .order_by(Order.id, OrderItem.id)
+    )
+    if status is not None:
+        q = q.where(Order.status == status)
+    result = await session.stream(q.execution_options(yield_per=batch_size))
+    async for row in result:
+        yield row
+
+async def stream_basket_rows(session: AsyncSession, created_after: Optional[datetime] = None, created_before: Optional[datetime] = None, batch_size: int = 50_000) -> AsyncIterator:
+    """
+    (order_id, product_id) for every item of the orders placed in the range that
+    weren't cancelled, from a server-side cursor; input for related products.
+    """
+    q = (
+        select(OrderItem.order_id, OrderItem.product_id)
+        .join(Order, and_(Order.id == OrderItem.order_id, Order.created_at == OrderItem.order_created_at))
+        .where(Order.status != OrderStatus.cancelled, OrderItem.product_id.is_not(None))
+    )
+    if created_after is not None:
+        q = q.where(Order.created_at >= created_after, OrderItem.order_created_at >= created_after)
+    if created_before is not None:
+        q = q.where(Order.created_at < created_before, OrderItem.order_created_at < created_before)
+    result = await session.stream(q.execution_options(yield_per=batch_size))
+    async for row in result:
+        yield row
+
+ARCHIVABLE_STATUSES = (OrderStatus.delivered, OrderStatus.cancelled)
+
+def _utc(month) -> datetime:
+    return datetime.combine(month, datetime.min.time(), tzinfo=timezone.utc)
+
+async def archive_orders(session: AsyncSession, before: datetime, batch_size: int, max_batches: Optional[int] = None) -> dict:
+    """
+    Move delivered and cancelled orders placed before `before` (with their items)
+    to the S3 archive, oldest first. Each batch is one transaction: lock up to
+    batch_size orders, upload one object per month they span, record the objects
+    in the manifest, delete the orders. A failed upload leaves the batch in place.
+    Returns the number of orders and objects archived.
+    """
+    archived = objects = batches = 0
+    while max_batches is None or batches < max_batches:
+        res = await session.execute(
+            select(Order)
+            .options(selectinload(Order.items))
+            .where(Order.created_at < before, Order.status.in_(ARCHIVABLE_STATUSES))
+            .order_by(Order.created_at, Order.id)
+            .limit(batch_size)
+            # a concurrent run takes the next rows instead of waiting for these
+            .with_for_update(skip_locked=True, of=Order)
+        )
+        orders = res.scalars().all()
+        if not orders:
+            await session.commit()
+            break
+        for month, group in groupby(orders, key=lambda o: month_start(o.created_at)):
+            group = sorted(group, key=lambda o: o.id)
+            ids = [o.id for o in group]
+            key = order_archive.object_key(month, ids[0], ids[-1])
+            blob = order_archive.encode(order_archive.to_record(o) for o in group)
+            await asyncio.to_thread(order_archive.put, key, blob, len(group))
+            session.add(OrderArchiveObject(
+                key=key, month=_utc(month), min_order_id=ids[0], max_order_id=ids[-1], order_count=len(group),
+            ))
+            # bounded by the month as well, so only its partition is touched; items go by cascade
+            await session.execute(
+                delete(Order)
+                .where(Order.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+                .where(Order.created_at >= _utc(month), Order.created_at < _utc(add_months(month, 1)))
+                .execution_options(synchronize_session=False)
+            )
+            objects += 1
+        await session.commit()
+        for order in orders:
+            session.expunge(order)
+        archived += len(orders)
+        batches += 1
+    return {"orders": archived, "objects": objects}
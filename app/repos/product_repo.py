@@ -1,38 +1,618 @@
 # app/repos/product_repo.py
-from typing import Optional
-from sqlalchemy import select, update, delete
+import hashlib
+import json
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterable, Optional
+from sqlalchemy import select, update, delete, inspect, func, any_, bindparam, literal_column, or_, tuple_, text, Float, DateTime, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.orm import load_only, make_transient_to_detached
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import Product
+from app.core.autocomplete import AutocompleteIndex
+from app.core.catalog_snapshot import CatalogSnapshot
+from app.core.related_products import RelatedProducts
+from app.core.cache import create_cache
+from app.core.config import settings
+from app.core.response_cache import PRODUCT_LIST_TAG, product_tag, purge_tags
+from app.core.singleflight import SingleFlight
+from app.db.models import Product, ProductSalesDaily, ProductStockShard, ProductSyncBatch
+from app.db.pg import replica_engine
+
+logger = logging.getLogger(__name__)
+
+# Read-through cache of product rows keyed by id; invalidated by the writes below
+# and by order_repo when stock changes. Filled from primary reads only (_fills_cache).
+product_cache = create_cache("product", ttl=settings.PRODUCT_CACHE_TTL, max_entries=settings.PRODUCT_CACHE_SIZE)
+
+# Coalesces concurrent identical catalog reads within a worker (flash-sale stampedes)
+product_flight = SingleFlight("product", timeout=settings.SINGLEFLIGHT_TIMEOUT)
+
+# Typeahead over active product names, ranked by units sold; built by
+# load_autocomplete and kept current by the writes below (this worker only).
+autocomplete_index = AutocompleteIndex(memo_prefix_len=settings.AUTOCOMPLETE_MEMO_PREFIX_LEN)
+
+# Optional columnar snapshot of active products answering list_products without a
+# query (CATALOG_SNAPSHOT_ENABLED); kept current from product change notifications.
+catalog_snapshot = CatalogSnapshot()
+
+# "Frequently bought together" neighbours, memory-mapped from the file written by
+# scripts/build_related_products.py (RELATED_PRODUCTS_PATH); reloaded when it changes.
+related_products = RelatedProducts()
+
+# deferred columns (search_vector) are never loaded, so they aren't cached either
+_CACHED_COLUMNS = [c.key for c in inspect(Product).column_attrs if not c.deferred]
+_DATETIME_COLUMNS = {c.key for c in inspect(Product).column_attrs if isinstance(c.expression.type, DateTime)}
+
+def _to_row(product: Product) -> dict:
+    row = {key: getattr(product, key) for key in _CACHED_COLUMNS}
+    for key in _DATETIME_COLUMNS & row.keys():
+        if row[key] is not None:
+            row[key] = row[key].isoformat()
+    return row
+
+def _from_row(row: dict) -> Product:
+    values = dict(row)
+    for key in _DATETIME_COLUMNS:
+        if values.get(key) is not None:
+            values[key] = datetime.fromisoformat(values[key])
+    product = Product(**values)
+    make_transient_to_detached(product)
+    return product
+
+async def invalidate_products(product_ids: Iterable[int]) -> None:
+    ids = [pid for pid in set(product_ids) if pid is not None]
+    if ids:
+        await product_cache.invalidate(*(str(pid) for pid in ids))
+        purge_tags(PRODUCT_LIST_TAG, *(product_tag(pid) for pid in ids))
 
 async def create_product(session: AsyncSession, owner_id: int, name: str, price: float, stock: int = 0, description: str | None = None, image_key: str | None = None) -> Product:
     product = Product(owner_id=owner_id, name=name, price=price, stock=stock, description=description, image_key=image_key)
     session.add(product)
     await session.flush()
     await session.commit()
+    purge_tags(PRODUCT_LIST_TAG)
     await session.refresh(product)
+    if product.is_active:
+        autocomplete_index.upsert(product.id, product.name)
     return product
 
+def _expire_products(session: AsyncSession, product_ids: Iterable[int], columns: list[str]) -> None:
+    """
+    Expire `columns` of the products this session has loaded after raw SQL changed
+    their rows, so the session's later reads see the new values. The primary key
+    stays loaded, so callers can keep using product.id.
+    """
+    for pid in product_ids:
+        product = session.identity_map.get(session.identity_key(Product, pid))
+        if product is not None:
+            session.expire(product, columns)
+
+def _fills_cache(session: AsyncSession) -> bool:
+    # a lagging replica can still return the row as it was before the write that
+    # just invalidated it, which would then be served for the whole TTL
+    return replica_engine is None or session.bind is not replica_engine
+
+async def _load_row(session: AsyncSession, product_id: int) -> Optional[dict]:
+    product = await session.get(Product, product_id)
+    if product is None:
+        return None
+    expired = inspect(product).expired_attributes
+    if expired:
+        # see _expire_products; reading them would otherwise lazy-load outside the event loop
+        await session.refresh(product, list(expired))
+    row = _to_row(product)
+    if product.stock_shards:
+        row["stock"] = (await _shard_totals(session, [product_id])).get(product_id, 0)
+    if _fills_cache(session):
+        await product_cache.set(str(product_id), row)
+    return row
+
 async def get_product(session: AsyncSession, product_id: int) -> Optional[Product]:
-    return await session.get(Product, product_id)
+    row = await product_cache.get(str(product_id))
+    if row is None:
+        # per engine: a primary read (owner check, update) must not get a replica's row
+        row = await product_flight.do(("get", product_id, session.bind), lambda: _load_row(session, product_id))
+    if row is None:
+        return None
+    # attach the row to this session without a SELECT, so callers can still update/delete it
+    return await session.merge(_from_row(row), load=False)
+
+def _id_in(ids: list[int]):
+    # one array parameter: the statement is the same (and stays prepared) for any list length
+    return Product.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
 
-async def list_products(session: AsyncSession, limit: int = 50, offset: int = 0, only_active: bool = True):
+async def get_products(session: AsyncSession, product_ids: Iterable[int]) -> tuple[list[Product], list[int]]:
+    """
+    Products for `product_ids` in the requested order (duplicates collapsed), plus
+    the ids that don't exist. Cached rows are reused; the rest come from one
+    WHERE id = ANY(:ids) query. The products are detached; treat them as read-only.
+    """
+    ids = list(dict.fromkeys(product_ids))
+    rows = {int(key): row for key, row in (await product_cache.get_many([str(pid) for pid in ids])).items()}
+    wanted = [pid for pid in ids if pid not in rows]
+    if wanted:
+        res = await session.execute(select(Product).where(_id_in(wanted)))
+        loaded = {product.id: _to_row(product) for product in res.scalars()}
+        sharded = [pid for pid, row in loaded.items() if row["stock_shards"]]
+        if sharded:
+            for pid, total in (await _shard_totals(session, sharded)).items():
+                loaded[pid]["stock"] = total
+        rows.update(loaded)
+        if _fills_cache(session):
+            await product_cache.set_many({str(pid): row for pid, row in loaded.items()})
+    products = [_from_row(rows[pid]) for pid in ids if pid in rows]
+    return products, [pid for pid in ids if pid not in rows]
+
+_VALIDATOR_COLUMNS = ("id", "created_at", "updated_at")
+
+# Supported sort orders; each is served by one of the partial indexes on is_active
+# (see models.Product.__table_args__), with id as the tiebreaker for stable paging.
+LISTING_SORTS = {
+    "id": (Product.id.asc(),),
+    "price": (Product.price.asc(), Product.id.asc()),
+    "-price": (Product.price.desc(), Product.id.desc()),
+    "newest": (Product.created_at.desc(), Product.id.desc()),
+    "name": (Product.name.asc(), Product.id.asc()),
+}
+
+def listing_query(limit: int = 50, offset: int = 0, only_active: bool = True, *, min_price: Optional[float] = None, max_price: Optional[float] = None, in_stock: bool = False, owner_id: Optional[int] = None, created_after: Optional[datetime] = None, created_before: Optional[datetime] = None, sort: str = "id", fields: Optional[tuple[str, ...]] = None):
     q = select(Product)
+    if fields is not None:
+        # sparse fieldset: SELECT only these (plus what ETags need); other attributes stay unloaded
+        q = q.options(load_only(*(getattr(Product, f) for f in {*fields, *_VALIDATOR_COLUMNS})))
     if only_active:
         q = q.where(Product.is_active == True)
-    q = q.limit(limit).offset(offset)
-    res = await session.execute(q)
+    if min_price is not None:
+        q = q.where(Product.price >= min_price)
+    if max_price is not None:
+        q = q.where(Product.price <= max_price)
+    if in_stock:
+        # a literal, not a bind: the planner must prove the ix_products_in_stock_price
+        # predicate even for generic (prepared) plans
+        q = q.where(Product.stock > literal_column("0"))
+    if owner_id is not None:
+        q = q.where(Product.owner_id == owner_id)
+    if created_after is not None:
+        q = q.where(Product.created_at >= created_after)
+    if created_before is not None:
+        q = q.where(Product.created_at < created_before)
+    return q.order_by(*LISTING_SORTS[sort]).limit(limit).offset(offset)
+
+async def _list_products(session: AsyncSession, limit: int, offset: int, only_active: bool, filters: dict):
+    res = await session.execute(listing_query(limit, offset, only_active, **filters))
     return res.scalars().all()
 
+async def list_products(session: AsyncSession, limit: int = 50, offset: int = 0, only_active: bool = True, **filters):
+    """
+    Filters and sort are the keyword arguments of listing_query. Answered from the
+    catalog snapshot when it is loaded; otherwise concurrent identical listings share
+    one query. Either way, treat the returned products as read-only.
+    """
+    if only_active and catalog_snapshot.ready:
+        # projection is free in memory; the snapshot always returns whole rows
+        filters.pop("fields", None)
+        return catalog_snapshot.query(limit, offset, **filters)
+    key = ("list", limit, offset, only_active, tuple(sorted(filters.items())))
+    return await product_flight.do(key, lambda: _list_products(session, limit, offset, only_active, filters))
+
+async def search_products(session: AsyncSession, q: str, limit: int = 20, after: Optional[tuple[float, int]] = None):
+    """
+    Active products matching `q` by full text (stemmed, name weighted over description)
+    or by trigram word similarity on the name, which tolerates typos. Returns
+    (product, rank) pairs ordered by rank, then id; pass the last pair as `after`.
+    """
+    query = func.websearch_to_tsquery("english", q)
+    rank = (
+        func.ts_rank_cd(Product.search_vector, query, 32) + func.word_similarity(q, Product.name)
+    ).cast(Float).label("rank")
+    stmt = (
+        select(Product, rank)
+        .where(Product.is_active == True)
+        # both branches are GIN-indexable: search_vector @@ query, q <% name
+        .where(or_(Product.search_vector.bool_op("@@")(query), Product.name.bool_op("%>")(q)))
+        .order_by(rank.desc(), Product.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(rank, Product.id) < tuple_(*after))
+    res = await session.execute(stmt)
+    return res.all()
+
 async def update_product(session: AsyncSession, product: Product, **fields) -> Product:
     for k, v in fields.items():
         if v is not None and hasattr(product, k):
             setattr(product, k, v)
+    product.updated_at = datetime.now(timezone.utc)
     session.add(product)
+    if fields.get("stock") is not None and product.stock_shards:
+        await _split_stock(session, product.id, product.stock_shards, fields["stock"])
     await session.commit()
+    await invalidate_products([product.id])
     await session.refresh(product)
+    if product.is_active:
+        autocomplete_index.upsert(product.id, product.name)
+    else:
+        autocomplete_index.remove(product.id)
     return product
 
 async def delete_product(session: AsyncSession, product: Product):
     await session.delete(product)
     await session.commit()
+    await invalidate_products([product.id])
+    autocomplete_index.remove(product.id)
     return
+
+# --- Bulk import ---
+# Each batch is COPYed into this per-transaction staging table, then applied with
+# one set-based UPDATE and one INSERT instead of a round trip (and commit) per row.
+_IMPORT_COLUMNS = ("row_no", "id", "name", "description", "price", "stock", "is_active")
+
+_CREATE_IMPORT_TABLE = text("""
+CREATE TEMP TABLE product_import (
+    row_no integer NOT NULL, id integer, name varchar(255) NOT NULL, description text,
+    price double precision NOT NULL, stock integer NOT NULL, is_active boolean NOT NULL
+) ON COMMIT DROP
+""")
+
+# ids that don't name a product of this owner are rejected, not inserted
+_IMPORT_UNKNOWN_IDS = text("""
+SELECT s.row_no, s.id FROM product_import AS s
+WHERE s.id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM products AS p WHERE p.id = s.id AND p.owner_id = :owner_id)
+""")
+
+# the stock of sharded products is only set through update_product
+_IMPORT_SHARDED_IDS = text("""
+SELECT s.row_no, s.id FROM product_import AS s
+JOIN products AS p ON p.id = s.id AND p.owner_id = :owner_id
+WHERE p.stock_shards > 0
+""")
+
+# columns _IMPORT_UPDATE writes
+_IMPORT_UPDATED_COLUMNS = ["name", "description", "price", "stock", "is_active", "updated_at"]
+
+_IMPORT_UPDATE = text("""
+UPDATE products AS p
+SET name = s.name, description = s.description, price = s.price, stock = s.stock,
+    is_active = s.is_active, updated_at = now()
+FROM product_import AS s
+WHERE p.id = s.id AND p.owner_id = :owner_id AND p.stock_shards = 0
+RETURNING p.id, p.name, p.is_active
+""")
+
+_IMPORT_INSERT = text("""
+INSERT INTO products (owner_id, name, description, price, stock, is_active, created_at, updated_at)
+SELECT :owner_id, name, description, price, stock, is_active, now(), now()
+FROM product_import WHERE id IS NULL
+ORDER BY row_no
+RETURNING id, name, is_active
+""")
+
+async def import_products(session: AsyncSession, owner_id: int, batches: AsyncIterator) -> tuple[int, int, list[tuple[int, str]]]:
+    """
+    Bulk upsert for `owner_id` from bulk_import.validated_batches of ProductImportRow:
+    rows with an id update that product (it must belong to the owner), the others
+    are inserted. All or nothing for the valid rows, committed once. Returns
+    (inserted, updated, rejected) with rejected as (row, error) pairs sorted by row.
+    """
+    await session.execute(_CREATE_IMPORT_TABLE)
+    raw = await (await session.connection()).get_raw_connection()
+    copy = raw.driver_connection.copy_records_to_table
+    rejected, seen = [], {}
+    async for valid, invalid in batches:
+        rejected.extend(invalid)
+        records = []
+        for row, item in valid:
+            if item.id is not None:
+                if item.id in seen:
+                    rejected.append((row, f"duplicate id {item.id} (first on row {seen[item.id]})"))
+                    continue
+                seen[item.id] = row
+            records.append((row, item.id, item.name, item.description, item.price, item.stock, item.is_active))
+        if records:
+            await copy("product_import", records=records, columns=_IMPORT_COLUMNS)
+    # temp tables are never auto-analyzed; without stats the joins below plan badly
+    await session.execute(text("ANALYZE product_import"))
+    params = {"owner_id": owner_id}
+    unknown = (await session.execute(_IMPORT_UNKNOWN_IDS, params)).all()
+    rejected.extend((row, f"no product {pid} owned by user {owner_id}") for row, pid in unknown)
+    sharded = (await session.execute(_IMPORT_SHARDED_IDS, params)).all()
+    rejected.extend((row, f"product {pid} has sharded stock; update it on its own") for row, pid in sharded)
+    updated = (await session.execute(_IMPORT_UPDATE, params)).all()
+    inserted = (await session.execute(_IMPORT_INSERT, params)).all()
+    _expire_products(session, (pid for pid, _, _ in updated), _IMPORT_UPDATED_COLUMNS)
+    # dropped explicitly as well, for callers whose commit only releases a savepoint
+    await session.execute(text("DROP TABLE product_import"))
+    await session.commit()
+
+    await invalidate_products(pid for pid, _, _ in updated)
+    purge_tags(PRODUCT_LIST_TAG)
+    for pid, name, is_active in (*updated, *inserted):
+        if is_active:
+            autocomplete_index.upsert(pid, name)
+        else:
+            autocomplete_index.remove(pid)
+    return len(inserted), len(updated), sorted(rejected)
+
+# --- Stock/price sync ---
+# One statement per chunk: the changes travel as five parallel arrays unnested into
+# rows, so the statement text (and its prepared plan) is the same for any chunk size.
+# Rows whose new price or stock would be negative (or overflow) are left alone, as
+# are stock changes to products with sharded stock (set through update_product).
+_SYNC_UPDATE = text("""
+UPDATE products AS p
+SET price = coalesce(v.price, p.price + v.price_delta, p.price),
+    stock = coalesce(v.stock, p.stock + v.stock_delta, p.stock),
+    updated_at = now()
+FROM unnest(CAST(:ids AS integer[]), CAST(:prices AS double precision[]), CAST(:price_deltas AS double precision[]),
+            CAST(:stocks AS integer[]), CAST(:stock_deltas AS integer[]))
+     AS v(id, price, price_delta, stock, stock_delta)
+WHERE p.id = v.id
+  AND coalesce(v.price, p.price + v.price_delta, p.price) >= 0
+  AND coalesce(v.stock::bigint, p.stock::bigint + v.stock_delta, p.stock) BETWEEN 0 AND 2147483647
+  AND (p.stock_shards = 0 OR (v.stock IS NULL AND v.stock_delta IS NULL))
+RETURNING p.id
+""")
+
+def _sync_digest(changes) -> str:
+    return hashlib.sha256(json.dumps([c.model_dump() for c in changes], sort_keys=True).encode()).hexdigest()
+
+async def sync_stock_and_prices(session: AsyncSession, batch_id: str, changes: list) -> dict:
+    """
+    Apply a batch of ProductStockChange in one transaction, at most once per batch_id:
+    a retry with the same changes gets the stored result back (replayed=True), a
+    different batch under a used id raises ValueError. Caches are invalidated once,
+    after the commit.
+    """
+    now = datetime.now(timezone.utc)
+    await session.execute(delete(ProductSyncBatch).where(ProductSyncBatch.created_at < now - timedelta(days=settings.SYNC_BATCH_RETENTION_DAYS)))
+    digest = _sync_digest(changes)
+    # a concurrent attempt with the same id waits here until the first one commits
+    claimed = await session.execute(
+        pg_insert(ProductSyncBatch)
+        .values(batch_id=batch_id, digest=digest, result={}, created_at=now)
+        .on_conflict_do_nothing()
+        .returning(ProductSyncBatch.batch_id)
+    )
+    if claimed.scalar() is None:
+        previous = await session.get(ProductSyncBatch, batch_id)
+        await session.commit()
+        if previous.digest != digest:
+            raise ValueError(f"batch {batch_id} was already applied with different changes")
+        return {**previous.result, "replayed": True}
+
+    # lock rows in id order so concurrent batches (and checkouts) can't deadlock on each other
+    ordered = sorted(changes, key=lambda c: c.id)
+    updated, missing, rejected = [], [], []
+    for start in range(0, len(ordered), settings.SYNC_CHUNK_ROWS):
+        chunk = ordered[start:start + settings.SYNC_CHUNK_ROWS]
+        ids = [c.id for c in chunk]
+        res = await session.execute(select(Product.id).where(_id_in(ids)).order_by(Product.id).with_for_update())
+        found = set(res.scalars())
+        res = await session.execute(_SYNC_UPDATE, {
+            "ids": ids,
+            "prices": [c.price for c in chunk],
+            "price_deltas": [c.price_delta for c in chunk],
+            "stocks": [c.stock for c in chunk],
+            "stock_deltas": [c.stock_delta for c in chunk],
+        })
+        done = set(res.scalars())
+        updated.extend(pid for pid in ids if pid in done)
+        missing.extend(pid for pid in ids if pid not in found)
+        rejected.extend(pid for pid in ids if pid in found and pid not in done)
+
+    _expire_products(session, updated, ["price", "stock", "updated_at"])
+    result = {"batch_id": batch_id, "updated": len(updated), "missing": missing, "rejected": rejected}
+    await session.execute(update(ProductSyncBatch).where(ProductSyncBatch.batch_id == batch_id).values(result=result))
+    await session.commit()
+    await invalidate_products(updated)
+    return {**result, "replayed": False}
+
+# --- Sharded stock ---
+# A hot product's stock can be split over `stock_shards` rows of product_stock_shards.
+# Checkouts then decrement one shard instead of locking the product row, so N
+# buyers can commit at once; products.stock becomes a periodically refreshed sum
+# (refresh_sharded_stock) for listings, while single-product reads sum the shards.
+
+# Takes `quantity` from the first shard, in rotated order from a random start,
+# that has enough. SKIP LOCKED passes over shards other checkouts hold; the
+# waiting variant queues on one shard instead of failing when all are busy.
+_TAKE_SHARD = """
+UPDATE product_stock_shards AS s SET stock = s.stock - :quantity
+FROM (
+    SELECT shard FROM product_stock_shards
+    WHERE product_id = :product_id AND stock >= :quantity
+    ORDER BY (shard + :rotate) % :shards
+    LIMIT 1
+    FOR UPDATE{}
+) AS pick
+WHERE s.product_id = :product_id AND s.shard = pick.shard
+RETURNING s.shard
+"""
+_TAKE_SHARD_SKIP_LOCKED = text(_TAKE_SHARD.format(" SKIP LOCKED"))
+_TAKE_SHARD_WAIT = text(_TAKE_SHARD.format(""))
+
+_RETURN_TO_SHARD = text("""
+UPDATE product_stock_shards SET stock = stock + :quantity
+WHERE product_id = :product_id AND shard = :shard
+""")
+
+# pg_try_advisory_xact_lock key: every worker runs the refresh loop, but a round
+# only runs where nobody else is refreshing
+_REFRESH_LOCK_KEY = 0x73686172  # "shar"
+
+# rows are locked in id order, like sync batches do, so it can't deadlock with them
+_REFRESH_SHARDED_STOCK = text("""
+WITH totals AS (SELECT product_id, sum(stock)::integer AS total FROM product_stock_shards GROUP BY product_id),
+changed AS (
+    SELECT p.id, totals.total FROM products AS p JOIN totals ON totals.product_id = p.id
+    WHERE p.stock_shards > 0 AND p.stock <> totals.total
+    ORDER BY p.id
+    FOR UPDATE OF p
+)
+UPDATE products AS p SET stock = changed.total, updated_at = now()
+FROM changed
+WHERE p.id = changed.id
+RETURNING p.id
+""")
+
+def _split(total: int, shards: int) -> list[int]:
+    return [total // shards + (1 if i < total % shards else 0) for i in range(shards)]
+
+async def _shard_totals(session: AsyncSession, product_ids: list[int]) -> dict[int, int]:
+    res = await session.execute(
+        select(ProductStockShard.product_id, func.sum(ProductStockShard.stock))
+        .where(ProductStockShard.product_id == any_(bindparam("ids", product_ids, type_=ARRAY(Integer))))
+        .group_by(ProductStockShard.product_id)
+    )
+    return {pid: int(total) for pid, total in res.all()}
+
+async def _split_stock(session: AsyncSession, product_id: int, shards: int, total: int) -> None:
+    # replaces the shards outright; waits for checkouts holding one to finish
+    await session.execute(delete(ProductStockShard).where(ProductStockShard.product_id == product_id))
+    if shards:
+        session.add_all(ProductStockShard(product_id=product_id, shard=i, stock=stock) for i, stock in enumerate(_split(total, shards)))
+        await session.flush()
+
+async def take_sharded_stock(session: AsyncSession, product_id: int, quantity: int, shards: int) -> None:
+    """
+    Decrement a sharded product's stock by `quantity` inside the caller's
+    transaction; raises ValueError when the shards don't hold that much in total.
+    """
+    if shards <= 0:
+        # unsharded between the caller's read and now
+        raise ValueError(f"Stock of product {product_id} was just reorganized; try again")
+    params = {"product_id": product_id, "quantity": quantity, "shards": shards, "rotate": random.randrange(shards)}
+    for stmt in (_TAKE_SHARD_SKIP_LOCKED, _TAKE_SHARD_WAIT):
+        if (await session.execute(stmt, params)).scalar() is not None:
+            return
+    # no single shard has enough (or the one waited for was emptied meanwhile):
+    # lock them all, in shard order so concurrent takers can't deadlock, and
+    # take across them
+    res = await session.execute(
+        select(ProductStockShard).where(ProductStockShard.product_id == product_id)
+        .order_by(ProductStockShard.shard).with_for_update()
+    )
+    rows = res.scalars().all()
+    if sum(row.stock for row in rows) < quantity:
+        raise ValueError(f"Insufficient stock for product {product_id}")
+    for row in rows:
+        taken = min(row.stock, quantity)
+        row.stock -= taken
+        quantity -= taken
+
+async def return_sharded_stock(session: AsyncSession, product_id: int, quantity: int, shards: int) -> None:
+    await session.execute(_RETURN_TO_SHARD, {"product_id": product_id, "quantity": quantity, "shard": random.randrange(shards)})
+
+async def set_stock_shards(session: AsyncSession, product_id: int, shards: int) -> Optional[Product]:
+    """
+    Split a product's stock over `shards` rows, re-split it, or (0) fold it back
+    into products.stock. Returns the product, or None if it doesn't exist.
+    """
+    product = (await session.execute(select(Product).where(Product.id == product_id).with_for_update())).scalar_one_or_none()
+    if product is None:
+        return None
+    if product.stock_shards:
+        res = await session.execute(
+            select(ProductStockShard.stock).where(ProductStockShard.product_id == product_id)
+            .order_by(ProductStockShard.shard).with_for_update()
+        )
+        product.stock = sum(res.scalars())
+    await _split_stock(session, product_id, shards, product.stock)
+    product.stock_shards = shards
+    product.updated_at = datetime.now(timezone.utc)
+    await session.commit()
+    await invalidate_products([product_id])
+    await session.refresh(product)
+    return product
+
+async def refresh_sharded_stock(session: AsyncSession) -> list[int]:
+    """
+    Set products.stock of sharded products to the sum of their shards where it
+    changed; returns the ids updated. Does nothing (returns []) while another
+    worker's refresh is running.
+    """
+    if not await session.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _REFRESH_LOCK_KEY}):
+        await session.rollback()
+        return []
+    res = await session.execute(_REFRESH_SHARDED_STOCK)
+    updated = list(res.scalars())
+    await session.commit()
+    await invalidate_products(updated)
+    return updated
+
+_SNAPSHOT_COLUMNS = [getattr(Product, key) for key in _CACHED_COLUMNS]
+
+async def load_catalog_snapshot(session: AsyncSession) -> int:
+    """
+    Rebuild the catalog snapshot from all active products.
+    """
+    # plain rows, not ORM objects: a million-product load stays in the seconds
+    res = await session.execute(select(*_SNAPSHOT_COLUMNS).where(Product.is_active == True))
+    catalog_snapshot.build(res.all())
+    return len(catalog_snapshot)
+
+async def warm_catalog_snapshot(session: AsyncSession, path: str) -> Optional[int]:
+    """
+    Map the snapshot saved at `path` and catch it up: products changed since its
+    watermark (less CATALOG_SNAPSHOT_DELTA_MARGIN_SECONDS, for transactions that
+    committed late and clock skew) are reloaded, and the active ids are compared
+    to find deleted and missing rows. Returns the number of products, or None
+    when there is no usable file.
+    """
+    try:
+        watermark = catalog_snapshot.load_file(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, KeyError, ValueError):
+        # truncated, corrupt or from an older release; the caller loads from the database
+        logger.warning("Ignoring unusable catalog snapshot file %s", path, exc_info=True)
+        return None
+    since = watermark - timedelta(seconds=settings.CATALOG_SNAPSHOT_DELTA_MARGIN_SECONDS)
+    res = await session.execute(select(*_SNAPSHOT_COLUMNS).where(Product.updated_at >= since))
+    changed = res.all()
+    res = await session.execute(select(Product.id).where(Product.is_active == True))
+    stale, missing = catalog_snapshot.diff_ids(res.scalars())
+    if missing:
+        res = await session.execute(select(*_SNAPSHOT_COLUMNS).where(_id_in(missing)))
+        changed += res.all()
+    catalog_snapshot.apply(changed, removed_ids=stale)
+    return len(catalog_snapshot)
+
+async def apply_catalog_changes(session: AsyncSession, product_ids: set[int]) -> None:
+    """
+    Refresh the snapshot rows for `product_ids`; ids that no longer exist are dropped.
+    """
+    ids = sorted(product_ids)
+    res = await session.execute(select(*_SNAPSHOT_COLUMNS).where(_id_in(ids)))
+    changed = res.all()
+    found = {p.id for p in changed}
+    catalog_snapshot.apply(changed, removed_ids=[pid for pid in ids if pid not in found])
+
+async def active_product_ids(session: AsyncSession) -> list[int]:
+    res = await session.execute(select(Product.id).where(Product.is_active == True).order_by(Product.id))
+    return list(res.scalars())
+
+async def load_autocomplete(session: AsyncSession) -> int:
+    """
+    (Re)build the autocomplete index from active products; popularity is units sold
+    over the last AUTOCOMPLETE_POPULARITY_DAYS in orders that weren't cancelled.
+    Returns the number of products indexed.
+    """
+    # from the daily rollup, so the cost follows the window, not the order history
+    since = datetime.now(timezone.utc).date() - timedelta(days=settings.AUTOCOMPLETE_POPULARITY_DAYS)
+    units = (
+        select(ProductSalesDaily.product_id, func.sum(ProductSalesDaily.units).label("units"))
+        .where(ProductSalesDaily.day > since)
+        .group_by(ProductSalesDaily.product_id)
+        .subquery()
+    )
+    stmt = (
+        select(Product.id, Product.name, func.coalesce(units.c.units, 0))
+        .outerjoin(units, units.c.product_id == Product.id)
+        .where(Product.is_active == True)
+    )
+    res = await session.execute(stmt)
+    autocomplete_index.build(res.all())
+    return len(autocomplete_index)
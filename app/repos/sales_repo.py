@@ -0,0 +1,103 @@
+# app/repos/sales_repo.py
+from datetime import date, datetime, timezone
+from typing import Iterable
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.models import Order, OrderItem, OrderStatus, OrderStatusDaily, ProductSalesDaily, SalesDaily
+
+# Writers: called by order_repo inside the transaction that changes the order, as
+# late as possible. An order only touches its own bucket's rows, so concurrent
+# checkouts of a day (or of one hot product) mostly lock different rows.
+
+def _day(ts: datetime) -> date:
+    # naive timestamps are UTC (models default to datetime.utcnow)
+    return (ts.astimezone(timezone.utc) if ts.tzinfo else ts).date()
+
+def _bucket(order: Order) -> int:
+    # the same bucket when the order is cancelled later, though any would do
+    return order.id % settings.SALES_ROLLUP_BUCKETS
+
+async def _add(session: AsyncSession, model, rows: list[dict], counters: tuple[str, ...]) -> None:
+    if not rows:
+        return
+    stmt = pg_insert(model).values(rows)
+    keys = [c.name for c in model.__table__.primary_key]
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={c: getattr(model.__table__.c, c) + getattr(stmt.excluded, c) for c in counters},
+    ))
+
+async def _add_sales(session: AsyncSession, day: date, order: Order, items: Iterable[OrderItem], sign: int) -> None:
+    bucket = _bucket(order)
+    per_product: dict[int, list] = {}
+    units = 0
+    for it in items:
+        units += it.quantity
+        if it.product_id is not None:
+            sold = per_product.setdefault(it.product_id, [0, 0.0])
+            sold[0] += it.quantity
+            sold[1] += it.quantity * it.price_at_purchase
+    await _add(session, SalesDaily, [{"day": day, "bucket": bucket, "orders": sign, "units": sign * units, "revenue": sign * order.total}], ("orders", "units", "revenue"))
+    # in product id order, so concurrent orders lock the rows in the same order
+    await _add(session, ProductSalesDaily, [
+        {"day": day, "product_id": pid, "bucket": bucket, "units": sign * u, "revenue": sign * r}
+        for pid, (u, r) in sorted(per_product.items())
+    ], ("units", "revenue"))
+
+async def record_placed(session: AsyncSession, order: Order, items: Iterable[OrderItem]) -> None:
+    day = _day(order.created_at)
+    await _add_sales(session, day, order, items, 1)
+    await _add(session, OrderStatusDaily, [{"day": day, "status": order.status, "bucket": _bucket(order), "orders": 1}], ("orders",))
+
+async def record_status_change(session: AsyncSession, order: Order, previous: OrderStatus) -> None:
+    """
+    After order.status changed from `previous`; cancelling takes the order's
+    revenue and units back out of the sales rollups.
+    """
+    if order.status == previous:
+        return
+    day, bucket = _day(order.created_at), _bucket(order)
+    if order.status == OrderStatus.cancelled:
+        await _add_sales(session, day, order, order.items, -1)
+    await _add(session, OrderStatusDaily, sorted([
+        {"day": day, "status": previous, "bucket": bucket, "orders": -1},
+        {"day": day, "status": order.status, "bucket": bucket, "orders": 1},
+    ], key=lambda row: row["status"].value), ("orders",))
+
+# Readers: O(days in range x buckets), independent of the number of orders.
+
+async def daily_sales(session: AsyncSession, start: date, end: date):
+    res = await session.execute(
+        select(
+            SalesDaily.day,
+            func.sum(SalesDaily.orders).label("orders"),
+            func.sum(SalesDaily.units).label("units"),
+            func.sum(SalesDaily.revenue).label("revenue"),
+        )
+        .where(SalesDaily.day >= start, SalesDaily.day <= end)
+        .group_by(SalesDaily.day)
+        .order_by(SalesDaily.day)
+    )
+    return res.all()
+
+async def top_products(session: AsyncSession, start: date, end: date, limit: int = 20):
+    units, revenue = func.sum(ProductSalesDaily.units), func.sum(ProductSalesDaily.revenue)
+    res = await session.execute(
+        select(ProductSalesDaily.product_id, units.label("units"), revenue.label("revenue"))
+        .where(ProductSalesDaily.day >= start, ProductSalesDaily.day <= end)
+        .group_by(ProductSalesDaily.product_id)
+        .having(units > 0)
+        .order_by(revenue.desc(), ProductSalesDaily.product_id)
+        .limit(limit)
+    )
+    return res.all()
+
+async def status_counts(session: AsyncSession, start: date, end: date) -> dict[OrderStatus, int]:
+    res = await session.execute(
+        select(OrderStatusDaily.status, func.sum(OrderStatusDaily.orders))
+        .where(OrderStatusDaily.day >= start, OrderStatusDaily.day <= end)
+        .group_by(OrderStatusDaily.status)
+    )
+    return {status: int(count) for status, count in res.all()}
@@ -1,7 +1,8 @@
 # app/schemas/order.py
+from datetime import date
 from app.db.models import OrderStatus
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class OrderItemCreate(BaseModel):
     product_id: int
@@ -26,3 +27,22 @@ class OrderOut(BaseModel):
     items: List[OrderItemOut]
 
     model_config = ConfigDict(from_attributes=True)
+
+class DailySalesOut(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ProductSalesOut(BaseModel):
+    product_id: int
+    units: int
+    revenue: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+class StatusCountsOut(BaseModel):
+    # orders placed in the range, by their current status
+    counts: Dict[OrderStatus, int]
@@ -1,6 +1,9 @@
 # app/schemas/product.py
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, conint, model_validator
+from typing import List, Optional
+
+# ids are Postgres integers; larger values would fail in the driver, not validation
+MAX_PRODUCT_ID = 2**31 - 1
 
 class ProductBase(BaseModel):
     name: str
@@ -28,3 +31,107 @@ class ProductOut(BaseModel):
     is_active: bool
 
     model_config = ConfigDict(from_attributes=True)
+
+class ProductSearchPage(BaseModel):
+    items: List[ProductOut]
+    # pass back as ?cursor= for the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+class ProductSuggestion(BaseModel):
+    id: int
+    name: str
+
+class RelatedProduct(BaseModel):
+    id: int
+    # cosine similarity of the two products' orders, 0..1
+    score: float
+
+class RelatedProducts(BaseModel):
+    product_id: int
+    # best first; empty for products without enough shared orders
+    related: List[RelatedProduct]
+
+class ProductBatchRequest(BaseModel):
+    ids: List[conint(ge=1, le=MAX_PRODUCT_ID)] = Field(..., min_length=1, max_length=1000)
+
+class ProductBatch(BaseModel):
+    # in the requested order; ids that don't exist are listed in `missing`
+    items: List[ProductOut]
+    missing: List[int]
+
+class ProductImportRow(BaseModel):
+    # one row of a bulk import; rows with an id update that product, the rest are inserted.
+    # Bounds mirror the column types so a valid row can never fail the COPY.
+    model_config = ConfigDict(extra="forbid", allow_inf_nan=False)
+
+    id: Optional[int] = Field(None, ge=1, le=2**31 - 1)
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = None
+    price: float = Field(..., ge=0)
+    stock: int = Field(0, ge=0, le=2**31 - 1)
+    is_active: bool = True
+
+class ProductImportError(BaseModel):
+    row: int  # 1-based data row (CSV header and blank lines not counted)
+    error: str
+
+class ProductImportResult(BaseModel):
+    inserted: int
+    updated: int
+    rejected: int
+    # the first IMPORT_MAX_ERRORS rejected rows
+    errors: List[ProductImportError]
+
+class ProductStockChange(BaseModel):
+    # absolute (price, stock) or relative (price_delta, stock_delta); at most one of each
+    model_config = ConfigDict(extra="forbid", allow_inf_nan=False)
+
+    id: int
+    price: Optional[float] = Field(None, ge=0)
+    price_delta: Optional[float] = None
+    stock: Optional[int] = Field(None, ge=0, le=2**31 - 1)
+    stock_delta: Optional[int] = Field(None, ge=-(2**31), le=2**31 - 1)
+
+    @model_validator(mode="after")
+    def _one_of_each(self):
+        if self.price is not None and self.price_delta is not None:
+            raise ValueError("give price or price_delta, not both")
+        if self.stock is not None and self.stock_delta is not None:
+            raise ValueError("give stock or stock_delta, not both")
+        if self.price is None and self.price_delta is None and self.stock is None and self.stock_delta is None:
+            raise ValueError("nothing to change")
+        return self
+
+class ProductSyncRequest(BaseModel):
+    # retrying with the same batch_id returns the first result without applying it again
+    batch_id: str = Field(..., min_length=1, max_length=128)
+    changes: List[ProductStockChange] = Field(..., min_length=1, max_length=50_000)
+
+    @model_validator(mode="after")
+    def _distinct_ids(self):
+        if len({c.id for c in self.changes}) != len(self.changes):
+            raise ValueError("each product may appear only once per batch")
+        return self
+
+class ProductSyncResult(BaseModel):
+    batch_id: str
+    updated: int
+    # ids that don't exist
+    missing: List[int]
+    # ids left unchanged because the result would be a negative price or stock,
+    # or because the change sets the stock of a product with sharded stock
+    rejected: List[int]
+    # true when this batch_id had already been applied
+    replayed: bool = False
+
+class ProductStockShardsUpdate(BaseModel):
+    # 0 folds the stock back into the product row; past a few dozen, more shards
+    # only make the sums and sold-out fallbacks slower
+    shards: int = Field(..., ge=0, le=64)
+
+class ProductStockShardsOut(BaseModel):
+    id: int
+    stock_shards: int
+    stock: int
+
+    model_config = ConfigDict(from_attributes=True)
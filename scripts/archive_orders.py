@@ -0,0 +1,40 @@
+# scripts/archive_orders.py
+"""
+Move delivered and cancelled orders older than ORDER_ARCHIVE_AFTER_MONTHS to the
+S3 archive (zstd NDJSON per month) and delete them from Postgres. Safe to re-run
+or to run concurrently; meant for a nightly cron:
+
+    python scripts/archive_orders.py --months 12 --max-batches 100
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+sys.path.insert(0, os.getcwd())
+
+from app.core.config import settings
+from app.db.partitions import add_months, month_start
+from app.db.pg import engine, AsyncSessionLocal
+from app.repos import order_repo
+
+
+async def main(months: int, batch_size: int, max_batches: int | None) -> None:
+    # cut at a month boundary, like the partitions
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -months)
+    before = datetime.combine(cutoff, datetime.min.time(), tzinfo=timezone.utc)
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        stats = await order_repo.archive_orders(session, before, batch_size, max_batches)
+    await engine.dispose()
+    print(f"archived {stats['orders']} orders placed before {cutoff} into {stats['objects']} objects in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=settings.ORDER_ARCHIVE_AFTER_MONTHS)
+    parser.add_argument("--batch-size", type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches (default: until done)")
+    args = parser.parse_args()
+    asyncio.run(main(args.months, args.batch_size, args.max_batches))
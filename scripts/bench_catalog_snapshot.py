@@ -0,0 +1,114 @@
+# scripts/bench_catalog_snapshot.py
+"""
+Compares GET /products/ listings answered by SQL (product_repo.listing_query) with
+the in-memory catalog snapshot at growing catalog sizes, and the time to warm a new
+worker by a full load vs. mapping a saved snapshot (CATALOG_SNAPSHOT_PATH) and
+applying the changes since. Products are topped up to each size in turn, so run it
+against a scratch database:
+
+    python scripts/bench_catalog_snapshot.py --sizes 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+sys.path.insert(0, os.getcwd())
+
+from sqlalchemy import func, select, text
+from app.core import catalog_snapshot
+from app.core.catalog_snapshot import CatalogSnapshot
+from app.db.models import Product
+from app.db.pg import engine, AsyncSessionLocal
+from app.repos import product_repo
+
+CASES = {
+    "default": {},
+    "price asc": {"sort": "price"},
+    "newest, in stock": {"sort": "newest", "in_stock": True},
+    "price range by name": {"min_price": 100, "max_price": 200, "sort": "name"},
+    "deep page": {"sort": "-price", "offset": 5000},
+}
+
+
+async def top_up(size: int) -> None:
+    async with engine.begin() as conn:
+        have = await conn.scalar(select(func.count()).select_from(Product).where(Product.is_active == True))
+        if have >= size:
+            return
+        owner_id = await conn.scalar(text(
+            "INSERT INTO users (email, hashed_password, is_active, is_superuser, created_at) "
+            "VALUES ('bench@example.com', 'x', true, false, now()) "
+            "ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email RETURNING id"
+        ))
+        await conn.execute(text("""
+            INSERT INTO products (owner_id, name, description, price, stock, is_active, created_at, updated_at)
+            SELECT :owner_id, 'bench ' || md5(g::text), NULL, round((random() * 1000)::numeric, 2),
+                   (random() * 20)::int, true, now() - random() * interval '365 days', now()
+            FROM generate_series(1, :rows) AS g
+        """), {"owner_id": owner_id, "rows": size - have})
+        await conn.execute(text("ANALYZE products"))
+
+
+def _p50(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def _p50_async(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def bench(size: int, repeat: int) -> None:
+    await top_up(size)
+    async with AsyncSessionLocal() as session:
+        started = time.perf_counter()
+        await product_repo.load_catalog_snapshot(session)
+        build = time.perf_counter() - started
+        snapshot: CatalogSnapshot = product_repo.catalog_snapshot
+        print(f"\n{len(snapshot):,} active products; snapshot built in {build:.2f}s")
+        print(f"{'case':24} {'sql p50':>10} {'snapshot p50':>13}")
+        for name, filters in CASES.items():
+            stmt = product_repo.listing_query(**filters)
+            sql = await _p50_async(lambda: session.execute(stmt), repeat)
+            mem = _p50(lambda: snapshot.query(**filters), repeat)
+            print(f"{name:24} {sql:8.2f}ms {mem:11.2f}ms")
+
+        # warm start: what a freshly started worker does with and without the file
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "catalog.bin")
+            started = time.perf_counter()
+            catalog_snapshot.save(path, snapshot.export(), datetime.now(timezone.utc))
+            saved = time.perf_counter() - started
+            product_repo.catalog_snapshot = CatalogSnapshot()
+            started = time.perf_counter()
+            await product_repo.warm_catalog_snapshot(session, path)
+            product_repo.catalog_snapshot.query(sort="name")
+            warm = time.perf_counter() - started
+        print(f"warm start: full load {build * 1000:.0f}ms, mapped file + delta {warm * 1000:.0f}ms (file saved in {saved * 1000:.0f}ms)")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    for size in sorted(args.sizes):
+        await bench(size, args.repeat)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+# scripts/bench_order_partitions.py
+"""
+Shows order read latency staying flat as history piles up in the monthly
+partitions. Each step back-fills older months (orders_per_month orders with two
+items each, spread over a few thousand users) and then times the reads that serve
+current traffic. Run against a scratch database migrated to head:
+
+    python scripts/bench_order_partitions.py --months 1 6 12 24 --orders-per-month 100000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+sys.path.insert(0, os.getcwd())
+
+from sqlalchemy import text
+from app.db.partitions import add_months, ensure_order_partitions, month_start
+from app.db.pg import engine, AsyncSessionLocal
+from app.repos import order_repo
+
+USERS = 5000
+
+
+def _at(month: date) -> datetime:
+    return datetime.combine(month, datetime.min.time(), tzinfo=timezone.utc)
+
+
+async def _bench_users(conn) -> list[int]:
+    await conn.execute(text(
+        "INSERT INTO users (email, hashed_password, is_active, is_superuser, created_at) "
+        "SELECT 'bench' || g || '@example.com', 'x', true, false, now() FROM generate_series(1, :n) AS g "
+        "ON CONFLICT (email) DO NOTHING"
+    ), {"n": USERS})
+    res = await conn.execute(text("SELECT id FROM users WHERE email LIKE 'bench%@example.com' ORDER BY id"))
+    return list(res.scalars())
+
+
+async def backfill(months: int, per_month: int) -> None:
+    this_month = month_start(datetime.now(timezone.utc))
+    async with engine.begin() as conn:
+        users = await _bench_users(conn)
+        await ensure_order_partitions(conn, months_ahead=months + 1, start=add_months(this_month, -months))
+        for back in range(months):
+            month = add_months(this_month, -back)
+            have = await conn.scalar(text(
+                "SELECT count(*) FROM orders WHERE created_at >= :start AND created_at < :end"
+            ), {"start": _at(month), "end": _at(add_months(month, 1))})
+            if have >= per_month:
+                continue
+            # spread over the month; for the current one, over the days so far
+            await conn.execute(text("""
+                WITH placed AS (
+                    INSERT INTO orders (user_id, status, total, created_at)
+                    SELECT (CAST(:users AS integer[]))[1 + g % cardinality(CAST(:users AS integer[]))], 'delivered', 0,
+                           least(CAST(:start AS timestamptz) + random() * (CAST(:end AS timestamptz) - CAST(:start AS timestamptz)), now())
+                    FROM generate_series(1, :rows) AS g
+                    RETURNING id, created_at
+                )
+                INSERT INTO order_items (order_id, order_created_at, product_id, quantity, price_at_purchase)
+                SELECT id, created_at, NULL, 1 + (random() * 3)::int, round((random() * 100)::numeric, 2)
+                FROM placed, generate_series(1, 2)
+            """), {"users": users, "start": _at(month), "end": _at(add_months(month, 1)), "rows": per_month - have})
+        await conn.execute(text("ANALYZE orders"))
+        await conn.execute(text("ANALYZE order_items"))
+
+
+async def _p50(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def bench(months: int, per_month: int, repeat: int) -> None:
+    await backfill(months, per_month)
+    since = datetime.now(timezone.utc) - timedelta(days=1)
+    async with AsyncSessionLocal() as session:
+        total = await session.scalar(text("SELECT count(*) FROM orders"))
+        row = (await session.execute(text("SELECT id, user_id FROM orders ORDER BY created_at DESC LIMIT 1"))).one()
+
+        async def export_day():
+            async for _ in order_repo.stream_order_rows(session, created_after=since):
+                pass
+
+        cases = {
+            "user history, page 1": lambda: order_repo.list_orders_for_user(session, row.user_id, limit=20),
+            "admin list, page 1": lambda: order_repo.list_all_orders(session, limit=100),
+            "get recent order": lambda: order_repo.get_order(session, row.id),
+            "export last 24h": export_day,
+        }
+        print(f"\n{months} months, {total:,} orders")
+        for name, fn in cases.items():
+            print(f"{name:24} {await _p50(fn, repeat):8.2f}ms")
+            session.expunge_all()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, nargs="+", default=[1, 6, 12, 24])
+    parser.add_argument("--orders-per-month", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for months in sorted(args.months):
+        await bench(months, args.orders_per_month, args.repeat)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+# scripts/bench_search.py
+"""
+Seeds a large catalog (default one million products) and times /products/search
+queries against it. Run against a scratch database:
+
+    python scripts/bench_search.py --rows 1000000
+    python scripts/bench_search.py --skip-seed --explain
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+sys.path.insert(0, os.getcwd())
+
+from sqlalchemy import text
+from app.db.pg import engine, AsyncSessionLocal
+from app.repos import product_repo
+
+WORDS = [
+    "laptop", "phone", "charger", "cable", "wireless", "mouse", "keyboard", "monitor",
+    "stand", "speaker", "headphones", "camera", "tripod", "battery", "adapter", "case",
+    "ergonomic", "portable", "gaming", "office", "steel", "leather", "bamboo", "compact",
+]
+QUERIES = ["laptop", "wireless mouse", "gaming keyboard", "leather case", "labtop", "headphnes", "portable -gaming"]
+
+
+async def seed(rows: int) -> None:
+    async with engine.begin() as conn:
+        owner_id = await conn.scalar(text(
+            "INSERT INTO users (email, hashed_password, is_active, is_superuser, created_at) "
+            "VALUES ('bench@example.com', 'x', true, false, now()) "
+            "ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email RETURNING id"
+        ))
+        # names are three random words, descriptions six; generated server-side in one statement
+        await conn.execute(text("""
+            INSERT INTO products (owner_id, name, description, price, stock, is_active, created_at, updated_at)
+            SELECT :owner_id,
+                   w[1 + (random() * (n - 1))::int] || ' ' || w[1 + (random() * (n - 1))::int] || ' ' || w[1 + (random() * (n - 1))::int],
+                   array_to_string(ARRAY(SELECT w[1 + (random() * (n - 1))::int] FROM generate_series(1, 6 + g * 0)), ' '),
+                   round((random() * 1000)::numeric, 2), (random() * 100)::int, random() > 0.1, now(), now()
+            FROM generate_series(1, :rows) AS g,
+                 LATERAL (SELECT CAST(:words AS text[]) AS w, cardinality(CAST(:words AS text[])) AS n) AS v
+        """), {"owner_id": owner_id, "rows": rows, "words": WORDS})
+        await conn.execute(text("ANALYZE products"))
+    print(f"Seeded {rows} products.")
+
+
+async def bench(repeat: int, explain: bool) -> None:
+    async with AsyncSessionLocal() as session:
+        for q in QUERIES:
+            timings = []
+            after = None
+            for i in range(repeat):
+                started = time.perf_counter()
+                rows = await product_repo.search_products(session, q, limit=20, after=after)
+                timings.append((time.perf_counter() - started) * 1000)
+                # alternate first page and second page to exercise the keyset cursor
+                after = (rows[-1][1], rows[-1][0].id) if rows and i % 2 == 0 else None
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{q!r:24} p50={statistics.median(timings):7.2f}ms p95={p95:7.2f}ms hits={len(rows)}")
+        if explain:
+            plan = await session.execute(text(
+                "EXPLAIN (ANALYZE, BUFFERS) SELECT id FROM products "
+                "WHERE is_active AND (search_vector @@ websearch_to_tsquery('english', :q) OR name %> :q)"
+            ), {"q": QUERIES[0]})
+            print("\n".join(row[0] for row in plan))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--explain", action="store_true")
+    args = parser.parse_args()
+    if not args.skip_seed:
+        await seed(args.rows)
+    await bench(args.repeat, args.explain)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
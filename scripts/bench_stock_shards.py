@@ -0,0 +1,99 @@
+# scripts/bench_stock_shards.py
+"""
+Checkout contention on one hot product: --buyers concurrent buyers each order one
+unit through order_repo.create_order, with the product's stock in its own row
+(0 shards) and split over N shards. Prints throughput and latency, and checks
+that nothing was oversold. Run against a scratch database migrated to head, with
+max_connections above --connections:
+
+    python scripts/bench_stock_shards.py --buyers 1000 --shards 0 4 16 64
+
+Every order also updates the day's sales rollup rows, spread over
+SALES_ROLLUP_BUCKETS rows each, so they don't serialize the checkouts either.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+sys.path.insert(0, os.getcwd())
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.core.config import settings
+from app.repos import order_repo, product_repo
+
+
+async def setup(Session, stock: int, shards: int) -> tuple[int, int]:
+    async with Session() as session:
+        user_id = await session.scalar(text(
+            "INSERT INTO users (email, hashed_password, is_active, is_superuser, created_at) "
+            "VALUES ('bench-buyer@example.com', 'x', true, false, now()) "
+            "ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email RETURNING id"
+        ))
+        product_id = await session.scalar(text(
+            "INSERT INTO products (owner_id, name, price, stock, is_active, created_at, updated_at) "
+            "VALUES (:owner_id, 'bench hot item', 9.99, :stock, true, now(), now()) RETURNING id"
+        ), {"owner_id": user_id, "stock": stock})
+        await session.commit()
+        if shards:
+            await product_repo.set_stock_shards(session, product_id, shards)
+    return user_id, product_id
+
+
+async def buy(Session, user_id: int, product_id: int, start: asyncio.Event) -> tuple[bool, float]:
+    await start.wait()
+    started = time.perf_counter()
+    async with Session() as session:
+        try:
+            await order_repo.create_order(session, user_id, [{"product_id": product_id, "quantity": 1}])
+            ok = True
+        except ValueError:
+            await session.rollback()
+            ok = False
+    return ok, (time.perf_counter() - started) * 1000
+
+
+async def bench(Session, buyers: int, stock: int, shards: int) -> None:
+    user_id, product_id = await setup(Session, stock, shards)
+    start = asyncio.Event()
+    tasks = [asyncio.create_task(buy(Session, user_id, product_id, start)) for _ in range(buyers)]
+    started = time.perf_counter()
+    start.set()
+    results = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    sold = sum(ok for ok, _ in results)
+    latencies = sorted(ms for _, ms in results)
+    async with Session() as session:
+        if shards:
+            left = await session.scalar(text("SELECT sum(stock) FROM product_stock_shards WHERE product_id = :id"), {"id": product_id})
+        else:
+            left = await session.scalar(text("SELECT stock FROM products WHERE id = :id"), {"id": product_id})
+    assert sold + left == stock and left >= 0, f"stock mismatch: sold {sold}, left {left}, started with {stock}"
+    print(
+        f"{shards:>6} {sold / elapsed:10.0f} {statistics.median(latencies):9.1f}ms "
+        f"{latencies[int(len(latencies) * 0.99) - 1]:9.1f}ms {sold:>6} {buyers - sold:>8}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=1000)
+    parser.add_argument("--stock", type=int, help="units available (default: one per buyer; fewer exercises selling out)")
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 4, 16, 64])
+    parser.add_argument("--connections", type=int, default=100, help="pool size shared by the buyers")
+    args = parser.parse_args()
+
+    engine = create_async_engine(settings.DATABASE_URL, pool_size=args.connections, max_overflow=0, pool_timeout=300)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    print(f"{args.buyers} buyers over {args.connections} connections")
+    print(f"{'shards':>6} {'orders/s':>10} {'p50':>11} {'p99':>11} {'sold':>6} {'refused':>8}")
+    for shards in args.shards:
+        await bench(Session, args.buyers, args.stock if args.stock is not None else args.buyers, shards)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+# scripts/build_related_products.py
+"""
+Build or update the "frequently bought together" file at RELATED_PRODUCTS_PATH
+(needs the snapshot extra). By default only orders placed since the last run are
+counted and merged into the stored counts; --full recounts everything still in
+Postgres, which also drops orders cancelled after they were counted (archived
+orders then stop counting too). Workers pick the new file up within
+RELATED_PRODUCTS_RELOAD_SECONDS. Meant for cron, e.g. hourly plus a weekly --full:
+
+    python scripts/build_related_products.py [--full]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+sys.path.insert(0, os.getcwd())
+
+import numpy as np
+
+from app.core import related_products
+from app.core.config import settings
+from app.db.pg import engine, AsyncSessionLocal
+from app.repos import order_repo, product_repo
+
+COUNT_KEYS = ("item_ids", "item_counts", "pair_keys", "pair_counts")
+
+
+async def main(path: str, full: bool) -> None:
+    started = time.perf_counter()
+    # orders younger than this may still be in uncommitted transactions
+    until = datetime.now(timezone.utc) - timedelta(seconds=settings.RELATED_PRODUCTS_SETTLE_SECONDS)
+    previous, since = None, None
+    if not full and os.path.exists(path):
+        arrays, meta = related_products.load(path)
+        previous = {**{key: arrays[key] for key in COUNT_KEYS}, "orders": meta["orders"]}
+        since = datetime.fromisoformat(meta["watermark"])
+
+    order_ids, product_ids = array("q"), array("q")
+    # the primary: a lagging replica could miss orders below the watermark for good
+    async with AsyncSessionLocal() as session:
+        async for row in order_repo.stream_basket_rows(session, created_after=since, created_before=until):
+            order_ids.append(row.order_id)
+            product_ids.append(row.product_id)
+        active = await product_repo.active_product_ids(session)
+    await engine.dispose()
+
+    counts = related_products.cooccurrence(np.frombuffer(order_ids, "int64"), np.frombuffer(product_ids, "int64"), settings.RELATED_PRODUCTS_MAX_BASKET)
+    new_orders = counts["orders"]
+    if previous is not None:
+        counts = related_products.merge(previous, counts)
+    neighbours = related_products.top_k(counts, settings.RELATED_PRODUCTS_TOP_K, settings.RELATED_PRODUCTS_MIN_COUNT, active_ids=active)
+    meta = {"watermark": until.isoformat(), "orders": counts["orders"], "built_at": datetime.now(timezone.utc).isoformat()}
+    related_products.save(path, {**neighbours, **{key: counts[key] for key in COUNT_KEYS}}, meta)
+    print(
+        f"{'counted' if previous is None else 'merged'} {new_orders} orders ({counts['orders']} in total) up to {until:%Y-%m-%d %H:%M}; "
+        f"{len(neighbours['ids'])} products with neighbours, {len(counts['pair_keys'])} pairs, "
+        f"{os.path.getsize(path) / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=settings.RELATED_PRODUCTS_PATH)
+    parser.add_argument("--full", action="store_true", help="recount all orders instead of merging new ones")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("set RELATED_PRODUCTS_PATH or pass --path")
+    asyncio.run(main(args.path, args.full))
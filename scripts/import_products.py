@@ -0,0 +1,59 @@
+# scripts/import_products.py
+"""
+Bulk-load a seller catalog from a CSV (with header) or NDJSON file, same rules as
+POST /api/v1/products/import but without the request size and time limits.
+
+    python scripts/import_products.py catalog.csv --owner-id 42
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+sys.path.insert(0, os.getcwd())
+
+from app.core.bulk_import import ImportFormatError, read_records, validated_batches
+from app.core.config import settings
+from app.db.pg import AsyncSessionLocal
+from app.repos import product_repo, user_repo
+from app.schemas.product import ProductImportRow
+
+CHUNK_BYTES = 1 << 20
+
+
+async def _chunks(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_BYTES):
+            yield chunk
+
+
+async def main(path: str, owner_id: int, format: str, batch_rows: int) -> int:
+    async with AsyncSessionLocal() as session:
+        if await user_repo.get_user(session, owner_id) is None:
+            print(f"no user {owner_id}", file=sys.stderr)
+            return 1
+        records = read_records(_chunks(path), format, columns=ProductImportRow.model_fields)
+        start = time.perf_counter()
+        try:
+            inserted, updated, rejected = await product_repo.import_products(
+                session, owner_id, validated_batches(records, ProductImportRow, batch_rows)
+            )
+        except ImportFormatError as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - start
+    for row, error in rejected:
+        print(f"row {row}: {error}", file=sys.stderr)
+    print(f"inserted {inserted}, updated {updated}, rejected {len(rejected)} in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--owner-id", type=int, required=True)
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--batch-rows", type=int, default=settings.IMPORT_BATCH_ROWS)
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    sys.exit(asyncio.run(main(args.path, args.owner_id, fmt, args.batch_rows)))
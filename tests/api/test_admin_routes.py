@@ -0,0 +1,31 @@
+# tests/api/test_admin_routes.py
+from fastapi.testclient import TestClient
+from fastapi import status
+
+def test_pool_stats_as_superuser(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests that a superuser can read connection pool statistics for both databases.
+    """
+    response = client.get("/api/v1/admin/pools", headers=superuser_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert {"size", "checked_out", "overflow", "wait_avg_ms"} <= data["postgres"].keys()
+    assert {"checked_out", "max_pool_size", "wait_avg_ms"} <= data["mongo"].keys()
+
+def test_pool_stats_as_normal_user(client: TestClient, auth_headers: dict):
+    """
+    Tests that a normal user cannot read pool statistics.
+    """
+    response = client.get("/api/v1/admin/pools", headers=auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+def test_metrics_record_db_usage_per_route(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests that connection hold time and query time are reported per route template.
+    """
+    client.get("/api/v1/users/me", headers=superuser_auth_headers)
+    response = client.get("/api/v1/admin/metrics", headers=superuser_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    timings = response.json()["timings"]
+    assert "GET /api/v1/users/me" in timings["db_query"]
+    assert "GET /api/v1/users/me" in timings["db_connection_hold"]
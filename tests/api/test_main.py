@@ -11,3 +11,24 @@ def test_root_endpoint(client: TestClient):
     response = client.get("/")
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"message": f"Welcome to {settings.PROJECT_NAME}"}
+
+async def test_startup_builds_autocomplete_without_replica(db_session, test_user, monkeypatch):
+    """
+    Tests that the startup build of the autocomplete index reads the primary when no replica is configured.
+    """
+    from contextlib import asynccontextmanager
+    from app import main
+    from app.db.models import Product
+    from app.repos.product_repo import autocomplete_index
+
+    @asynccontextmanager
+    async def primary_session():
+        yield db_session
+
+    db_session.add(Product(owner_id=test_user.id, name="Walnut Desk", price=250, stock=3))
+    await db_session.flush()
+    monkeypatch.setattr(main, "ReadSessionLocal", None)
+    monkeypatch.setattr(main, "AsyncSessionLocal", primary_session)
+
+    await main.load_autocomplete()
+    assert [name for _, name in autocomplete_index.complete("waln")] == ["Walnut Desk"]
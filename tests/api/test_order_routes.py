@@ -1,4 +1,6 @@
 # tests/api/test_order_routes.py
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
@@ -119,3 +121,62 @@ def test_admin_list_all_orders(
     data = response.json()
     assert isinstance(data, list)
     assert len(data) >= 1
+
+def test_list_orders_sparse_fields_and_expand(client: TestClient, auth_headers: dict, product_for_order: dict):
+    """
+    Tests ?fields= projection and ?expand=items.product on the order listing.
+    """
+    client.post("/api/v1/orders/", headers=auth_headers, json={"items": [{"product_id": product_for_order["id"], "quantity": 1}]})
+
+    slim = client.get("/api/v1/orders/", headers=auth_headers, params={"fields": "id,total"})
+    assert slim.status_code == status.HTTP_200_OK
+    assert set(slim.json()[0]) == {"id", "total"}
+
+    expanded = client.get("/api/v1/orders/", headers=auth_headers, params={"expand": "items.product"}).json()
+    assert expanded[0]["items"][0]["product"]["name"] == product_for_order["name"]
+
+    order_id = expanded[0]["id"]
+    single = client.get(f"/api/v1/orders/{order_id}", headers=auth_headers, params={"expand": "items.product"}).json()
+    assert single["items"][0]["product"]["id"] == product_for_order["id"]
+
+    assert client.get("/api/v1/orders/", headers=auth_headers, params={"expand": "user"}).status_code == status.HTTP_400_BAD_REQUEST
+
+def test_admin_export_streams_ndjson_and_csv(client: TestClient, auth_headers: dict, superuser_auth_headers: dict, product_for_order: dict):
+    """
+    Tests the streaming order export in both formats, with a status filter.
+    """
+    client.post("/api/v1/orders/", headers=auth_headers, json={"items": [{"product_id": product_for_order["id"], "quantity": 2}]})
+
+    ndjson = client.get("/api/v1/orders/admin/export", headers=superuser_auth_headers, params={"format": "ndjson"})
+    assert ndjson.status_code == status.HTTP_200_OK
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    orders = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert orders[-1]["items"][0]["quantity"] == 2
+
+    csv_export = client.get("/api/v1/orders/admin/export", headers=superuser_auth_headers, params={"format": "csv"})
+    lines = csv_export.text.splitlines()
+    assert lines[0].startswith("order_id,user_id,status")
+    assert len(lines) == len(orders) + 1
+
+    cancelled = client.get("/api/v1/orders/admin/export", headers=superuser_auth_headers, params={"status": "cancelled"})
+    assert cancelled.text == ""
+
+    assert client.get("/api/v1/orders/admin/export", headers=auth_headers).status_code == status.HTTP_403_FORBIDDEN
+
+def test_admin_sales_stats(client: TestClient, superuser_auth_headers: dict, auth_headers: dict, product_for_order: dict):
+    """
+    Tests the admin analytics endpoints over the rollup tables.
+    """
+    client.post("/api/v1/orders/", headers=auth_headers, json={"items": [{"product_id": product_for_order["id"], "quantity": 2}]})
+
+    daily = client.get("/api/v1/orders/admin/stats/daily", headers=superuser_auth_headers)
+    assert daily.status_code == status.HTTP_200_OK
+    assert daily.json()[-1]["units"] == 2
+    products = client.get("/api/v1/orders/admin/stats/products", headers=superuser_auth_headers).json()
+    assert products[0] == {"product_id": product_for_order["id"], "units": 2, "revenue": 50.0}
+    counts = client.get("/api/v1/orders/admin/stats/status", headers=superuser_auth_headers).json()["counts"]
+    assert counts == {"pending": 1}
+
+    assert client.get("/api/v1/orders/admin/stats/daily", headers=auth_headers).status_code == status.HTTP_403_FORBIDDEN
+    bad = client.get("/api/v1/orders/admin/stats/daily", params={"start": "2026-02-01", "end": "2026-01-01"}, headers=superuser_auth_headers)
+    assert bad.status_code == status.HTTP_400_BAD_REQUEST
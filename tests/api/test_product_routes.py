@@ -125,3 +125,239 @@ def test_upload_product_image(client: TestClient, superuser_auth_headers: dict,
     assert "image_key" in data
     assert data["image_key"] is not None
     mock_s3_client.upload_fileobj.assert_called_once()
+
+def test_get_product_conditional_requests(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests ETag/Last-Modified on a product and 304 on revalidation, until the product changes.
+    """
+    create_response = client.post(
+        "/api/v1/products/",
+        headers=superuser_auth_headers,
+        json={"name": "Validated", "price": 10, "stock": 10},
+    )
+    product_id = create_response.json()["id"]
+
+    response = client.get(f"/api/v1/products/{product_id}")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+    assert "must-revalidate" in response.headers["cache-control"]
+
+    response = client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    last_modified = response.headers["last-modified"]
+    response = client.get(f"/api/v1/products/{product_id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.put(f"/api/v1/products/{product_id}", headers=superuser_auth_headers, json={"price": 12})
+    response = client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+
+def test_list_products_conditional_requests(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests that an unchanged product page revalidates with 304.
+    """
+    client.post(
+        "/api/v1/products/",
+        headers=superuser_auth_headers,
+        json={"name": "Listed", "price": 5, "stock": 1},
+    )
+    response = client.get("/api/v1/products/")
+    etag = response.headers["etag"]
+
+    response = client.get("/api/v1/products/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+def test_search_products_paginates_with_cursor(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests the search endpoint's ranked pages and opaque cursor.
+    """
+    for i in range(3):
+        client.post("/api/v1/products/", headers=superuser_auth_headers, json={"name": f"Bamboo Stand {i}", "price": 15})
+
+    first = client.get("/api/v1/products/search", params={"q": "bamboo", "limit": 2})
+    assert first.status_code == status.HTTP_200_OK
+    page = first.json()
+    assert len(page["items"]) == 2
+    assert page["next_cursor"]
+
+    second = client.get("/api/v1/products/search", params={"q": "bamboo", "limit": 2, "cursor": page["next_cursor"]})
+    rest = second.json()
+    assert len(rest["items"]) == 1
+    assert rest["next_cursor"] is None
+    assert {p["id"] for p in page["items"]}.isdisjoint(p["id"] for p in rest["items"])
+
+    assert client.get("/api/v1/products/search", params={"q": "bamboo", "cursor": "bogus"}).status_code == 400
+
+def test_list_products_filters_and_sorts(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests server-side price/stock filters and sort orders on the listing.
+    """
+    for name, price, stock in [("Cheap", 5, 0), ("Mid", 50, 3), ("Pricey", 500, 1)]:
+        client.post("/api/v1/products/", headers=superuser_auth_headers, json={"name": name, "price": price, "stock": stock})
+
+    by_price = client.get("/api/v1/products/", params={"sort": "-price"}).json()
+    assert [p["name"] for p in by_price] == ["Pricey", "Mid", "Cheap"]
+
+    filtered = client.get("/api/v1/products/", params={"min_price": 10, "in_stock": True, "sort": "price"}).json()
+    assert [p["name"] for p in filtered] == ["Mid", "Pricey"]
+
+    assert client.get("/api/v1/products/", params={"sort": "random"}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_autocomplete_follows_product_writes(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests that created, renamed and deleted products show up in autocomplete immediately.
+    """
+    created = client.post("/api/v1/products/", headers=superuser_auth_headers, json={"name": "Ergonomic Chair", "price": 300}).json()
+
+    response = client.get("/api/v1/products/autocomplete", params={"prefix": "ergo"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [{"id": created["id"], "name": "Ergonomic Chair"}]
+
+    client.put(f"/api/v1/products/{created['id']}", headers=superuser_auth_headers, json={"name": "Standing Desk"})
+    assert client.get("/api/v1/products/autocomplete", params={"prefix": "ergo"}).json() == []
+    assert client.get("/api/v1/products/autocomplete", params={"prefix": "desk"}).json()[0]["id"] == created["id"]
+
+    client.delete(f"/api/v1/products/{created['id']}", headers=superuser_auth_headers)
+    assert client.get("/api/v1/products/autocomplete", params={"prefix": "stand"}).json() == []
+
+def test_batch_lookup_get_and_post(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests GET and POST batch lookups return products in the requested order.
+    """
+    ids = [
+        client.post("/api/v1/products/", headers=superuser_auth_headers, json={"name": f"Batch {i}", "price": 1}).json()["id"]
+        for i in range(3)
+    ]
+    wanted = [ids[2], 999999, ids[0]]
+
+    response = client.get("/api/v1/products/batch", params={"ids": ",".join(map(str, wanted))})
+    assert response.status_code == status.HTTP_200_OK
+    assert [p["id"] for p in response.json()["items"]] == [ids[2], ids[0]]
+    assert response.json()["missing"] == [999999]
+
+    response = client.post("/api/v1/products/batch", json={"ids": wanted})
+    assert [p["id"] for p in response.json()["items"]] == [ids[2], ids[0]]
+
+    assert client.get("/api/v1/products/batch", params={"ids": "1,x"}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get("/api/v1/products/batch", params={"ids": f"1,{2**31}"}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.post("/api/v1/products/batch", json={"ids": [1, 2**31]}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.post("/api/v1/products/batch", json={"ids": [0]}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_list_products_sparse_fields(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests ?fields= projection, its own ETag, and rejection of unknown fields.
+    """
+    client.post("/api/v1/products/", headers=superuser_auth_headers, json={"name": "Slim", "price": 3, "description": "x" * 5000})
+
+    full = client.get("/api/v1/products/")
+    slim = client.get("/api/v1/products/", params={"fields": "id,name,price"})
+    assert slim.status_code == status.HTTP_200_OK
+    assert set(slim.json()[0]) == {"id", "name", "price"}
+    assert slim.headers["etag"] != full.headers["etag"]
+
+    assert client.get("/api/v1/products/", params={"fields": "name,owner"}).status_code == status.HTTP_400_BAD_REQUEST
+
+def test_import_products_ndjson(client: TestClient, superuser_auth_headers: dict, auth_headers: dict):
+    """
+    Tests the bulk import endpoint: admin only, content-type detection, row errors.
+    """
+    body = b'{"name": "Bulk 1", "price": 1}\n{"name": "Bulk 2", "price": "x"}\n{"name": "Bulk 3", "price": 3, "stock": 4}\n'
+    headers = {**superuser_auth_headers, "Content-Type": "application/x-ndjson"}
+
+    response = client.post("/api/v1/products/import", headers=headers, content=body)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert (data["inserted"], data["updated"], data["rejected"]) == (2, 0, 1)
+    assert data["errors"][0]["row"] == 2
+
+    names = [p["name"] for p in client.get("/api/v1/products/", params={"sort": "name"}).json()]
+    assert "Bulk 1" in names and "Bulk 3" in names
+
+    assert client.post("/api/v1/products/import", headers={**auth_headers, "Content-Type": "application/x-ndjson"}, content=body).status_code == status.HTTP_403_FORBIDDEN
+    assert client.post("/api/v1/products/import", headers=superuser_auth_headers, content=body).status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    bad_header = client.post("/api/v1/products/import", params={"format": "csv"}, headers=superuser_auth_headers, content=b"name,colour\nA,red\n")
+    assert bad_header.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_sync_stock_and_prices(client: TestClient, superuser_auth_headers: dict):
+    """
+    Tests the sync endpoint: deltas applied once per batch_id, validation of changes.
+    """
+    product = client.post("/api/v1/products/", headers=superuser_auth_headers, json={"name": "Synced", "price": 5, "stock": 10}).json()
+    body = {"batch_id": "sync-1", "changes": [{"id": product["id"], "stock_delta": -4, "price_delta": 1.5}]}
+
+    for _ in range(2):
+        response = client.post("/api/v1/products/sync", headers=superuser_auth_headers, json=body)
+        assert response.status_code == status.HTTP_200_OK
+    assert response.json()["replayed"] is True
+    fetched = client.get(f"/api/v1/products/{product['id']}").json()
+    assert (fetched["stock"], fetched["price"]) == (6, 6.5)
+
+    body["changes"][0]["stock_delta"] = -1
+    assert client.post("/api/v1/products/sync", headers=superuser_auth_headers, json=body).status_code == status.HTTP_409_CONFLICT
+    duplicate = {"batch_id": "sync-2", "changes": [{"id": product["id"], "stock": 1}, {"id": product["id"], "stock": 2}]}
+    assert client.post("/api/v1/products/sync", headers=superuser_auth_headers, json=duplicate).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    both = {"batch_id": "sync-3", "changes": [{"id": product["id"], "stock": 1, "stock_delta": 2}]}
+    assert client.post("/api/v1/products/sync", headers=superuser_auth_headers, json=both).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_set_stock_shards(client: TestClient, superuser_auth_headers: dict, auth_headers: dict):
+    """
+    Tests sharding a product's stock (admin only), and that bulk sync then rejects stock changes for it.
+    """
+    product = client.post("/api/v1/products/", headers=superuser_auth_headers, json={"name": "Viral Mug", "price": 12, "stock": 100}).json()
+    url = f"/api/v1/products/{product['id']}/stock-shards"
+    assert client.put(url, headers=auth_headers, json={"shards": 8}).status_code == status.HTTP_403_FORBIDDEN
+    assert client.put(url, headers=superuser_auth_headers, json={"shards": 65}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.put("/api/v1/products/999999/stock-shards", headers=superuser_auth_headers, json={"shards": 8}).status_code == status.HTTP_404_NOT_FOUND
+
+    response = client.put(url, headers=superuser_auth_headers, json={"shards": 8})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"id": product["id"], "stock_shards": 8, "stock": 100}
+
+    sync = client.post("/api/v1/products/sync", headers=superuser_auth_headers, json={
+        "batch_id": "shards-1", "changes": [{"id": product["id"], "stock_delta": -1}],
+    }).json()
+    assert sync["rejected"] == [product["id"]]
+    assert client.get(f"/api/v1/products/{product['id']}").json()["stock"] == 100
+
+def test_sharded_stock_changes_etag(client: TestClient, superuser_auth_headers: dict, auth_headers: dict):
+    """
+    Tests that a checkout of a product with sharded stock changes its ETag although updated_at doesn't move.
+    """
+    product = client.post("/api/v1/products/", headers=superuser_auth_headers, json={"name": "Viral Cap", "price": 8, "stock": 10}).json()
+    client.put(f"/api/v1/products/{product['id']}/stock-shards", headers=superuser_auth_headers, json={"shards": 2})
+    response = client.get(f"/api/v1/products/{product['id']}")
+    etag = response.headers["etag"]
+    assert "last-modified" not in response.headers
+
+    client.post("/api/v1/orders/", headers=auth_headers, json={"items": [{"product_id": product["id"], "quantity": 1}]})
+    response = client.get(f"/api/v1/products/{product['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["stock"] == 9
+    assert response.headers["etag"] != etag
+
+def test_related_products_from_mapped_file(client: TestClient, tmp_path, monkeypatch):
+    """
+    Tests that related products are served from the mapped file, and 503 before one is loaded.
+    """
+    import pytest
+    np = pytest.importorskip("numpy")
+    from app.core import related_products
+    from app.repos import product_repo
+
+    index = related_products.RelatedProducts()
+    monkeypatch.setattr(product_repo, "related_products", index)
+    assert client.get("/api/v1/products/1/related").status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    orders, products = np.array([1, 1, 1, 2, 2], dtype="int64"), np.array([7, 8, 9, 7, 9], dtype="int64")
+    path = str(tmp_path / "related.bin")
+    related_products.save(path, related_products.top_k(related_products.cooccurrence(orders, products, max_basket=50), k=5), {})
+    index.load(path)
+
+    response = client.get("/api/v1/products/7/related", params={"limit": 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["product_id"] == 7
+    assert [r["id"] for r in response.json()["related"]] == [9]
+    assert client.get("/api/v1/products/42/related").json()["related"] == []
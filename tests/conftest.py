@@ -6,18 +6,22 @@ import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
 from motor.motor_asyncio import AsyncIOMotorClient
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
 
+from app.core.cache import caches
 from app.core.config import settings
+from app.core.response_cache import store as response_store
 from app.core.security import create_access_token, hash_password
 from app.db.models import Base, User
 from app.db.mongo import get_mongo_db
-from app.db.pg import get_db
+from app.db.pg import get_db, get_read_db
 from app.main import app
+from app.repos.product_repo import autocomplete_index, catalog_snapshot
 
 # --- Event Loop Fixture (Session-Scoped) ---
 @pytest.fixture(scope="session")
@@ -36,6 +40,7 @@ async def setup_database() -> AsyncGenerator[None, None]:
     engine = create_async_engine(settings.TEST_DATABASE_URL)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
     yield
     await engine.dispose()
@@ -44,15 +49,22 @@ async def setup_database() -> AsyncGenerator[None, None]:
 async def db_session() -> AsyncGenerator[AsyncSession, None]:
     """
     Provide a transactional SQLAlchemy session that rolls back after each test.
+    The session is bound to a connection with an outer transaction, so commits made
+    by repositories (and db_released) only release savepoints inside it.
     """
     engine = create_async_engine(settings.TEST_DATABASE_URL)
-    AsyncSessionLocal = async_sessionmaker(
-        bind=engine, autocommit=False, autoflush=False, expire_on_commit=False
-    )
-    async with AsyncSessionLocal() as session:
-        await session.begin()
-        yield session
-        await session.rollback()
+    async with engine.connect() as conn:
+        outer = await conn.begin()
+        AsyncSessionLocal = async_sessionmaker(
+            bind=conn,
+            autoflush=False,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+        async with AsyncSessionLocal() as session:
+            yield session
+        await outer.rollback()
+    await engine.dispose()
 
 # --- MongoDB Fixtures ---
 @pytest_asyncio.fixture
@@ -79,12 +91,14 @@ def client(db_session: AsyncSession, test_mongo_db: AsyncIOMotorClient) -> Gener
         yield test_mongo_db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     app.dependency_overrides[get_mongo_db] = override_get_mongo_db
     
     with TestClient(app) as test_client:
         yield test_client
     
     del app.dependency_overrides[get_db]
+    del app.dependency_overrides[get_read_db]
     del app.dependency_overrides[get_mongo_db]
 
 # --- User & Auth Fixtures ---
@@ -140,6 +154,17 @@ def superuser_auth_headers(superuser: User) -> dict:
     token = create_access_token(subject=str(superuser.id))
     return {"Authorization": f"Bearer {token}"}
 
+# --- Cache Fixtures ---
+@pytest_asyncio.fixture(autouse=True)
+async def clear_caches() -> AsyncGenerator[None, None]:
+    """Start every test with empty application caches."""
+    for cache in caches.values():
+        await cache.clear()
+    response_store.clear()
+    autocomplete_index.build([])
+    catalog_snapshot.clear()
+    yield
+
 # --- Mocking Fixtures ---
 @pytest.fixture(autouse=True)
 def mock_s3_client():
@@ -0,0 +1,44 @@
+# tests/core/test_autocomplete.py
+from app.core.autocomplete import AutocompleteIndex
+
+
+def _index():
+    index = AutocompleteIndex(memo_prefix_len=2, memo_limit=5)
+    index.build([
+        (1, "Wireless Mouse", 10),
+        (2, "Wired Keyboard", 50),
+        (3, "Mouse Pad", 30),
+        (4, "Gaming  MOUSE", 5),
+    ])
+    return index
+
+
+def test_matches_any_word_start_by_popularity():
+    """
+    Tests that a prefix matches the start of any word, most popular first.
+    """
+    index = _index()
+    assert index.complete("mou") == [(3, "Mouse Pad"), (1, "Wireless Mouse"), (4, "Gaming  MOUSE")]
+    assert index.complete("wir", limit=1) == [(2, "Wired Keyboard")]
+    assert index.complete("ouse") == []
+    assert index.complete("  ") == []
+
+def test_multi_word_prefix():
+    """
+    Tests that prefixes spanning words match normalized names.
+    """
+    assert _index().complete("wireless  m") == [(1, "Wireless Mouse")]
+
+def test_incremental_updates_invalidate_memoized_answers():
+    """
+    Tests that upserts and removals are visible to short (memoized) prefixes.
+    """
+    index = _index()
+    assert [pid for pid, _ in index.complete("m")] == [3, 1, 4]
+
+    index.upsert(4, "Gaming Mouse", popularity=100)
+    index.upsert(3, "Desk Pad")
+    index.remove(1)
+    assert [pid for pid, _ in index.complete("m")] == [4]
+    assert index.complete("desk") == [(3, "Desk Pad")]
+    assert len(index) == 3
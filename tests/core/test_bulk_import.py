@@ -0,0 +1,67 @@
+# tests/core/test_bulk_import.py
+import asyncio
+
+import pytest
+
+from app.core.bulk_import import ImportFormatError, read_records, validated_batches
+from app.schemas.product import ProductImportRow
+
+
+async def _chunks(data: bytes, size: int = 7):
+    # small chunks, so rows and multi-byte characters straddle chunk boundaries
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _read(data: bytes, format: str, batch_size: int = 100, max_rows=None):
+    async def run():
+        records = read_records(_chunks(data), format, columns=ProductImportRow.model_fields)
+        return [batch async for batch in validated_batches(records, ProductImportRow, batch_size, max_rows)]
+    return asyncio.run(run())
+
+
+def test_csv_rows_validated_and_numbered():
+    """
+    Tests CSV parsing: header, quoted newlines, empty cells as defaults, per-row errors.
+    """
+    data = (
+        "\ufeffname,price,stock,description,id\r\n"
+        'Café,9.5,3,"two\nlines",\r\n'
+        "\r\n"
+        "Bad,-1,,,\r\n"
+        "Short,1\r\n"
+        "Update,2,,,42\r\n"
+    ).encode()
+    [(valid, rejected)] = _read(data, "csv")
+    assert [(row, item.name) for row, item in valid] == [(1, "Café"), (4, "Update")]
+    first = valid[0][1]
+    assert (first.description, first.stock, first.id, first.is_active) == ("two\nlines", 3, None, True)
+    assert valid[1][1].id == 42 and valid[1][1].stock == 0
+    assert [row for row, _ in rejected] == [2, 3]
+    assert rejected[0][1].startswith("price:")
+    assert "expected 5 values" in rejected[1][1]
+
+
+def test_ndjson_batches():
+    """
+    Tests NDJSON parsing, invalid lines, and batching by row count.
+    """
+    data = b'{"name": "A", "price": 1}\n[1]\n{"name": "B", "price": 2, "color": "red"}\nnot json\n{"name": "C", "price": 3}'
+    batches = _read(data, "ndjson", batch_size=2)
+    assert len(batches) == 3
+    valid = [(row, item.name) for batch, _ in batches for row, item in batch]
+    rejected = [row for _, errors in batches for row, _ in errors]
+    assert valid == [(1, "A"), (5, "C")]
+    assert rejected == [2, 3, 4]
+
+
+def test_whole_input_errors():
+    """
+    Tests that unknown CSV columns, bad encoding and oversized inputs fail as a whole.
+    """
+    with pytest.raises(ImportFormatError):
+        _read(b"name,price,colour\nA,1,red\n", "csv")
+    with pytest.raises(ImportFormatError):
+        _read(b'{"name": "\xff"}\n', "ndjson")
+    with pytest.raises(ImportFormatError):
+        _read(b"name,price\nA,1\nB,2\nC,3\n", "csv", max_rows=2)
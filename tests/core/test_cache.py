@@ -0,0 +1,129 @@
+# tests/core/test_cache.py
+import fnmatch
+
+import pytest
+
+from app.core.cache import MemoryLRUBackend, ReadThroughCache, RedisBackend
+
+
+class FakeRedis:
+    """Local stand-in for redis.asyncio.Redis (only what RedisBackend uses)."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def scan_iter(self, match="*"):
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+
+class FakePipeline:
+    """Buffers set() calls until execute(), like a redis.asyncio pipeline."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.calls.append((key, value))
+
+    async def execute(self):
+        for key, value in self.calls:
+            await self.client.set(key, value)
+        self.calls = []
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used():
+    """
+    Tests LRU eviction once max_entries is reached.
+    """
+    backend = MemoryLRUBackend(max_entries=2)
+    await backend.set("a", {"v": 1}, ttl=60)
+    await backend.set("b", {"v": 2}, ttl=60)
+    await backend.get("a")
+    await backend.set("c", {"v": 3}, ttl=60)
+    assert await backend.get("b") is None
+    assert await backend.get("a") == {"v": 1}
+
+@pytest.mark.asyncio
+async def test_lru_expires_entries():
+    """
+    Tests that entries past their TTL are misses.
+    """
+    backend = MemoryLRUBackend()
+    await backend.set("a", {"v": 1}, ttl=-1)
+    assert await backend.get("a") is None
+
+@pytest.mark.asyncio
+async def test_shared_backend_round_trip_and_hit_ratio():
+    """
+    Tests the Redis-compatible backend and hit/miss accounting.
+    """
+    client = FakeRedis()
+    cache = ReadThroughCache("product", RedisBackend(client, prefix="test:product:"), ttl=60)
+    assert await cache.get("1") is None
+    await cache.set("1", {"id": 1, "name": "Mouse"})
+    assert await cache.get("1") == {"id": 1, "name": "Mouse"}
+    await cache.invalidate("1")
+    assert await cache.get("1") is None
+    assert cache.stats()["hit_ratio"] == pytest.approx(1 / 3)
+
+@pytest.mark.asyncio
+async def test_backend_failure_is_a_miss():
+    """
+    Tests that a failing shared store degrades to cache misses.
+    """
+    class Broken(FakeRedis):
+        async def get(self, key):
+            raise ConnectionError("down")
+
+    cache = ReadThroughCache("product", RedisBackend(Broken(), prefix="p:"), ttl=60)
+    assert await cache.get("1") is None
+    assert cache.misses == 1
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [MemoryLRUBackend(), RedisBackend(FakeRedis(), prefix="t:")], ids=["memory", "redis"])
+async def test_get_many_counts_hits_and_misses(backend):
+    """
+    Tests batch lookups: found values by key, every key counted as a hit or a miss.
+    """
+    cache = ReadThroughCache("batch", backend, ttl=60)
+    await cache.set("1", {"id": 1})
+    await cache.set("3", {"id": 3})
+    assert await cache.get_many(["1", "2", "3"]) == {"1": {"id": 1}, "3": {"id": 3}}
+    assert (cache.hits, cache.misses) == (2, 1)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [MemoryLRUBackend(), RedisBackend(FakeRedis(), prefix="t:")], ids=["memory", "redis"])
+async def test_set_many_fills_in_one_call(backend):
+    """
+    Tests that a batch fill stores every value.
+    """
+    cache = ReadThroughCache("batch", backend, ttl=60)
+    await cache.set_many({"1": {"id": 1}, "2": {"id": 2}})
+    await cache.set_many({})
+    assert await cache.get_many(["1", "2"]) == {"1": {"id": 1}, "2": {"id": 2}}
@@ -0,0 +1,140 @@
+# tests/core/test_catalog_snapshot.py
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.catalog_snapshot import CatalogSnapshot, SnapshotProduct
+
+pytest.importorskip("numpy")
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _product(pid, name="Item", price=10.0, stock=1, owner_id=1, age_days=0, is_active=True):
+    created = NOW - timedelta(days=age_days)
+    return SnapshotProduct(
+        id=pid, owner_id=owner_id, name=name, description=None, price=price, stock=stock,
+        image_key=None, is_active=is_active, created_at=created, updated_at=created,
+    )
+
+def _reference(products, limit=50, offset=0, min_price=None, in_stock=False, owner_id=None, created_after=None, sort="id"):
+    rows = [
+        p for p in products
+        if p.is_active
+        and (min_price is None or p.price >= min_price)
+        and (not in_stock or p.stock > 0)
+        and (owner_id is None or p.owner_id == owner_id)
+        and (created_after is None or p.created_at >= created_after)
+    ]
+    keys = {
+        "id": lambda p: p.id,
+        "price": lambda p: (p.price, p.id),
+        "-price": lambda p: (-p.price, -p.id),
+        "newest": lambda p: (-p.created_at.timestamp(), -p.id),
+        "name": lambda p: (p.name, p.id),
+    }
+    return [p.id for p in sorted(rows, key=keys[sort])[offset:offset + limit]]
+
+def test_query_matches_sql_semantics():
+    """
+    Tests filters, sorts (including ties) and paging against a plain-Python reference.
+    """
+    rng = random.Random(7)
+    products = [
+        _product(i, name=rng.choice("abcde") * 3, price=rng.choice([5.0, 10.0, 20.0]), stock=rng.randint(0, 3),
+                 owner_id=rng.randint(1, 3), age_days=rng.randint(0, 30), is_active=rng.random() > 0.1)
+        for i in range(1, 2001)
+    ]
+    snapshot = CatalogSnapshot()
+    snapshot.build(products)
+    cases = [
+        {}, {"sort": "price"}, {"sort": "-price", "offset": 40}, {"sort": "newest", "limit": 7},
+        {"sort": "name", "offset": 100}, {"min_price": 10, "in_stock": True, "sort": "price"},
+        {"owner_id": 2, "created_after": NOW - timedelta(days=5), "sort": "newest"}, {"limit": 5000},
+    ]
+    for case in cases:
+        assert [p.id for p in snapshot.query(**case)] == _reference(products, **case), case
+
+def test_apply_updates_removes_and_compacts():
+    """
+    Tests incremental upserts, deactivation and deletion, including tombstone compaction.
+    """
+    snapshot = CatalogSnapshot()
+    snapshot.build([_product(i, price=float(i)) for i in range(1, 2001)])
+
+    snapshot.apply([_product(5, price=0.5), _product(3000, name="New", price=0.1), _product(6, is_active=False)], removed_ids=[7])
+    assert [p.id for p in snapshot.query(limit=2, sort="price")] == [3000, 5]
+    assert len(snapshot) == 2000 - 2 + 1
+
+    snapshot.apply([], removed_ids=range(100, 1500))
+    assert len(snapshot) == 599
+    assert [p.id for p in snapshot.query(limit=3, offset=95)] == [98, 99, 1500]
+    assert snapshot.query(limit=1, sort="price")[0].name == "New"
+
+def test_saved_snapshot_maps_and_applies_changes(tmp_path):
+    """
+    Tests that a mapped snapshot answers like the saved one, takes changes without
+    touching the file, and can be saved again.
+    """
+    from app.core import catalog_snapshot
+
+    rng = random.Random(11)
+    products = [
+        _product(i, name=rng.choice(["Lamp", "Desk", "Chair"]), price=float(rng.randint(1, 50)), stock=rng.randint(0, 2), age_days=rng.randint(0, 9))
+        for i in range(1, 1001)
+    ]
+    products[3].description = "bright"
+    original = CatalogSnapshot()
+    original.build(products)
+    original.apply([], removed_ids=[10])  # a tombstone goes into the file too
+    path = str(tmp_path / "catalog.bin")
+    watermark = NOW + timedelta(minutes=5)
+    catalog_snapshot.save(path, original.export(), watermark)
+
+    mapped = CatalogSnapshot()
+    assert mapped.load_file(path) == watermark
+    cases = [{}, {"sort": "name", "offset": 300}, {"sort": "-price", "in_stock": True}]
+    for case in cases:
+        assert mapped.query(**case) == original.query(**case), case
+    assert mapped.query(limit=1, offset=3)[0].description == "bright"
+    assert mapped.diff_ids([1, 2, 5000]) == ([i for i in range(3, 1001) if i != 10], [5000])
+
+    renamed = _product(4, name="Armchair", price=0.5)
+    mapped.apply([renamed, _product(5000, name="Zebra rug")], removed_ids=[1])
+    assert mapped.query(limit=1, sort="price")[0] == renamed
+    assert [p.id for p in mapped.query(limit=1, sort="name")] == [4]
+    assert mapped.query(limit=1, offset=len(mapped) - 1)[0].name == "Zebra rug"
+    assert len(mapped) == len(original) - 1 + 1
+
+    reread = CatalogSnapshot()
+    reread.load_file(path)  # the file still has the saved rows
+    assert reread.query(limit=1, offset=3)[0] == original.query(limit=1, offset=3)[0]
+
+    catalog_snapshot.save(path, mapped.export(), watermark)
+    reread.load_file(path)
+    for case in cases + [{"sort": "name"}]:
+        assert reread.query(**case) == mapped.query(**case), case
+
+def test_unusable_snapshot_file_is_rejected(tmp_path):
+    """
+    Tests that a truncated file or one with an older header raises instead of mapping garbage.
+    """
+    from app.core import catalog_snapshot, mapped_file
+
+    original = CatalogSnapshot()
+    original.build([_product(i) for i in range(1, 200)])
+    path = tmp_path / "catalog.bin"
+    catalog_snapshot.save(str(path), original.export(), NOW)
+    path.write_bytes(path.read_bytes()[:-100])
+    snapshot = CatalogSnapshot()
+    with pytest.raises(ValueError, match="truncated"):
+        snapshot.load_file(str(path))
+    assert not snapshot.ready
+
+    # right magic and format, but arrays and meta keys missing
+    meta = {"format": catalog_snapshot._FORMAT, "watermark": NOW.isoformat()}
+    mapped_file.save(str(path), catalog_snapshot._MAGIC, {"col_id": original.export()["cols"]["id"]}, meta)
+    with pytest.raises(KeyError):
+        snapshot.load_file(str(path))
+    assert not snapshot.ready
@@ -0,0 +1,113 @@
+# tests/core/test_compression.py
+import gzip
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app.core import compression
+from app.core.compression import CompressionMiddleware, negotiate
+from app.core.metrics import metrics
+from app.core.response_cache import ResponseCacheMiddleware, store
+
+PAYLOAD = [{"id": i, "name": f"product {i}"} for i in range(200)]
+
+
+async def big(request):
+    return JSONResponse(PAYLOAD, headers={"ETag": '"v1"'})
+
+async def small(request):
+    return JSONResponse({"ok": True})
+
+async def image(request):
+    return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+async def stream(request):
+    async def lines():
+        for row in PAYLOAD:
+            yield f'{{"id": {row["id"]}}}\n'
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _client(asgi, encoding):
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=asgi), base_url="http://test", headers={"Accept-Encoding": encoding}
+    )
+
+
+@pytest.fixture
+def app():
+    inner = Starlette(routes=[
+        Route("/big", big), Route("/small", small), Route("/image", image), Route("/stream", stream),
+    ])
+    return CompressionMiddleware(inner)
+
+
+def test_negotiate_respects_q_values_and_server_preference():
+    """
+    Tests Accept-Encoding parsing: q=0 refuses a coding, '*' accepts the rest.
+    """
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("") is None
+    assert negotiate("*") == compression.available_encodings()[0]
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped_with_weak_etag(app):
+    """
+    Tests that an allowlisted body over the threshold is compressed and its ETag weakened.
+    """
+    metrics.reset()
+    async with _client(app, "gzip") as client:
+        response = await client.get("/big")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.json() == PAYLOAD
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert metrics.snapshot()["timings"]["compression_cpu"]["gzip"]["count"] == 1
+
+@pytest.mark.asyncio
+async def test_small_and_binary_bodies_are_not_compressed(app):
+    """
+    Tests the size threshold and the content-type allowlist.
+    """
+    async with _client(app, "gzip") as client:
+        small_response = await client.get("/small")
+        image_response = await client.get("/image")
+    assert "content-encoding" not in small_response.headers
+    assert small_response.json() == {"ok": True}
+    assert "content-encoding" not in image_response.headers
+
+@pytest.mark.asyncio
+async def test_streamed_body_is_compressed_incrementally(app):
+    """
+    Tests that streamed NDJSON is compressed once it crosses the threshold.
+    """
+    async with _client(app, "gzip") as client:
+        response = await client.get("/stream")
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == len(PAYLOAD)
+
+@pytest.mark.asyncio
+async def test_response_cache_stores_compressed_bytes(monkeypatch):
+    """
+    Tests that cached entries hold the encoded body, per negotiated encoding.
+    """
+    from app.core.config import settings
+    monkeypatch.setitem(settings.RESPONSE_CACHE_ROUTES, "GET /big", 60.0)
+    store.clear()
+    asgi = ResponseCacheMiddleware(CompressionMiddleware(Starlette(routes=[Route("/big", big)])))
+    async with _client(asgi, "gzip") as client:
+        await client.get("/big")
+        hit = await client.get("/big")
+    async with _client(asgi, "identity") as client:
+        plain = await client.get("/big")
+    entry = store.get("GET /big? gzip")
+    store.clear()
+    assert hit.headers["x-cache"] == "HIT"
+    assert hit.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(entry.body) == plain.content
+    assert plain.headers["x-cache"] == "MISS"
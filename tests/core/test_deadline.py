@@ -0,0 +1,77 @@
+# tests/core/test_deadline.py
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.middleware import DeadlineMiddleware
+
+
+def _app_with_deadline() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware)
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(1)
+        return {"ok": True}
+
+    @app.get("/budget")
+    async def budget():
+        return {"remaining_ms": deadline.remaining_ms()}
+
+    @app.get("/exhausted")
+    async def exhausted():
+        raise deadline.DeadlineExceeded()
+
+    return app
+
+
+def test_budget_for_prefers_longest_matching_pattern(monkeypatch):
+    """
+    Tests per-route timeout resolution.
+    """
+    monkeypatch.setattr(settings, "REQUEST_TIMEOUT_SECONDS", 10.0)
+    monkeypatch.setattr(settings, "ROUTE_TIMEOUTS", {"GET /api/*": 5.0, "GET /api/v1/health/*": 2.0})
+    assert deadline.budget_for("GET", "/api/v1/health/live") == 2.0
+    assert deadline.budget_for("GET", "/api/v1/products/") == 5.0
+    assert deadline.budget_for("POST", "/api/v1/products/") == 10.0
+
+
+def test_order_export_gets_a_long_budget():
+    """
+    Tests that the streaming order export isn't held to the default deadline (and statement_timeout).
+    """
+    budget = deadline.budget_for("GET", "/api/v1/orders/admin/export")
+    assert budget == settings.ROUTE_TIMEOUTS["GET /api/v1/orders/admin/export"]
+    assert budget >= 10 * settings.REQUEST_TIMEOUT_SECONDS
+
+
+def test_remaining_budget_visible_to_handlers(monkeypatch):
+    """
+    Tests that the remaining budget is available inside the request.
+    """
+    monkeypatch.setattr(settings, "ROUTE_TIMEOUTS", {"GET /budget": 3.0})
+    response = TestClient(_app_with_deadline()).get("/budget")
+    assert 0 < response.json()["remaining_ms"] <= 3000
+    assert deadline.remaining() is None
+
+
+def test_request_past_deadline_gets_504(monkeypatch):
+    """
+    Tests that a handler running past its budget is cut off with a 504.
+    """
+    monkeypatch.setattr(settings, "ROUTE_TIMEOUTS", {"GET /slow": 0.05})
+    response = TestClient(_app_with_deadline()).get("/slow")
+    assert response.status_code == 504
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_request_without_budget_is_shed_with_503():
+    """
+    Tests that work refused for lack of budget is shed with a 503.
+    """
+    response = TestClient(_app_with_deadline()).get("/exhausted")
+    assert response.status_code == 503
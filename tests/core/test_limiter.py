@@ -0,0 +1,86 @@
+# tests/core/test_limiter.py
+import asyncio
+
+import pytest
+
+from app.core.limiter import AdaptiveLimiter, classify
+from app.core.config import settings
+
+
+def test_classify_uses_route_priorities(monkeypatch):
+    """
+    Tests that health/checkout, catalog and admin listings fall into their classes.
+    """
+    monkeypatch.setattr(settings, "ROUTE_PRIORITIES", {
+        "GET /api/v1/health/*": "critical",
+        "POST /api/v1/orders/": "critical",
+        "GET /api/v1/orders/admin/*": "low",
+    })
+    assert classify("GET", "/api/v1/health/live") == "critical"
+    assert classify("POST", "/api/v1/orders/") == "critical"
+    assert classify("GET", "/api/v1/products/") == "normal"
+    assert classify("GET", "/api/v1/orders/admin/all") == "low"
+
+@pytest.mark.asyncio
+async def test_rejects_when_full_and_queue_wait_exceeded():
+    """
+    Tests that a request is rejected once the limit is reached and its wait runs out.
+    """
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=10, queue_timeout=0.01)
+    assert await limiter.acquire("critical")
+    assert await limiter.acquire("critical")
+    assert await limiter.acquire("critical") is False
+    limiter.release(0.01)
+    assert await limiter.acquire("critical")
+
+@pytest.mark.asyncio
+async def test_low_priority_capped_below_limit():
+    """
+    Tests that low-priority requests can only use part of the limit.
+    """
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=1, max_limit=10, queue_timeout=0.01)
+    assert await limiter.acquire("low")
+    assert await limiter.acquire("low")
+    assert await limiter.acquire("low") is False
+    assert await limiter.acquire("critical")
+
+@pytest.mark.asyncio
+async def test_freed_slot_goes_to_highest_priority_waiter():
+    """
+    Tests that waiters are woken in priority order, not arrival order.
+    """
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=10, queue_timeout=1.0)
+    assert await limiter.acquire("critical")
+    normal = asyncio.create_task(limiter.acquire("normal"))
+    await asyncio.sleep(0)
+    critical = asyncio.create_task(limiter.acquire("critical"))
+    await asyncio.sleep(0)
+
+    limiter.release(0.01)
+    assert await critical is True
+    assert not normal.done()
+    limiter.release(0.01)
+    assert await normal is True
+
+@pytest.mark.asyncio
+async def test_limit_shrinks_when_latency_rises_and_on_drops():
+    """
+    Tests that rising latency and overload drops reduce the limit.
+    """
+    limiter = AdaptiveLimiter(initial_limit=50, min_limit=5, max_limit=500, queue_timeout=0.1)
+    for _ in range(50):
+        assert await limiter.acquire("critical")
+    for _ in range(50):
+        limiter.release(0.01)
+    baseline = limiter.limit
+
+    for _ in range(50):
+        assert await limiter.acquire("critical")
+    for _ in range(50):
+        limiter.release(0.5)
+    assert limiter.limit < baseline
+
+    before = limiter.limit
+    assert await limiter.acquire("critical")
+    limiter.release(None, dropped=True)
+    assert limiter.limit < before
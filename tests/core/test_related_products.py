@@ -0,0 +1,103 @@
+# tests/core/test_related_products.py
+import math
+import random
+from collections import Counter
+from itertools import combinations
+
+import pytest
+
+from app.core import related_products
+from app.core.related_products import RelatedProducts
+
+np = pytest.importorskip("numpy")
+
+
+def _baskets(seed=3, orders=400):
+    rng = random.Random(seed)
+    rows = []
+    for order_id in range(1, orders + 1):
+        size = rng.choice([1, 2, 3, 5, 12])
+        rows += [(order_id, rng.randint(1, 40)) for _ in range(size)]  # repeats within an order happen
+    return rows
+
+def _reference(rows, max_basket, k, min_count=1):
+    baskets = {}
+    for order_id, pid in rows:
+        baskets.setdefault(order_id, set()).add(pid)
+    baskets = [b for b in baskets.values() if len(b) <= max_basket]
+    items = Counter(pid for b in baskets for pid in b)
+    pairs = Counter(pair for b in baskets for pair in combinations(sorted(b), 2))
+    neighbours = {}
+    for (a, b), together in pairs.items():
+        if together >= min_count:
+            score = together / math.sqrt(items[a] * items[b])
+            neighbours.setdefault(a, []).append((-score, -together, b))
+            neighbours.setdefault(b, []).append((-score, -together, a))
+    return items, pairs, {pid: [n for *_, n in sorted(ns)[:k]] for pid, ns in neighbours.items()}
+
+def _columns(rows):
+    return np.array([o for o, _ in rows], dtype="int64"), np.array([p for _, p in rows], dtype="int64")
+
+def test_top_k_matches_reference():
+    """
+    Tests counts, basket cap, scoring and tie order against a plain-Python reference.
+    """
+    rows = _baskets()
+    counts = related_products.cooccurrence(*_columns(rows), max_basket=8)
+    items, pairs, expected = _reference(rows, max_basket=8, k=5, min_count=2)
+    assert dict(zip(counts["item_ids"].tolist(), counts["item_counts"].tolist())) == items
+    assert sum(counts["pair_counts"]) == sum(pairs.values())
+
+    neighbours = related_products.top_k(counts, k=5, min_count=2)
+    ids, indptr = neighbours["ids"].tolist(), neighbours["indptr"]
+    assert ids == sorted(expected)
+    for i, pid in enumerate(ids):
+        assert neighbours["neighbors"][indptr[i]:indptr[i + 1]].tolist() == expected[pid], pid
+
+def test_merge_equals_counting_everything():
+    """
+    Tests that merging the counts of two batches of orders equals counting them at once.
+    """
+    rows = _baskets(seed=5)
+    cut = len(rows) // 2
+    while rows[cut][0] == rows[cut - 1][0]:  # don't split an order
+        cut += 1
+    merged = related_products.merge(
+        related_products.cooccurrence(*_columns(rows[:cut]), max_basket=50),
+        related_products.cooccurrence(*_columns(rows[cut:]), max_basket=50),
+    )
+    whole = related_products.cooccurrence(*_columns(rows), max_basket=50)
+    for key in ("item_ids", "item_counts", "pair_keys", "pair_counts", "orders"):
+        assert np.array_equal(merged[key], whole[key]), key
+
+def test_active_ids_and_empty_input():
+    """
+    Tests that inactive products never appear, and that no orders gives an empty index.
+    """
+    counts = related_products.cooccurrence(*_columns([(1, 1), (1, 2), (1, 3), (2, 1), (2, 3)]), max_basket=50)
+    neighbours = related_products.top_k(counts, k=5, active_ids=[1, 3])
+    assert neighbours["ids"].tolist() == [1, 3]
+    assert neighbours["neighbors"].tolist() == [3, 1]
+
+    empty = related_products.top_k(related_products.cooccurrence(*_columns([]), max_basket=50), k=5)
+    assert all(len(arr) == 0 for key, arr in empty.items() if key != "indptr")
+
+def test_save_load_and_lookup(tmp_path):
+    """
+    Tests the mapped file round trip, lookups, and reloading only when the file changes.
+    """
+    path = str(tmp_path / "related.bin")
+    counts = related_products.cooccurrence(*_columns([(1, 10), (1, 20), (2, 10), (2, 20), (2, 30), (3, 10), (3, 30)]), max_basket=50)
+    related_products.save(path, {**related_products.top_k(counts, k=5), "pair_keys": counts["pair_keys"]}, {"watermark": "x"})
+    arrays, meta = related_products.load(path)
+    assert meta == {"watermark": "x"}
+    assert np.array_equal(arrays["pair_keys"], counts["pair_keys"])
+
+    index = RelatedProducts()
+    assert index.load(path) and not index.load(path)
+    assert [pid for pid, _ in index.lookup(10, limit=5)] == [20, 30]
+    assert index.lookup(10, limit=1) == [(20, pytest.approx(2 / math.sqrt(6)))]
+    assert index.lookup(99, limit=5) == [] and index.lookup(5, limit=5) == []
+
+    related_products.save(path, related_products.top_k(counts, k=1, min_count=3), {})
+    assert index.load(path) and len(index) == 0
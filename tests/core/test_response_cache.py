@@ -0,0 +1,135 @@
+# tests/core/test_response_cache.py
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core import response_cache
+from app.core.config import settings
+from app.core.response_cache import ResponseCacheMiddleware, purge_tags, store
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setitem(settings.RESPONSE_CACHE_ROUTES, "GET /items*", 60.0)
+    store.clear()
+    calls = {"n": 0}
+
+    async def item(request):
+        calls["n"] += 1
+        return JSONResponse(
+            {"n": calls["n"]},
+            headers={"Surrogate-Key": "item-1 item-list", "ETag": 'W/"v1"'},
+        )
+
+    inner = Starlette(routes=[Route("/items", item), Route("/other", item)])
+    yield ResponseCacheMiddleware(inner), calls
+    store.clear()
+
+
+def _client(asgi):
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=asgi), base_url="http://test", headers={"Accept-Encoding": "identity"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_hit_is_served_without_running_the_route(app):
+    """
+    Tests that a second identical request (query order aside) is a cache hit.
+    """
+    asgi, calls = app
+    async with _client(asgi) as client:
+        first = await client.get("/items?b=2&a=1")
+        second = await client.get("/items?a=1&b=2")
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json() == {"n": 1}
+    assert calls["n"] == 1
+    assert "surrogate-key" not in second.headers
+
+@pytest.mark.asyncio
+async def test_unlisted_routes_and_credentials_bypass(app):
+    """
+    Tests that only opted-in routes are cached, and never for authenticated requests.
+    """
+    asgi, calls = app
+    async with _client(asgi) as client:
+        await client.get("/other")
+        await client.get("/other")
+        await client.get("/items", headers={"Authorization": "Bearer x"})
+        await client.get("/items", headers={"Authorization": "Bearer x"})
+    assert calls["n"] == 4
+    assert len(store) == 0
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_while_refreshing_once(app):
+    """
+    Tests stale-while-revalidate: stale hits return immediately and one refresh runs.
+    """
+    asgi, calls = app
+    async with _client(asgi) as client:
+        await client.get("/items")
+        entry = store.get("GET /items? identity")
+        entry.fresh_until = 0
+        stale = await asyncio.gather(*(client.get("/items") for _ in range(5)))
+        assert all(r.headers["x-cache"] == "STALE" and r.json() == {"n": 1} for r in stale)
+        for _ in range(50):
+            if not entry.refreshing:
+                break
+            await asyncio.sleep(0.01)
+        fresh = await client.get("/items")
+    assert calls["n"] == 2
+    assert fresh.headers["x-cache"] == "HIT"
+    assert fresh.json() == {"n": 2}
+
+@pytest.mark.asyncio
+async def test_purge_by_tag_and_conditional_hit(app):
+    """
+    Tests that purging a tag drops the entry and that cached ETags answer with 304.
+    """
+    asgi, calls = app
+    async with _client(asgi) as client:
+        await client.get("/items")
+        not_modified = await client.get("/items", headers={"If-None-Match": 'W/"v1"'})
+        purge_tags("item-1")
+        again = await client.get("/items")
+    assert not_modified.status_code == 304
+    assert not_modified.headers["x-cache"] == "HIT"
+    assert again.headers["x-cache"] == "MISS"
+    assert calls["n"] == 2
+
+def test_cache_key_normalizes_query():
+    """
+    Tests that parameter order doesn't split the cache.
+    """
+    scope = {"method": "GET", "path": "/p", "query_string": b"z=1&a=2&a=1", "headers": [(b"accept-encoding", b"gzip")]}
+    assert response_cache.cache_key(scope) == "GET /p?a=2&a=1&z=1 gzip"
+
+@pytest.mark.asyncio
+async def test_product_subroutes_are_not_cached():
+    """
+    Tests that the product detail pattern doesn't also cache the routes below it,
+    e.g. the presigned image URL.
+    """
+    store.clear()
+    calls = {"n": 0}
+
+    async def route(request):
+        calls["n"] += 1
+        return JSONResponse({"n": calls["n"]})
+
+    inner = Starlette(routes=[Route("/api/v1/products/{id}", route), Route("/api/v1/products/{id}/image-url", route)])
+    async with _client(ResponseCacheMiddleware(inner)) as client:
+        await client.get("/api/v1/products/7/image-url")
+        urls = await client.get("/api/v1/products/7/image-url")
+        await client.get("/api/v1/products/7")
+        detail = await client.get("/api/v1/products/7")
+    assert "x-cache" not in urls.headers
+    assert detail.headers["x-cache"] == "HIT"
+    assert calls["n"] == 3
+    assert response_cache.ttl_for("GET", "/api/v1/products/7/related") is None
+    store.clear()
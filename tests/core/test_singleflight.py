@@ -0,0 +1,85 @@
+# tests/core/test_singleflight.py
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    """
+    Tests that identical concurrent reads run the loader once.
+    """
+    flight = SingleFlight("test", timeout=1.0)
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    results = await asyncio.gather(*(flight.do("k", load) for _ in range(10)))
+    assert calls == 1
+    assert results == [{"id": 1}] * 10
+
+@pytest.mark.asyncio
+async def test_follower_falls_back_after_timeout():
+    """
+    Tests that a slow leader doesn't stall followers beyond the key's timeout.
+    """
+    flight = SingleFlight("test", timeout=1.0)
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "leader"
+
+    async def fast():
+        return "own"
+
+    leader = asyncio.create_task(flight.do("k", slow))
+    await asyncio.sleep(0)
+    assert await flight.do("k", fast, timeout=0.01) == "own"
+    release.set()
+    assert await leader == "leader"
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    """
+    Tests that followers run their own call when the leader goes away.
+    """
+    flight = SingleFlight("test", timeout=1.0)
+
+    async def never():
+        await asyncio.Event().wait()
+
+    async def own():
+        return "own"
+
+    leader = asyncio.create_task(flight.do("k", never))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", own))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "own"
+
+@pytest.mark.asyncio
+async def test_leader_error_is_shared():
+    """
+    Tests that a failing query fails its waiters too, and the key is freed afterwards.
+    """
+    flight = SingleFlight("test", timeout=1.0)
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("db down")
+
+    results = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def ok():
+        return 1
+
+    assert await flight.do("k", ok) == 1
@@ -0,0 +1,89 @@
+# tests/db/test_order_partitions.py
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Order, OrderItem, Product, User
+from app.db.partitions import add_months, ensure_order_partitions, existing_partitions, month_start, partition_name
+from app.repos import order_repo
+
+
+def test_month_arithmetic():
+    """
+    Tests month helpers across year boundaries and partition naming.
+    """
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert month_start(datetime(2026, 3, 31, 23, 30, tzinfo=timezone.utc)) == date(2026, 3, 1)
+    assert partition_name("orders", date(2026, 3, 1)) == "orders_p2026_03"
+
+def _relations(plan: dict):
+    if "Relation Name" in plan:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _relations(child)
+
+async def _scanned(session: AsyncSession, stmt) -> set[str]:
+    compiled = stmt.compile(dialect=postgresql.dialect(paramstyle="named"))
+    res = await session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"), compiled.params)
+    return set(_relations(res.scalar()[0]["Plan"]))
+
+@pytest.mark.asyncio
+async def test_orders_land_in_monthly_partitions_and_prune(db_session: AsyncSession, test_user: User):
+    """
+    Tests that ensure_order_partitions is idempotent, that new orders and their items
+    go to the current month's partitions, and that month-bounded queries prune.
+    """
+    conn = await db_session.connection()
+    this_month = month_start(datetime.now(timezone.utc))
+    await ensure_order_partitions(conn, months_ahead=2)
+    for table in ("orders", "order_items"):
+        wanted = {partition_name(table, add_months(this_month, n)) for n in range(3)}
+        assert wanted <= await existing_partitions(conn, table)
+    assert await ensure_order_partitions(conn, months_ahead=2) == []
+
+    product = Product(owner_id=test_user.id, name="Partitioned", price=5, stock=10)
+    db_session.add(product)
+    await db_session.flush()
+    order = await order_repo.create_order(db_session, user_id=test_user.id, items=[{"product_id": product.id, "quantity": 2}])
+    assert [item.quantity for item in order.items] == [2]
+
+    placed = await db_session.execute(text("SELECT tableoid::regclass::text FROM orders WHERE id = :id"), {"id": order.id})
+    assert placed.scalar() == partition_name("orders", this_month)
+    placed = await db_session.execute(text("SELECT tableoid::regclass::text FROM order_items WHERE order_id = :id"), {"id": order.id})
+    assert placed.scalar() == partition_name("order_items", this_month)
+
+    start = datetime.combine(this_month, datetime.min.time(), tzinfo=timezone.utc)
+    end = datetime.combine(add_months(this_month, 1), datetime.min.time(), tzinfo=timezone.utc)
+    month_orders = select(Order).where(Order.created_at >= start, Order.created_at < end)
+    assert await _scanned(db_session, month_orders) == {partition_name("orders", this_month)}
+    items = select(OrderItem).where(OrderItem.order_id == order.id, OrderItem.order_created_at == order.created_at)
+    assert await _scanned(db_session, items) == {partition_name("order_items", this_month)}
+
+@pytest.mark.asyncio
+async def test_partitions_created_after_rows_landed_in_default(db_session: AsyncSession, test_user: User):
+    """
+    Tests that a month whose orders already went to the DEFAULT partitions still gets
+    its partitions, with the rows moved into them, and that later months are created too.
+    """
+    conn = await db_session.connection()
+    month = add_months(month_start(datetime.now(timezone.utc)), 40)  # far beyond any created partition
+    created_at = datetime.combine(month, datetime.min.time(), tzinfo=timezone.utc).replace(day=15)
+    order = Order(user_id=test_user.id, total=20.0, created_at=created_at, items=[OrderItem(product_id=None, quantity=2, price_at_purchase=10.0)])
+    db_session.add(order)
+    await db_session.flush()
+    placed = await db_session.execute(text("SELECT tableoid::regclass::text FROM orders WHERE id = :id"), {"id": order.id})
+    assert placed.scalar() == "orders_default"
+
+    created = await ensure_order_partitions(conn, months_ahead=1, start=month)
+    assert created == [
+        partition_name(table, m) for m in (month, add_months(month, 1)) for table in ("orders", "order_items")
+    ]
+    placed = await db_session.execute(text("SELECT tableoid::regclass::text FROM orders WHERE id = :id"), {"id": order.id})
+    assert placed.scalar() == partition_name("orders", month)
+    placed = await db_session.execute(text("SELECT tableoid::regclass::text, quantity FROM order_items WHERE order_id = :id"), {"id": order.id})
+    assert placed.one() == (partition_name("order_items", month), 2)
+    assert await db_session.scalar(text("SELECT count(*) FROM orders_default")) == 0
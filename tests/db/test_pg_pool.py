@@ -0,0 +1,47 @@
+# tests/db/test_pg_pool.py
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool.base import Pool
+
+from app.db.pg import InstrumentedAsyncPool
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.mark.asyncio
+async def test_pool_wait_counts_queueing_not_connecting(monkeypatch):
+    """
+    Tests that opening a connection isn't counted as pool wait, and waiting for a busy slot is.
+    """
+    create = Pool._create_connection
+
+    def slow_connect(pool):
+        time.sleep(0.2)
+        return create(pool)
+
+    monkeypatch.setattr(Pool, "_create_connection", slow_connect)
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:", poolclass=InstrumentedAsyncPool,
+        pool_size=1, max_overflow=0, pool_timeout=5, pool_pre_ping=True,
+    )
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    assert (engine.pool.checkouts, engine.pool.wait_max) == (1, pytest.approx(0, abs=0.05))
+
+    async def hold():
+        async with engine.connect():
+            await asyncio.sleep(0.3)
+
+    async def queue():
+        await asyncio.sleep(0.05)
+        async with engine.connect():
+            pass
+
+    await asyncio.gather(hold(), queue())
+    assert engine.pool.checkouts == 3
+    assert engine.pool.wait_max == pytest.approx(0.25, abs=0.1)
+    await engine.dispose()
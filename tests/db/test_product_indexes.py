@@ -0,0 +1,62 @@
+# tests/db/test_product_indexes.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User
+from app.repos.product_repo import LISTING_SORTS, listing_query
+
+ROWS = 50_000
+
+async def _seed(session: AsyncSession, owner_id: int, other_owner_id: int) -> None:
+    await session.execute(text("""
+        INSERT INTO products (owner_id, name, description, price, stock, is_active, created_at, updated_at)
+        SELECT CASE WHEN g % 100 = 0 THEN :owner_id ELSE :other_owner_id END,
+               'product ' || md5(g::text), NULL,
+               (g * 7919 % 100000) / 100.0, g % 10, g % 20 <> 0,
+               now() - make_interval(mins => g), now()
+        FROM generate_series(1, :rows) AS g
+    """), {"owner_id": owner_id, "other_owner_id": other_owner_id, "rows": ROWS})
+    await session.execute(text("ANALYZE products"))
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+async def _plan(session: AsyncSession, stmt) -> dict:
+    compiled = stmt.compile(dialect=postgresql.dialect(paramstyle="named"))
+    res = await session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"), compiled.params)
+    return res.scalar()[0]["Plan"]
+
+# filter sets of GET /products/, as functions of (owner id, now); every one is
+# checked with every sort in LISTING_SORTS
+FILTERS = {
+    "none": lambda owner_id, now: {},
+    "price_range": lambda owner_id, now: {"min_price": 100, "max_price": 105},
+    "in_stock": lambda owner_id, now: {"in_stock": True},
+    "in_stock_price_range": lambda owner_id, now: {"in_stock": True, "min_price": 100, "max_price": 105},
+    "owner": lambda owner_id, now: {"owner_id": owner_id},
+    "created_after": lambda owner_id, now: {"created_after": now - timedelta(hours=2)},
+    "created_range": lambda owner_id, now: {"created_after": now - timedelta(days=11), "created_before": now - timedelta(days=10)},
+}
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sort", list(LISTING_SORTS))
+@pytest.mark.parametrize("filters", list(FILTERS))
+async def test_listing_combinations_use_indexes(db_session: AsyncSession, test_user: User, superuser: User, filters: str, sort: str):
+    """
+    Tests that a filter/sort combination neither scans products sequentially nor
+    sorts a large part of the table once it is big enough for the planner to care:
+    the order comes from an index, or the filters narrow the rows down first.
+    """
+    await _seed(db_session, test_user.id, superuser.id)
+    query = listing_query(limit=50, sort=sort, **FILTERS[filters](test_user.id, datetime.now(timezone.utc)))
+    nodes = list(_nodes(await _plan(db_session, query)))
+    assert "Seq Scan" not in [node["Node Type"] for node in nodes], nodes[0]
+    for node in nodes:
+        if node["Node Type"] in ("Sort", "Incremental Sort"):
+            assert node["Plans"][0]["Plan Rows"] <= ROWS // 20, nodes[0]
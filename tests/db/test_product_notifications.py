@@ -0,0 +1,46 @@
+# tests/db/test_product_notifications.py
+import asyncio
+
+import asyncpg
+import pytest
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.db.models import PRODUCT_CHANGES_CHANNEL
+
+async def _next(queue: asyncio.Queue) -> set[int]:
+    payload = await asyncio.wait_for(queue.get(), timeout=5)
+    return {int(pid) for pid in payload.split(",")}
+
+@pytest.mark.asyncio
+async def test_product_writes_notify_changed_ids():
+    """
+    Tests that committed inserts, updates and (cascaded) deletes announce product ids.
+    Uses its own committed transactions, since notifications are sent on commit.
+    """
+    url = make_url(settings.TEST_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    listener, writer = await asyncpg.connect(url), await asyncpg.connect(url)
+    queue: asyncio.Queue = asyncio.Queue()
+    await listener.add_listener(PRODUCT_CHANGES_CHANNEL, lambda _c, _pid, _ch, payload: queue.put_nowait(payload))
+    user_id = await writer.fetchval(
+        "INSERT INTO users (email, hashed_password, is_active, is_superuser, created_at) "
+        "VALUES ('notify@example.com', 'x', true, false, now()) RETURNING id"
+    )
+    try:
+        rows = await writer.fetch(
+            "INSERT INTO products (owner_id, name, price, stock, is_active, created_at, updated_at) "
+            "SELECT $1, 'n' || g, 1, 1, true, now(), now() FROM generate_series(1, 3) AS g RETURNING id",
+            user_id,
+        )
+        ids = {row["id"] for row in rows}
+        assert await _next(queue) == ids
+
+        await writer.execute("UPDATE products SET stock = 0 WHERE owner_id = $1", user_id)
+        assert await _next(queue) == ids
+
+        await writer.execute("DELETE FROM users WHERE id = $1", user_id)
+        assert await _next(queue) == ids
+    finally:
+        await writer.execute("DELETE FROM users WHERE id = $1", user_id)
+        await listener.close()
+        await writer.close()
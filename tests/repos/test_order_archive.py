@@ -0,0 +1,104 @@
+# tests/repos/test_order_archive.py
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import order_archive
+from app.core.config import settings
+from app.db.models import Order, OrderArchiveObject, OrderItem, OrderStatus, User
+from app.repos import order_repo
+
+moto = pytest.importorskip("moto")
+pytest.importorskip("zstandard")
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """
+    A moto-backed S3 client in place of the autouse MagicMock.
+    """
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="archive-test")
+        monkeypatch.setattr("app.core.s3.s3_client", client)
+        monkeypatch.setattr("app.core.s3.BUCKET_NAME", "archive-test")
+        yield client
+
+
+def _order(user_id: int, status: OrderStatus, created_at: datetime, quantity: int = 1) -> Order:
+    return Order(
+        user_id=user_id, status=status, total=10.0 * quantity, created_at=created_at,
+        items=[OrderItem(product_id=None, quantity=quantity, price_at_purchase=10.0)],
+    )
+
+
+@pytest.mark.asyncio
+async def test_archive_orders_moves_old_orders_to_s3(db_session: AsyncSession, test_user: User, s3_bucket):
+    """
+    Tests that old delivered/cancelled orders are archived per month and deleted,
+    that recent or open orders stay, and that get_order falls back to the archive.
+    """
+    old = datetime(2024, 1, 15, tzinfo=timezone.utc)
+    orders = [
+        _order(test_user.id, OrderStatus.delivered, old, quantity=2),
+        _order(test_user.id, OrderStatus.cancelled, old + timedelta(days=1)),
+        _order(test_user.id, OrderStatus.delivered, old + timedelta(days=40)),  # next month
+        _order(test_user.id, OrderStatus.pending, old),  # still open
+        _order(test_user.id, OrderStatus.delivered, datetime.now(timezone.utc)),  # too recent
+    ]
+    db_session.add_all(orders)
+    await db_session.commit()
+    ids = [o.id for o in orders]
+
+    before = datetime.now(timezone.utc) - timedelta(days=365)
+    stats = await order_repo.archive_orders(db_session, before, batch_size=2)
+    assert stats == {"orders": 3, "objects": 2}  # two January orders in one batch, February in the next
+
+    remaining = await db_session.execute(select(Order.id).where(Order.id.in_(ids)))
+    assert sorted(remaining.scalars()) == [ids[3], ids[4]]
+    keys = sorted(obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket="archive-test")["Contents"])
+    assert all(key.startswith(f"{settings.ORDER_ARCHIVE_PREFIX}/2024/0") for key in keys)
+    assert await db_session.scalar(select(func.sum(OrderArchiveObject.order_count))) == 3
+
+    archived = await order_repo.get_order(db_session, ids[0])
+    assert (archived.id, archived.status, archived.user_id) == (ids[0], OrderStatus.delivered, test_user.id)
+    assert [item.quantity for item in archived.items] == [2]
+    assert await order_repo.get_order(db_session, 10**9) is None
+
+
+def test_archive_record_roundtrip():
+    """
+    Tests that an order survives encode/decode with its items.
+    """
+    created = datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc)
+    order = _order(7, OrderStatus.cancelled, created, quantity=3)
+    order.id = 42
+    order.items[0].id = 9
+    [record] = list(order_archive.decode(order_archive.encode([order_archive.to_record(order)])))
+    restored = order_archive.from_record(record)
+    assert (restored.id, restored.status, restored.created_at) == (42, OrderStatus.cancelled, created)
+    assert [(it.id, it.quantity, it.order_created_at) for it in restored.items] == [(9, 3, created)]
+
+
+def test_find_keeps_recent_objects_decoded(s3_bucket, monkeypatch):
+    """
+    Tests that archive lookups decode an object once and answer later lookups from memory.
+    """
+    created = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    orders = [_order(7, OrderStatus.delivered, created, quantity=q) for q in (1, 2)]
+    for order_id, order in enumerate(orders, start=100):
+        order.id = order_id
+    key = order_archive.object_key(created.date(), 100, 101)
+    order_archive.put(key, order_archive.encode(order_archive.to_record(o) for o in orders), len(orders))
+
+    order_archive._object_lines.cache_clear()
+    downloads = []
+    get = order_archive.get
+    monkeypatch.setattr(order_archive, "get", lambda k: downloads.append(k) or get(k))
+    assert order_archive.find(key, 101)["items"][0]["quantity"] == 2
+    assert order_archive.find(key, 100)["id"] == 100
+    assert order_archive.find(key, 102) is None
+    assert downloads == [key]
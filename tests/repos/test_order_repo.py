@@ -91,6 +91,15 @@ async def test_list_orders_for_user(db_session: AsyncSession, test_user: User, s
     assert len(user_orders) == 1
     assert user_orders[0].user_id == test_user.id
 
+def test_user_orders_query_selects_only_requested_fields():
+    """
+    Tests that a sparse fieldset narrows the SELECT list to those columns and the primary key.
+    """
+    q = order_repo.user_orders_query(user_id=1, with_items=False, fields=("total",))
+    select_list = str(q).split("FROM")[0]
+    assert "orders.total" in select_list and "orders.id" in select_list and "orders.created_at" in select_list
+    assert "orders.status" not in select_list and "orders.user_id" not in select_list
+
 @pytest.mark.asyncio
 async def test_list_all_orders(db_session: AsyncSession, test_user: User, superuser: User, sample_product: Product):
     """
@@ -104,4 +113,116 @@ async def test_list_all_orders(db_session: AsyncSession, test_user: User, superu
     all_orders = await order_repo.list_all_orders(db_session)
     
     # Because of test isolation, we know exactly how many orders should be in the DB
-    assert len(all_orders) == 2
\ No newline at end of file
+    assert len(all_orders) == 2
+
+@pytest.mark.asyncio
+async def test_create_order_invalidates_cached_stock(db_session: AsyncSession, test_user: User, sample_product: Product):
+    """
+    Tests that a cached product reflects the stock decrease made by an order.
+    """
+    await product_repo.get_product(db_session, sample_product.id)  # warm the cache
+    items = [{"product_id": sample_product.id, "quantity": 3}]
+    await order_repo.create_order(session=db_session, user_id=test_user.id, items=items)
+
+    product = await product_repo.get_product(db_session, sample_product.id)
+    assert product.stock == 17
+
+@pytest.mark.asyncio
+async def test_create_order_locks_current_stock_not_session_copy(db_session: AsyncSession, test_user: User, sample_product: Product):
+    """
+    Tests that an order checks the locked row's stock, not a stale copy the session already holds.
+    """
+    from sqlalchemy import text
+
+    await product_repo.get_product(db_session, sample_product.id)  # session copy says 20
+    await db_session.execute(text("UPDATE products SET stock = 1 WHERE id = :id"), {"id": sample_product.id})  # another worker
+    items = [{"product_id": sample_product.id, "quantity": 2}]
+    with pytest.raises(ValueError, match="Insufficient stock"):
+        await order_repo.create_order(session=db_session, user_id=test_user.id, items=items)
+
+@pytest.mark.asyncio
+async def test_sales_rollups_follow_orders(db_session: AsyncSession, test_user: User, sample_product: Product):
+    """
+    Tests that placing and cancelling orders keeps the daily rollups in step.
+    """
+    from datetime import datetime, timezone
+    from app.db.models import OrderStatus
+    from app.repos import sales_repo
+
+    today = datetime.now(timezone.utc).date()
+    kept = await order_repo.create_order(session=db_session, user_id=test_user.id, items=[{"product_id": sample_product.id, "quantity": 2}])
+    cancelled = await order_repo.create_order(session=db_session, user_id=test_user.id, items=[{"product_id": sample_product.id, "quantity": 3}])
+    await order_repo.cancel_order(session=db_session, order=cancelled)
+
+    [day] = await sales_repo.daily_sales(db_session, today, today)
+    assert (day.orders, day.units) == (1, 2)
+    assert day.revenue == pytest.approx(kept.total)
+    [top] = await sales_repo.top_products(db_session, today, today)
+    assert (top.product_id, top.units) == (sample_product.id, 2)
+    assert await sales_repo.status_counts(db_session, today, today) == {OrderStatus.pending: 1, OrderStatus.cancelled: 1}
+
+@pytest.mark.asyncio
+async def test_sales_rollups_spread_orders_over_buckets(db_session: AsyncSession, test_user: User, sample_product: Product):
+    """
+    Tests that consecutive orders of a day update different rollup rows, which the readers add up.
+    """
+    from datetime import datetime, timezone
+    from sqlalchemy import func, select
+    from app.db.models import ProductSalesDaily, SalesDaily
+    from app.repos import sales_repo
+
+    today = datetime.now(timezone.utc).date()
+    for _ in range(2):
+        await order_repo.create_order(session=db_session, user_id=test_user.id, items=[{"product_id": sample_product.id, "quantity": 1}])
+
+    assert await db_session.scalar(select(func.count()).select_from(SalesDaily).where(SalesDaily.day == today)) == 2
+    assert await db_session.scalar(select(func.count()).select_from(ProductSalesDaily).where(ProductSalesDaily.day == today)) == 2
+    [day] = await sales_repo.daily_sales(db_session, today, today)
+    assert (day.orders, day.units) == (2, 2)
+    [top] = await sales_repo.top_products(db_session, today, today)
+    assert top.units == 2
+
+@pytest.mark.asyncio
+async def test_stream_basket_rows_skips_cancelled_orders(db_session: AsyncSession, test_user: User, sample_product: Product):
+    """
+    Tests that the related-products input has one row per item of orders that weren't cancelled.
+    """
+    other = await product_repo.create_product(session=db_session, owner_id=test_user.id, name="Socks", price=5, stock=20)
+    kept = await order_repo.create_order(session=db_session, user_id=test_user.id, items=[
+        {"product_id": sample_product.id, "quantity": 1}, {"product_id": other.id, "quantity": 2},
+    ])
+    cancelled = await order_repo.create_order(session=db_session, user_id=test_user.id, items=[{"product_id": other.id, "quantity": 1}])
+    await order_repo.cancel_order(session=db_session, order=cancelled)
+
+    rows = [tuple(row) async for row in order_repo.stream_basket_rows(db_session, created_after=kept.created_at)]
+    assert sorted(rows) == sorted([(kept.id, sample_product.id), (kept.id, other.id)])
+
+@pytest.mark.asyncio
+async def test_orders_take_from_sharded_stock(db_session: AsyncSession, test_user: User, sample_product: Product):
+    """
+    Tests that with sharded stock orders and cancellations move the shards, reads sum
+    them, orders larger than any one shard still go through, and unsharding folds back.
+    """
+    from sqlalchemy import select
+    from app.db.models import ProductStockShard
+
+    await product_repo.set_stock_shards(db_session, sample_product.id, 4)
+    res = await db_session.execute(select(ProductStockShard.stock).where(ProductStockShard.product_id == sample_product.id).order_by(ProductStockShard.shard))
+    assert list(res.scalars()) == [5, 5, 5, 5]
+
+    order = await order_repo.create_order(session=db_session, user_id=test_user.id, items=[{"product_id": sample_product.id, "quantity": 3}])
+    assert (await product_repo.get_product(db_session, sample_product.id)).stock == 17
+    await order_repo.create_order(session=db_session, user_id=test_user.id, items=[{"product_id": sample_product.id, "quantity": 12}])  # spans shards
+    await order_repo.cancel_order(session=db_session, order=order)
+    assert (await product_repo.get_product(db_session, sample_product.id)).stock == 8
+
+    assert await product_repo.refresh_sharded_stock(db_session) == [sample_product.id]
+    await db_session.refresh(sample_product)
+    assert sample_product.stock == 8
+
+    with pytest.raises(ValueError, match="Insufficient stock"):
+        await order_repo.create_order(session=db_session, user_id=test_user.id, items=[{"product_id": sample_product.id, "quantity": 9}])
+    await db_session.rollback()
+    await product_repo.set_stock_shards(db_session, sample_product.id, 0)
+    assert (sample_product.stock, sample_product.stock_shards) == (8, 0)
+    assert await db_session.scalar(select(ProductStockShard).where(ProductStockShard.product_id == sample_product.id)) is None
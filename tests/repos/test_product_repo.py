@@ -1,7 +1,8 @@
 # tests/repos/test_product_repo.py
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.repos import product_repo
+from app.core.config import settings
+from app.repos import order_repo, product_repo
 from app.db.models import User, Product
 
 # All tests in this file are correctly marked with @pytest.mark.asyncio
@@ -93,4 +94,253 @@ async def test_delete_product(db_session: AsyncSession, test_user: User):
     
     # Verify the product is no longer in the database
     deleted_product = await product_repo.get_product(db_session, product_id=product_to_delete.id)
-    assert deleted_product is None
\ No newline at end of file
+    assert deleted_product is None
+
+@pytest.mark.asyncio
+async def test_get_product_served_from_cache(db_session: AsyncSession, test_user: User):
+    """
+    Tests that a second lookup of the same product is a cache hit.
+    """
+    product = await product_repo.create_product(
+        session=db_session, owner_id=test_user.id, name="Cached", price=10
+    )
+    await product_repo.get_product(db_session, product_id=product.id)
+    hits = product_repo.product_cache.hits
+
+    cached = await product_repo.get_product(db_session, product_id=product.id)
+
+    assert cached.name == "Cached"
+    assert product_repo.product_cache.hits == hits + 1
+
+@pytest.mark.asyncio
+async def test_replica_reads_do_not_fill_the_cache(db_session: AsyncSession, test_user: User, monkeypatch):
+    """
+    Tests that rows read from the replica aren't cached, since it may lag behind the
+    write that last invalidated them.
+    """
+    product = await product_repo.create_product(db_session, owner_id=test_user.id, name="Lagging", price=10)
+    monkeypatch.setattr(product_repo, "replica_engine", db_session.bind)
+
+    assert (await product_repo.get_product(db_session, product.id)).name == "Lagging"
+    products, _ = await product_repo.get_products(db_session, [product.id])
+    assert [p.name for p in products] == ["Lagging"]
+    assert await product_repo.product_cache.get(str(product.id)) is None
+
+@pytest.mark.asyncio
+async def test_update_product_invalidates_cache(db_session: AsyncSession, test_user: User):
+    """
+    Tests that an update is visible to the next cached lookup.
+    """
+    product = await product_repo.create_product(
+        session=db_session, owner_id=test_user.id, name="Before", price=10
+    )
+    cached = await product_repo.get_product(db_session, product_id=product.id)
+    await product_repo.update_product(db_session, product=cached, name="After")
+
+    retrieved = await product_repo.get_product(db_session, product_id=product.id)
+    assert retrieved.name == "After"
+
+@pytest.mark.asyncio
+async def test_search_products_ranks_name_matches_first(db_session: AsyncSession, test_user: User):
+    """
+    Tests full-text search: stemmed matches, name hits ranked above description hits.
+    """
+    in_name = await product_repo.create_product(db_session, owner_id=test_user.id, name="Gaming Keyboards", price=80)
+    in_description = await product_repo.create_product(
+        db_session, owner_id=test_user.id, name="Desk Mat", price=20, description="Fits any keyboard."
+    )
+    await product_repo.create_product(db_session, owner_id=test_user.id, name="Office Chair", price=200)
+
+    rows = await product_repo.search_products(db_session, "keyboard")
+    assert [product.id for product, _ in rows] == [in_name.id, in_description.id]
+
+@pytest.mark.asyncio
+async def test_search_products_tolerates_typos(db_session: AsyncSession, test_user: User):
+    """
+    Tests that trigram similarity on the name finds misspelled queries.
+    """
+    product = await product_repo.create_product(db_session, owner_id=test_user.id, name="Wireless Headphones", price=150)
+
+    rows = await product_repo.search_products(db_session, "headphnes")
+    assert product.id in [p.id for p, _ in rows]
+
+@pytest.mark.asyncio
+async def test_search_products_keyset_pagination(db_session: AsyncSession, test_user: User):
+    """
+    Tests that paging with the last (rank, id) visits every match exactly once.
+    """
+    created = {
+        (await product_repo.create_product(db_session, owner_id=test_user.id, name=f"Steel Bottle {i}", price=10)).id
+        for i in range(7)
+    }
+    seen, after = [], None
+    while True:
+        rows = await product_repo.search_products(db_session, "bottle", limit=3, after=after)
+        seen += [p.id for p, _ in rows]
+        if len(rows) < 3:
+            break
+        after = (rows[-1][1], rows[-1][0].id)
+    assert sorted(seen) == sorted(created)
+
+@pytest.mark.asyncio
+async def test_load_autocomplete_ranks_by_units_sold(db_session: AsyncSession, test_user: User):
+    """
+    Tests that the index is built from active products, ranked by quantities ordered
+    within the popularity window.
+    """
+    from datetime import datetime, timedelta, timezone
+    from app.db.models import ProductSalesDaily
+
+    rarely = await product_repo.create_product(db_session, owner_id=test_user.id, name="Travel Mug", price=10, stock=10)
+    often = await product_repo.create_product(db_session, owner_id=test_user.id, name="Travel Pillow", price=20, stock=10)
+    hidden = await product_repo.create_product(db_session, owner_id=test_user.id, name="Travel Adapter", price=5)
+    await product_repo.update_product(db_session, hidden, is_active=False)
+    await order_repo.create_order(db_session, test_user.id, [{"product_id": often.id, "quantity": 3}])
+    long_ago = datetime.now(timezone.utc).date() - timedelta(days=settings.AUTOCOMPLETE_POPULARITY_DAYS + 1)
+    db_session.add(ProductSalesDaily(day=long_ago, product_id=rarely.id, bucket=0, units=100, revenue=1000.0))
+    await db_session.flush()
+
+    assert await product_repo.load_autocomplete(db_session) >= 2
+    ids = [pid for pid, _ in product_repo.autocomplete_index.complete("travel")]
+    assert ids == [often.id, rarely.id]
+
+@pytest.mark.asyncio
+async def test_catalog_snapshot_serves_listings(db_session: AsyncSession, test_user: User):
+    """
+    Tests that a loaded snapshot answers list_products and follows applied changes.
+    """
+    pytest.importorskip("numpy")
+    cheap = await product_repo.create_product(db_session, owner_id=test_user.id, name="Cheap", price=1, stock=1)
+    dear = await product_repo.create_product(db_session, owner_id=test_user.id, name="Dear", price=100, stock=1)
+    await product_repo.load_catalog_snapshot(db_session)
+    listed = await product_repo.list_products(db_session, owner_id=test_user.id, sort="-price")
+    assert [p.id for p in listed] == [dear.id, cheap.id]
+
+    await product_repo.update_product(db_session, dear, is_active=False)
+    await product_repo.apply_catalog_changes(db_session, {dear.id, cheap.id})
+    listed = await product_repo.list_products(db_session, owner_id=test_user.id)
+    assert [p.id for p in listed] == [cheap.id]
+
+@pytest.mark.asyncio
+async def test_warm_catalog_snapshot_applies_changes_since_the_file(db_session: AsyncSession, test_user: User, tmp_path, monkeypatch):
+    """
+    Tests that a snapshot mapped from a file picks up products changed, created and
+    deleted after it was saved.
+    """
+    pytest.importorskip("numpy")
+    from datetime import datetime, timezone
+    from app.core import catalog_snapshot
+    from app.core.catalog_snapshot import CatalogSnapshot
+
+    monkeypatch.setattr(product_repo, "catalog_snapshot", CatalogSnapshot())
+    path = str(tmp_path / "catalog.bin")
+    assert await product_repo.warm_catalog_snapshot(db_session, path) is None
+    (tmp_path / "catalog.bin").write_bytes(b"CATSNAP")  # cut short
+    assert await product_repo.warm_catalog_snapshot(db_session, path) is None
+    assert not product_repo.catalog_snapshot.ready
+
+    kept = await product_repo.create_product(db_session, owner_id=test_user.id, name="Kept", price=5, stock=1)
+    changed = await product_repo.create_product(db_session, owner_id=test_user.id, name="Changed", price=5, stock=1)
+    deleted = await product_repo.create_product(db_session, owner_id=test_user.id, name="Deleted", price=5, stock=1)
+    await product_repo.load_catalog_snapshot(db_session)
+    catalog_snapshot.save(path, product_repo.catalog_snapshot.export(), datetime.now(timezone.utc))
+
+    await product_repo.update_product(db_session, changed, price=50)
+    await product_repo.delete_product(db_session, deleted)
+    added = await product_repo.create_product(db_session, owner_id=test_user.id, name="Added", price=1, stock=1)
+
+    monkeypatch.setattr(product_repo, "catalog_snapshot", CatalogSnapshot())
+    assert await product_repo.warm_catalog_snapshot(db_session, path) >= 3
+    listed = await product_repo.list_products(db_session, owner_id=test_user.id, sort="price")
+    assert [(p.id, p.price) for p in listed] == [(added.id, 1), (kept.id, 5), (changed.id, 50)]
+
+@pytest.mark.asyncio
+async def test_get_products_preserves_order_and_reports_missing(db_session: AsyncSession, test_user: User):
+    """
+    Tests batch lookup: requested order, duplicates collapsed, missing ids, cache reuse.
+    """
+    a = await product_repo.create_product(db_session, owner_id=test_user.id, name="A", price=1)
+    b = await product_repo.create_product(db_session, owner_id=test_user.id, name="B", price=2)
+    await product_repo.get_product(db_session, a.id)  # warm the cache for one of them
+    hits = product_repo.product_cache.hits
+
+    products, missing = await product_repo.get_products(db_session, [b.id, 999999, a.id, b.id])
+    assert [p.id for p in products] == [b.id, a.id]
+    assert missing == [999999]
+    assert product_repo.product_cache.hits == hits + 1
+
+    products, _ = await product_repo.get_products(db_session, [a.id, b.id])
+    assert [p.name for p in products] == ["A", "B"]
+    assert product_repo.product_cache.hits == hits + 3
+
+def test_listing_query_selects_only_requested_fields():
+    """
+    Tests that a sparse fieldset narrows the SELECT list (validator columns aside).
+    """
+    sql = str(product_repo.listing_query(fields=("name", "price")))
+    select_list = sql.split("FROM")[0]
+    assert "products.name" in select_list and "products.price" in select_list
+    assert "products.description" not in select_list
+
+@pytest.mark.asyncio
+async def test_import_products_upserts_and_rejects(db_session: AsyncSession, test_user: User, superuser: User):
+    """
+    Tests bulk import: inserts, updates by id, and rejects duplicate and foreign ids.
+    """
+    from app.core.bulk_import import read_records, validated_batches
+    from app.schemas.product import ProductImportRow
+
+    mine = await product_repo.create_product(db_session, owner_id=test_user.id, name="Old Name", price=5, stock=1)
+    theirs = await product_repo.create_product(db_session, owner_id=superuser.id, name="Not Mine", price=5)
+    await product_repo.get_product(db_session, mine.id)  # cached; must be invalidated
+
+    async def body():
+        yield (
+            f"id,name,price,stock\n"
+            f",Imported A,1.5,10\n"
+            f"{mine.id},New Name,6,0\n"
+            f",Imported B,2,\n"
+            f"{theirs.id},Hijack,1,1\n"
+            f"{mine.id},Again,7,0\n"
+            f",,1,1\n"
+        ).encode()
+
+    batches = validated_batches(read_records(body(), "csv"), ProductImportRow, batch_size=2)
+    inserted, updated, rejected = await product_repo.import_products(db_session, test_user.id, batches)
+    assert (inserted, updated) == (2, 1)
+    assert [row for row, _ in rejected] == [4, 5, 6]
+
+    refreshed = await product_repo.get_product(db_session, mine.id)
+    assert (refreshed.name, refreshed.price, refreshed.stock) == ("New Name", 6, 0)
+    assert (await product_repo.get_product(db_session, theirs.id)).name == "Not Mine"
+    listed = await product_repo.list_products(db_session, owner_id=test_user.id, sort="name")
+    assert [p.name for p in listed] == ["Imported A", "Imported B", "New Name"]
+    assert {name for _, name in product_repo.autocomplete_index.complete("imported")} == {"Imported A", "Imported B"}
+
+@pytest.mark.asyncio
+async def test_sync_stock_and_prices_is_idempotent(db_session: AsyncSession, test_user: User):
+    """
+    Tests absolute and delta changes, missing/rejected ids, and batch replays.
+    """
+    from app.schemas.product import ProductStockChange
+
+    a = await product_repo.create_product(db_session, owner_id=test_user.id, name="A", price=10, stock=5)
+    b = await product_repo.create_product(db_session, owner_id=test_user.id, name="B", price=20, stock=1)
+    await product_repo.get_product(db_session, a.id)  # cached; must be invalidated
+    changes = [
+        ProductStockChange(id=a.id, stock_delta=3, price=12.5),
+        ProductStockChange(id=b.id, stock_delta=-2),
+        ProductStockChange(id=999999, stock=1),
+    ]
+
+    result = await product_repo.sync_stock_and_prices(db_session, "wh-1", changes)
+    assert result == {"batch_id": "wh-1", "updated": 1, "missing": [999999], "rejected": [b.id], "replayed": False}
+    refreshed = await product_repo.get_product(db_session, a.id)
+    assert (refreshed.stock, refreshed.price) == (8, 12.5)
+
+    replay = await product_repo.sync_stock_and_prices(db_session, "wh-1", changes)
+    assert replay["replayed"] and replay["updated"] == 1
+    assert (await product_repo.get_product(db_session, a.id)).stock == 8
+
+    with pytest.raises(ValueError):
+        await product_repo.sync_stock_and_prices(db_session, "wh-1", changes[:1])